@@ -0,0 +1,105 @@
+"""Общая подготовка бенчмарков: Django на временной копии схемы.
+
+Скрипты запускаются из корня репозитория, например
+`python benchmarks/feed_index.py --posts 1000000`. База и файловый кеш
+создаются во временном каталоге и удаляются при выходе.
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'blogicum'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
+
+
+def setup(description, add_arguments=None, **defaults):
+    """Разбирает общие аргументы, настраивает Django и мигрирует базу.
+
+    add_arguments(parser) добавляет аргументы конкретного бенчмарка.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--posts', type=int,
+                        default=defaults.get('posts', 100_000))
+    parser.add_argument('--repeat', type=int,
+                        default=defaults.get('repeat', 200))
+    if add_arguments is not None:
+        add_arguments(parser)
+    args = parser.parse_args()
+
+    import django
+    from django.conf import settings
+
+    workdir = tempfile.mkdtemp(prefix='blogicum-bench-')
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    name = os.path.join(workdir, 'bench.db')
+    settings.DATABASES['default']['NAME'] = name
+    if 'replica' in settings.DATABASES:
+        settings.DATABASES['replica']['NAME'] = f'file:{name}?mode=ro'
+    for alias, options in settings.CACHES.items():
+        options['LOCATION'] = os.path.join(workdir, 'cache', alias)
+    settings.BLOG_VISIBILITY_TIMER = False
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return args
+
+
+def seed(posts, categories=20, authors=500, text_words=0):
+    """Заполняет базу видимыми постами и их записями лент через SQL.
+
+    text_words добавляет к тексту каждого поста столько слов.
+    """
+    from django.db import connection, transaction
+
+    now = int(time.time())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO auth_user (id, password, is_superuser, username,'
+            ' first_name, last_name, email, is_staff, is_active,'
+            " date_joined) VALUES (%s, '', 0, %s, '', '', '', 0, 1,"
+            " datetime('now'))",
+            [(pk, f'author{pk}') for pk in range(1, authors + 1)])
+        cursor.executemany(
+            'INSERT INTO blog_category (id, is_published, created_at,'
+            ' updated_at, title, description, slug) VALUES'
+            " (%s, 1, datetime('now'), datetime('now'), %s, '', %s)",
+            [(pk, f'Категория {pk}', f'category-{pk}')
+             for pk in range(1, categories + 1)])
+        cursor.execute(
+            'WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL'
+            ' SELECT n + 1 FROM seq WHERE n < %s)'
+            ' INSERT INTO blog_post (id, is_published, created_at,'
+            ' updated_at, title, text, excerpt, pub_date, author_id,'
+            ' category_id, image, comment_count, is_visible,'
+            ' forbidden_word)'
+            " SELECT n, 1, datetime('now'), datetime('now'), 'Пост ' || n,"
+            " 'Текст поста ' || n || ' '"
+            " || replace(hex(zeroblob(%s)), '00', 'слово '),"
+            " 'Текст поста ' || n,"
+            " strftime('%%Y-%%m-%%d %%H:%%M:%%S', %s - n * 60, 'unixepoch'),"
+            ' n %% %s + 1, n %% %s + 1, \'\', 0, 1, \'\' FROM seq',
+            [posts, text_words, now, authors, categories])
+        for scope in ("'global'", "'author:' || author_id",
+                      "'category:' || category_id"):
+            cursor.execute(
+                'INSERT INTO blog_feedentry (scope, pub_date, post_id)'
+                f' SELECT {scope}, pub_date, id FROM blog_post')
+        cursor.execute('ANALYZE')
+
+
+def measure(label, func, repeat):
+    """Печатает среднее время вызова func в миллисекундах."""
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    print(f'{label:<48} {elapsed:9.3f} ms')
+    return elapsed
@@ -0,0 +1,65 @@
+"""Страница из 100 карточек: экземпляры моделей против PostCard.
+
+`python benchmarks/cards.py`
+"""
+import tracemalloc
+
+from _django import measure, seed, setup
+
+PAGE_SIZE = 100
+
+
+def retained_bytes(load):
+    """Сколько памяти занимает результат load() после сборки."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    page = load()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'lineno'))
+    del page
+    return size
+
+
+def main():
+    args = setup(__doc__, posts=1000, repeat=200)
+    seed(args.posts)
+
+    from django.core.cache import cache
+    from django.template.loader import get_template
+
+    from blog.models import FEED_ORDER, Post
+
+    card = get_template('includes/post_card.html')
+    page = Post.objects.filter(is_visible=True).order_by(*FEED_ORDER)
+    loaders = {
+        'модели': lambda: list(page.for_feed()[:PAGE_SIZE]),
+        'PostCard': lambda: list(page.cards()[:PAGE_SIZE]),
+    }
+    for name, load in loaders.items():
+        print(f'{name + ": память страницы":<48} '
+              f'{retained_bytes(load):>9,} байт')
+        measure(f'{name}: загрузка страницы', load, args.repeat)
+        posts = load()
+        # Все поля карточки, кроме URL картинок: их в сиде нет.
+        measure(f'{name}: чтение полей карточки', lambda: [
+            (post.id, post.title, post.excerpt, post.pub_date,
+             post.is_visible, post.comment_count, post.author.username,
+             post.category.slug, post.category.title, post.location)
+            for post in posts
+        ], args.repeat)
+
+    for name, load in loaders.items():
+        posts = load()
+
+        def render():
+            cache.clear()
+            for post in posts:
+                card.render({'post': post})
+
+        measure(f'{name}: отрисовка без кеша карточек', render,
+                max(args.repeat // 10, 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Байты, которые страница ленты читает из SQLite: полный текст
+против сохранённого анонса.
+
+`python benchmarks/excerpt.py --posts 2000`
+"""
+from _django import measure, seed, setup
+
+# Около 200 КБ текста на пост.
+TEXT_WORDS = 18_000
+
+
+def fetched_bytes(queryset):
+    """Сколько байт значений возвращает SQLite на запрос queryset."""
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return sum(len(str(value).encode())
+                   for row in cursor.fetchall()
+                   for value in row if value is not None)
+
+
+def main():
+    args = setup(__doc__, posts=2000, repeat=20)
+    seed(args.posts, text_words=TEXT_WORDS)
+
+    from blog.models import FEED_ORDER, Post
+
+    pages = {
+        'до: for_card()': Post.objects.for_card(),
+        'после: for_feed()': Post.objects.for_feed(),
+    }
+    for name, posts in pages.items():
+        page = posts.filter(is_visible=True).order_by(*FEED_ORDER)[:10]
+        print(f'{name:<48} {fetched_bytes(page):>12,} байт')
+        measure(f'{name}: страница из 10 постов',
+                lambda: list(page.all()), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
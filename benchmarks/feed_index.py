@@ -0,0 +1,59 @@
+"""Страница ленты: материализованная таблица против индекса в памяти.
+
+`python benchmarks/feed_index.py --posts 1000000`
+"""
+import random
+import time
+
+from _django import measure, seed, setup
+
+
+def main():
+    args = setup(__doc__, posts=1_000_000)
+    seed(args.posts)
+
+    from blog.feed_cache import GLOBAL_SCOPE, category_scope
+    from blog.feed_index import IndexedFeed, feed_index
+    from blog.models import FeedEntry
+    from blog.pagination import seek
+    from blog.timeline import posts_for_entries
+
+    started = time.perf_counter()
+    feed_index.load()
+    print(f'Загрузка индекса: {time.perf_counter() - started:.2f} s, '
+          f'{feed_index.nbytes() / len(feed_index):.0f} байт на пост, '
+          f'{feed_index.nbytes() / 2 ** 20:.1f} MiB')
+
+    sources = {
+        'SQL': lambda scope: (FeedEntry.objects.in_scope(scope)
+                              .only('post', 'pub_date')),
+        'память': IndexedFeed,
+    }
+    keys = list(IndexedFeed(GLOBAL_SCOPE)[0:args.posts])
+    middle = keys[len(keys) // 2]
+    measure('память: правка поста в середине ленты',
+            lambda: feed_index.sync([middle.post_id]), args.repeat)
+    for name, source in sources.items():
+        def first_page(scope=GLOBAL_SCOPE):
+            return posts_for_entries(source(scope)[0:10])
+
+        def category_page():
+            scope = category_scope(random.randint(1, 20))
+            return posts_for_entries(source(scope)[0:10])
+
+        def deep_cursor_page():
+            return posts_for_entries(seek(
+                source(GLOBAL_SCOPE), 'after', *middle, 11)[:10])
+
+        measure(f'{name}: первая страница', first_page, args.repeat)
+        measure(f'{name}: первая страница категории', category_page,
+                args.repeat)
+        measure(f'{name}: курсор в середине ленты', deep_cursor_page,
+                args.repeat)
+        measure(f'{name}: COUNT категории',
+                lambda: source(category_scope(1)).count(),
+                max(args.repeat // 20, 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Проверка поста на запрещённые слова: разбиение по пробелам против
+поиска основ слов и стоимость проверки килобайта текста при разной
+длине списка.
+
+`python benchmarks/forbidden_words.py --words 10000 --text-kb 200`
+"""
+import random
+
+from _django import measure, setup
+
+LETTERS = 'абвгдежзийклмнопрстуфхцчшщэюя'
+VOCABULARY = 20_000
+
+
+def add_arguments(parser):
+    parser.add_argument('--words', type=int, default=10_000)
+    parser.add_argument('--text-kb', type=int, default=200)
+    parser.add_argument('--sizes', default='100,1000,10000,50000',
+                        help='Длины списка через запятую.')
+
+
+def random_word(rng):
+    return ''.join(rng.choice(LETTERS) for _ in range(rng.randint(4, 12)))
+
+
+def clean_text(rng, stems, size):
+    """Текст около size байт без запрещённых основ — худший случай.
+
+    Слова берутся из словаря VOCABULARY с частотами по закону Ципфа, как
+    в живом тексте, где одни и те же слова повторяются.
+    """
+    from blog.stemming import stem
+
+    vocabulary = []
+    while len(vocabulary) < VOCABULARY:
+        word = random_word(rng)
+        if stem(word) not in stems:
+            vocabulary.append(word)
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    words, length = [], 0
+    while length < size:
+        word = rng.choices(vocabulary, weights)[0]
+        words.append(word + rng.choice(('', '', '', ',', '.')))
+        length += len(words[-1].encode()) + 1
+    return ' '.join(words)
+
+
+def main():
+    args = setup(__doc__, add_arguments, repeat=20)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    from blog.forbidden_words import ForbiddenWordsMatcher, get_matcher
+    from blog.models import ForbiddenWord
+    from blog.stemming import stem
+
+    rng = random.Random(0)
+    forbidden = {}
+    while len(forbidden) < max(args.words, *sizes):
+        word = random_word(rng)
+        forbidden[word] = stem(word)
+    words, stems = list(forbidden), list(forbidden.values())
+    ForbiddenWord.objects.bulk_create(
+        ForbiddenWord(word=word, stem=word_stem)
+        for word, word_stem in zip(words[:args.words], stems))
+    title = clean_text(rng, set(stems), 200)
+    text = clean_text(rng, set(stems), args.text_kb * 1024)
+
+    def split_and_lookup():
+        # Исходная проверка: запрос списка и разбиение на каждое поле.
+        for value in (title, text):
+            words = set(ForbiddenWord.objects.values_list('word', flat=True))
+            for word in value.split():
+                if word.lower() in words:
+                    break
+
+    def stemmed():
+        matcher = get_matcher()
+        for value in (title, text):
+            matcher.find(value)
+
+    measure(f'до: split() и set, {args.text_kb} КБ', split_and_lookup,
+            args.repeat)
+    measure(f'после: основы слов, {args.text_kb} КБ', stemmed, args.repeat)
+
+    def cold(matcher):
+        stem.cache_clear()
+        matcher.find(text)
+
+    print()
+    for size in sizes:
+        measure(f'сборка списка из {size} слов',
+                lambda: ForbiddenWordsMatcher(words[:size],
+                                              stems=stems[:size]), 3)
+        matcher = ForbiddenWordsMatcher(words[:size], stems=stems[:size])
+        warm = measure(f'{size} слов, кеш основ прогрет',
+                       lambda: matcher.find(text), args.repeat)
+        empty = measure(f'{size} слов, кеш основ пуст',
+                        lambda: cold(matcher), args.repeat)
+        print(f'{"":<48} {warm / args.text_kb:9.3f} / '
+              f'{empty / args.text_kb:.3f} ms на КБ')
+
+
+if __name__ == '__main__':
+    main()
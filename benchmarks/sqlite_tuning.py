@@ -0,0 +1,134 @@
+"""Чтение ленты при активном писателе: SQLite по умолчанию против
+core.sqlite3 с WAL и PRAGMA из settings.
+
+`python benchmarks/sqlite_tuning.py --readers 4 --seconds 5`
+"""
+import multiprocessing
+import queue
+import sys
+import time
+
+from _django import seed, setup
+
+FEED_SQL = ('SELECT id, title, excerpt, pub_date FROM blog_post'
+            ' WHERE is_visible ORDER BY pub_date DESC, id DESC'
+            ' LIMIT 10 OFFSET %s')
+COMMENT_SQL = ("INSERT INTO blog_comment (is_published, created_at, text,"
+               " post_id, author_id, forbidden_word)"
+               " VALUES (1, datetime('now'), 'x', %s, 1, '')")
+COUNT_SQL = ('UPDATE blog_post SET comment_count = comment_count + 1'
+             ' WHERE id = %s')
+# Сколько секунд сверх длительности замера ждать итогов процесса.
+RESULT_GRACE = 30
+
+
+def _wrapper(mode):
+    from django.db import connection
+    from django.db.backends.sqlite3.base import DatabaseWrapper as Plain
+
+    from core.sqlite3.base import DatabaseWrapper as Tuned
+
+    settings_dict = dict(connection.settings_dict)
+    if mode == 'default':
+        settings_dict['OPTIONS'] = {}
+        return Plain(settings_dict, alias=mode)
+    return Tuned(settings_dict, alias=mode)
+
+
+def worker(role, mode, seconds, posts, results):
+    """Запускает reader или writer и сообщает итог даже при сбое."""
+    work = reader if role == 'reader' else writer
+    try:
+        done, errors = work(mode, seconds, posts)
+    except Exception as error:
+        results.put((role, 0, 0, f'{type(error).__name__}: {error}'))
+    else:
+        results.put((role, done, errors, None))
+
+
+def reader(mode, seconds, posts):
+    db = _wrapper(mode)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    with db.cursor() as cursor:
+        while time.monotonic() < deadline:
+            try:
+                cursor.execute(FEED_SQL, [done * 10 % posts])
+                cursor.fetchall()
+                done += 1
+            except db.Database.OperationalError:
+                errors += 1
+    return done, errors
+
+
+def writer(mode, seconds, posts):
+    db = _wrapper(mode)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with db.cursor() as cursor:
+                db.set_autocommit(False)
+                cursor.execute(COMMENT_SQL, [done % posts + 1])
+                cursor.execute(COUNT_SQL, [done % posts + 1])
+                db.commit()
+            done += 1
+        except db.Database.OperationalError:
+            db.rollback()
+            errors += 1
+        finally:
+            db.set_autocommit(True)
+    return done, errors
+
+
+def run(mode, readers, seconds, posts):
+    results = multiprocessing.Queue()
+    roles = ['writer'] + ['reader'] * readers
+    processes = [multiprocessing.Process(
+        target=worker, args=(role, mode, seconds, posts, results))
+        for role in roles]
+    for process in processes:
+        process.start()
+    totals = {'reader': [0, 0], 'writer': [0, 0]}
+    failures = []
+    try:
+        for _ in processes:
+            role, done, errors, failure = results.get(
+                timeout=seconds + RESULT_GRACE)
+            totals[role][0] += done
+            totals[role][1] += errors
+            if failure:
+                failures.append(f'{mode} {role}: {failure}')
+    except queue.Empty:
+        failures.append(f'{mode}: процессы не вернули итогов')
+    for process in processes:
+        process.join(RESULT_GRACE)
+        if process.is_alive():
+            process.terminate()
+    if failures:
+        sys.exit('\n'.join(failures))
+    for role, (done, errors) in totals.items():
+        print(f'{mode:<8} {role}: {done / seconds:10.0f} в секунду, '
+              f'ошибок {errors}')
+
+
+def main():
+    def add_arguments(parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    args = setup(__doc__, add_arguments, posts=20_000)
+    seed(args.posts)
+
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode = DELETE')
+    connection.close()
+
+    multiprocessing.set_start_method('fork')
+    run('default', args.readers, args.seconds, args.posts)
+    run('tuned', args.readers, args.seconds, args.posts)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,16 @@
-from django.contrib import admin
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib import admin, messages
 
 from .models import (Category,
                      Comment,
                      ForbiddenWord,
                      Location,
                      Post)
+from .rescan import TARGETS, is_running
 
 
 class BlogAdmin(admin.ModelAdmin):
@@ -25,7 +31,7 @@ class BlogAdmin(admin.ModelAdmin):
     )
 
     search_fields = ('title',)
-    list_filter = ('category', 'location')
+    list_filter = ('category', 'location', 'forbidden_word')
 
 
 class PostInline(admin.StackedInline):
@@ -56,11 +62,78 @@ class CommentAdmin(admin.ModelAdmin):
     )
 
     search_fields = ('author',)
-    list_filter = ('author',)
+    list_filter = ('author', 'forbidden_word')
+    # Авторы и посты могут лежать в другой базе: без JOIN, списками id.
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'author', 'post')
+
+    def save_model(self, request, obj, form, change):
+        # Счётчик на посте учитывает только опубликованные комментарии:
+        # при смене флага или поста снимаем старый вклад и добавляем новый.
+        old = None
+        if change:
+            old = (Comment.objects
+                   .filter(pk=obj.pk)
+                   .values_list('post_id', 'is_published')
+                   .first())
+        super().save_model(request, obj, form, change)
+        new = (obj.post_id, obj.is_published)
+        if old == new:
+            return
+        if old and old[1]:
+            Post.objects.filter(pk=old[0]).adjust_comment_count(-1)
+        if obj.is_published:
+            Post.objects.filter(pk=obj.post_id).adjust_comment_count(1)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        if obj.is_published:
+            Post.objects.filter(pk=obj.post_id).adjust_comment_count(-1)
+
+    def delete_queryset(self, request, queryset):
+        per_post = queryset.counts_by_post()
+        super().delete_queryset(request, queryset)
+        for post_id, removed in per_post.items():
+            Post.objects.filter(pk=post_id).adjust_comment_count(-removed)
+
+
+# Фоновой проверке — половина ядер: остальные обслуживают сайт.
+RESCAN_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
+
+class ForbiddenWordAdmin(admin.ModelAdmin):
+    list_display = ('word', 'stem')
+    actions = ('rescan_content',)
+
+    @admin.action(description='Проверить опубликованное на выбранные слова')
+    def rescan_content(self, request, queryset):
+        # Проверка всех записей долгая: она идёт отдельным процессом, а
+        # прерванную продолжит повторный запуск rescan_forbidden_words.
+        running = [kind for kind in TARGETS if is_running(kind)]
+        if running:
+            self.message_user(
+                request,
+                f'Проверка уже идёт ({", ".join(running)}): дождитесь её '
+                'окончания.',
+                messages.WARNING)
+            return
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'),
+                   'rescan_forbidden_words', f'--workers={RESCAN_WORKERS}']
+        command += [f'--word={word}'
+                    for word in queryset.values_list('word', flat=True)]
+        subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+        self.message_user(
+            request,
+            'Проверка запущена в фоне: найденные слова появятся в поле '
+            '«Найденное запрещённое слово».')
 
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Location)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Post, BlogAdmin)
-admin.site.register(ForbiddenWord)
+admin.site.register(ForbiddenWord, ForbiddenWordAdmin)
@@ -6,3 +6,6 @@ class BlogConfig(AppConfig):
     name = 'blog'
 
     verbose_name = 'Блог'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,134 @@
+"""Холодный архив постов.
+
+Команда archive_posts переносит старые посты вместе с комментариями в
+базу BLOG_ARCHIVE_DB_ALIAS с теми же таблицами, так что основные
+таблицы и их индексы остаются небольшими. Представления заглядывают
+в архив только на промахе: страница поста — если поста нет в основной
+таблице, профиль — когда основные посты автора закончились.
+
+Автор, категория и местоположение архивного поста лежат в основной
+базе и подгружаются отдельными запросами по id. Видимость поста
+фиксируется при переносе.
+
+Пока в архиве нет постов — или его таблицы ещё не созданы, — в него не
+заглядывают: признак хранится в кеше ARCHIVE_KEY и ставится командой
+archive_posts.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.models import QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from .models import Comment, Post
+from .pagination import seek
+from .timeline import posts_for_entries
+
+
+ARCHIVE_KEY = 'blog:archive-has-posts'
+
+
+def archive_in_use():
+    """Есть ли в настроенном архиве посты."""
+    if settings.BLOG_ARCHIVE_DB_ALIAS is None:
+        return False
+    in_use = cache.get(ARCHIVE_KEY)
+    if in_use is None:
+        try:
+            in_use = (Post.objects
+                      .using(settings.BLOG_ARCHIVE_DB_ALIAS)
+                      .exists())
+        except OperationalError:
+            # Архив настроен, но `migrate --database` ещё не запускали.
+            in_use = False
+        cache.set(ARCHIVE_KEY, in_use, settings.BLOG_FEED_COUNT_TTL)
+    return in_use
+
+
+def archived_posts():
+    """Посты архива; связи подтягиваются из основной базы по id."""
+    return (Post.objects
+            .using(settings.BLOG_ARCHIVE_DB_ALIAS)
+            .prefetch_related('author', 'category', 'location'))
+
+
+def archived_comments():
+    return Comment.objects.using(settings.BLOG_ARCHIVE_DB_ALIAS)
+
+
+def get_archived_post(pk):
+    if not archive_in_use():
+        raise Http404('Страница не найдена')
+    try:
+        return archived_posts().get(pk=pk)
+    except Post.DoesNotExist:
+        raise Http404('Страница не найдена')
+
+
+def with_archive(posts, archived):
+    """Лента posts, которую после последней строки продолжает archived."""
+    if not archive_in_use():
+        return posts
+    return ArchiveFallbackFeed(posts, archived)
+
+
+class ArchiveFallbackFeed:
+    """Основная лента, за которой идут архивные посты.
+
+    В архив попадают посты старше порога, поэтому архив продолжает
+    ленту и при срезах offset-страниц, и при поиске по курсору. Строки
+    основной ленты (записи FeedEntry или ключи индекса) превращаются в
+    посты здесь же, так что лента сразу отдаёт посты.
+    """
+
+    model = Post
+    keyset = ('pub_date', 'pk')
+
+    def __init__(self, posts, archived):
+        self.posts = posts
+        self.archived = archived
+
+    @cached_property
+    def posts_count(self):
+        return self.posts.count()
+
+    def count(self):
+        return self.posts_count + self.archived.count()
+
+    def cards(self):
+        """Основные посты в виде PostCard; архивные остаются моделями."""
+        posts = self.posts
+        if isinstance(posts, QuerySet) and posts.model is Post:
+            posts = posts.cards()
+        return ArchiveFallbackFeed(posts, self.archived)
+
+    def _hydrate(self, rows):
+        if getattr(self.posts, 'model', None) is Post:
+            return list(rows)
+        return posts_for_entries(rows)
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        rows = list(self.posts[start:stop])
+        posts = self._hydrate(rows)
+        if len(rows) < stop - start:
+            start = max(start - self.posts_count, 0)
+            stop = max(stop - self.posts_count, start)
+            posts += self.archived[start:stop]
+        return posts
+
+    def seek(self, direction, pub_date, pk, limit):
+        if direction == 'after':
+            rows = seek(self.posts, direction, pub_date, pk, limit)
+            posts = self._hydrate(rows)
+            if len(rows) < limit:
+                posts += seek(self.archived, direction, pub_date, pk,
+                              limit - len(rows))
+            return posts
+        # Строки новее курсора идут от старых к новым: сначала архив.
+        posts = seek(self.archived, direction, pub_date, pk, limit)
+        if len(posts) < limit:
+            posts += self._hydrate(seek(self.posts, direction, pub_date, pk,
+                                        limit - len(posts)))
+        return posts
@@ -0,0 +1,102 @@
+"""Лёгкие карточки постов для лент.
+
+Карточке ленты нужна дюжина полей, а экземпляры Post, User, Category
+и Location несут `_state`, `__dict__` и дескрипторы. PostQuerySet.cards()
+читает строки через values() и собирает из них объекты со `__slots__`,
+которые повторяют ту часть интерфейса моделей, что использует
+post_card.html.
+"""
+from django.core.files.storage import default_storage
+from django.db.models.query import ValuesIterable
+
+
+CARD_FIELDS = (
+    'id', 'title', 'excerpt', 'pub_date', 'is_published', 'is_visible',
+    'comment_count', 'updated_at', 'image',
+    'author__username',
+    'category__slug', 'category__title', 'category__is_published',
+    'category__updated_at',
+    'location__name', 'location__is_published', 'location__updated_at',
+)
+
+
+class AuthorCard:
+    __slots__ = ('username',)
+
+    def __init__(self, username):
+        self.username = username
+
+
+class CategoryCard:
+    __slots__ = ('slug', 'title', 'is_published', 'updated_at')
+
+    def __init__(self, slug, title, is_published, updated_at):
+        self.slug = slug
+        self.title = title
+        self.is_published = is_published
+        self.updated_at = updated_at
+
+
+class LocationCard:
+    __slots__ = ('name', 'is_published', 'updated_at')
+
+    def __init__(self, name, is_published, updated_at):
+        self.name = name
+        self.is_published = is_published
+        self.updated_at = updated_at
+
+
+class ImageCard:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __bool__(self):
+        return bool(self.name)
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class PostCard:
+    """Карточка поста из строки values()."""
+
+    __slots__ = ('id', 'title', 'excerpt', 'pub_date', 'is_published',
+                 'is_visible', 'comment_count', 'updated_at', 'image',
+                 'author', 'category', 'location')
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.title = row['title']
+        self.excerpt = row['excerpt']
+        self.pub_date = row['pub_date']
+        self.is_published = row['is_published']
+        self.is_visible = row['is_visible']
+        self.comment_count = row['comment_count']
+        self.updated_at = row['updated_at']
+        self.image = ImageCard(row['image'])
+        self.author = AuthorCard(row['author__username'])
+        self.category = None
+        if row['category__slug'] is not None:
+            self.category = CategoryCard(
+                row['category__slug'], row['category__title'],
+                row['category__is_published'], row['category__updated_at'])
+        self.location = None
+        if row['location__name'] is not None:
+            self.location = LocationCard(
+                row['location__name'], row['location__is_published'],
+                row['location__updated_at'])
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class PostCardIterable(ValuesIterable):
+    """Отдаёт строки values() queryset'а как PostCard."""
+
+    def __iter__(self):
+        for row in super().__iter__():
+            yield PostCard(row)
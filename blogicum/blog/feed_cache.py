@@ -0,0 +1,99 @@
+"""Кеш страниц ленты с версиями по областям.
+
+У каждой области — общей ленты, категории и автора — свой счётчик
+версии. Ключ страницы собирается из версий её областей, эпохи
+наступивших публикаций и адреса страницы, поэтому правка сбрасывает
+только те ленты, где виден изменённый пост. Версии лежат в общем
+кеше (core.versions) и сбрасываются для всех процессов сразу.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import versions
+from .visibility import get_due_epoch
+
+
+GLOBAL_SCOPE = 'global'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def _version_key(scope):
+    return f'blog:feed-version:{scope}'
+
+
+def get_versions(scopes):
+    return versions.get_many([_version_key(scope) for scope in scopes])
+
+
+def _bump(scopes):
+    for scope in scopes:
+        versions.bump(_version_key(scope))
+
+
+def bump_versions(*scopes):
+    """Сбрасывает страницы областей сейчас и ещё раз после коммита.
+
+    Второй сброс не даёт параллельному запросу закешировать страницу,
+    прочитанную до фиксации транзакции.
+    """
+    scopes = set(scopes)
+    if not scopes:
+        return
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def post_scopes(category_id, author_id):
+    scopes = {GLOBAL_SCOPE, author_scope(author_id)}
+    if category_id is not None:
+        scopes.add(category_scope(category_id))
+    return scopes
+
+
+def scopes_of_posts(queryset):
+    """Области всех лент, где показываются посты из queryset."""
+    scopes = set()
+    pairs = (queryset
+             .order_by()
+             .values_list('category_id', 'author_id')
+             .distinct())
+    for category_id, author_id in pairs:
+        scopes |= post_scopes(category_id, author_id)
+    return scopes
+
+
+class FeedCacheMixin:
+    """Отдаёт анонимным пользователям готовую страницу ленты из кеша."""
+
+    def get_cache_scopes(self):
+        return (GLOBAL_SCOPE,)
+
+    def get_page_cache_key(self):
+        versions = ':'.join(map(str, get_versions(self.get_cache_scopes())))
+        path = md5(self.request.get_full_path().encode()).hexdigest()
+        return (f'blog:feed-page:{type(self).__name__}:{versions}:'
+                f'{get_due_epoch()}:{path}')
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = self.get_page_cache_key()
+        response = cache.get(key)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(
+                        key, rendered, settings.BLOG_FEED_CACHE_TTL)
+                )
+        return response
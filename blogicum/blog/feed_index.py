@@ -0,0 +1,439 @@
+"""Индекс ленты в памяти процесса.
+
+Видимые посты лежат плотно, по одному на строку, в порядке (pub_date,
+id) — в четырёх параллельных столбцах: дата в микросекундах и id поста
+по 8 байт, id категории и автора по 4 байта, всего 24 байта на пост.
+Дырки в id места не занимают. Столбцы хранятся в bytearray: строка
+поста находится по id, а страница категории или автора — по значению
+её столбца поиском find()/rfind(), который идёт в C, а не циклом
+Python. Страница, курсор и COUNT общей ленты находятся бинарным поиском
+по дате, после чего из БД по первичному ключу читаются только посты
+страницы.
+
+Индекс у каждого процесса свой. Локальные правки применяются сигналами
+после коммита и заодно пишутся в журнал FeedChange. Другие процессы,
+заметив смену эпохи видимости (не чаще раза в BLOG_FEED_INDEX_REFRESH
+секунд), в фоновом потоке перечитывают только посты из журнала.
+Целиком индекс строится при первом обращении и если журнал успели
+очистить (BLOG_FEED_CHANGES_KEEP); до первой загрузки ленты читаются из
+таблицы FeedEntry (см. timeline.TimelineMixin).
+"""
+import logging
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .feed_cache import (GLOBAL_SCOPE, author_scope, category_scope,
+                         post_scopes)
+from .models import FeedChange, Post
+from .visibility import get_epoch
+
+
+logger = logging.getLogger(__name__)
+
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+LOAD_CHUNK_SIZE = 5000
+
+FeedKey = namedtuple('FeedKey', 'pub_date post_id')
+
+
+def to_micros(pub_date):
+    return (pub_date - UNIX_EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return UNIX_EPOCH + micros * MICROSECOND
+
+
+def _visible_rows(posts):
+    return (posts
+            .filter(is_visible=True)
+            .order_by('pub_date', 'pk')
+            .values_list('pub_date', 'pk', 'category_id', 'author_id'))
+
+
+class Column:
+    """Столбец целых одной ширины в bytearray.
+
+    typecode — как у array: 'q' — 8 байт, 'i' — 4. Значение, которое не
+    помещается в столбец, поднимает OverflowError.
+    """
+
+    __slots__ = ('data', 'typecode', '_struct')
+
+    def __init__(self, typecode, values=()):
+        self.typecode = typecode
+        self._struct = struct.Struct(f'={typecode}')
+        self.data = bytearray(array(typecode, values))
+
+    def __len__(self):
+        return len(self.data) // self._struct.size
+
+    def __getitem__(self, i):
+        return self._struct.unpack_from(self.data, i * self._struct.size)[0]
+
+    def nbytes(self):
+        return len(self.data)
+
+    def _pack(self, value):
+        try:
+            return self._struct.pack(value)
+        except struct.error:
+            raise OverflowError(
+                f'{value} не помещается в столбец {self.typecode!r}')
+
+    def insert(self, i, value):
+        size = self._struct.size
+        self.data[i * size:i * size] = self._pack(value)
+
+    def __delitem__(self, i):
+        size = self._struct.size
+        del self.data[i * size:(i + 1) * size]
+
+    def find(self, value, start, stop):
+        """Первая строка в [start, stop) со значением value или -1."""
+        needle, size = self._pack(value), self._struct.size
+        pos = start * size
+        while True:
+            pos = self.data.find(needle, pos, stop * size)
+            if pos < 0 or pos % size == 0:
+                return pos // size if pos >= 0 else -1
+            # Совпадение на стыке двух значений: следующее — с границы.
+            pos += size - pos % size
+
+    def rfind(self, value, start, stop):
+        """Последняя строка в [start, stop) со значением value или -1."""
+        needle, size = self._pack(value), self._struct.size
+        end = stop * size
+        while True:
+            pos = self.data.rfind(needle, start * size, end)
+            if pos < 0 or pos % size == 0:
+                return pos // size if pos >= 0 else -1
+            end = pos - pos % size + size
+
+    def count(self, value, start, stop):
+        found = 0
+        i = self.find(value, start, stop)
+        while i >= 0:
+            found += 1
+            i = self.find(value, i + 1, stop)
+        return found
+
+
+class FeedData:
+    """Видимые посты в порядке (дата, id) и число постов в каждой ленте."""
+
+    def __init__(self, rows=()):
+        dates, ids, categories, authors = (
+            array('q'), array('q'), array('i'), array('i'))
+        for pub_date, pk, category_id, author_id in rows:
+            dates.append(to_micros(pub_date))
+            ids.append(pk)
+            categories.append(category_id or 0)
+            authors.append(author_id)
+        self.counts = Counter({GLOBAL_SCOPE: len(ids)})
+        self.counts.update({category_scope(category_id): count
+                            for category_id, count
+                            in Counter(categories).items() if category_id})
+        self.counts.update({author_scope(author_id): count
+                            for author_id, count in Counter(authors).items()})
+        self.dates = Column('q', dates)
+        self.ids = Column('q', ids)
+        # Категория 0 — у поста нет категории.
+        self.categories = Column('i', categories)
+        self.authors = Column('i', authors)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in (
+            self.dates, self.ids, self.categories, self.authors))
+
+    def position(self, micros, pk):
+        """Место ключа (micros, pk) в порядке строк."""
+        lo = bisect_left(self.dates, micros)
+        hi = bisect_right(self.dates, micros, lo)
+        return bisect_left(self.ids, pk, lo, hi)
+
+    def key(self, i):
+        return FeedKey(from_micros(self.dates[i]), self.ids[i])
+
+    def end(self):
+        """Строки до этой уже наступили; дальше — отложенные посты."""
+        return bisect_right(self.dates, to_micros(timezone.now()))
+
+    def column(self, scope):
+        """Столбец и значение, отбирающие строки ленты scope."""
+        if scope == GLOBAL_SCOPE:
+            return None, None
+        kind, _, value = scope.partition(':')
+        column = self.categories if kind == 'category' else self.authors
+        return column, int(value)
+
+    def add(self, pub_date, pk, category_id, author_id):
+        micros = to_micros(pub_date)
+        i = self.position(micros, pk)
+        # Сначала столбцы с проверкой диапазона: переполнение не оставит
+        # строку недописанной.
+        self.categories.insert(i, category_id or 0)
+        try:
+            self.authors.insert(i, author_id)
+        except OverflowError:
+            del self.categories[i]
+            raise
+        self.dates.insert(i, micros)
+        self.ids.insert(i, pk)
+        self.counts.update(post_scopes(category_id, author_id))
+
+    def discard(self, pk):
+        i = self.ids.find(pk, 0, len(self))
+        if i < 0:
+            return
+        self.counts.subtract(
+            post_scopes(self.categories[i] or None, self.authors[i]))
+        for column in (self.dates, self.ids, self.categories, self.authors):
+            del column[i]
+
+    def sync(self, post_ids, rows):
+        """Заменяет строки постов post_ids видимыми строками rows."""
+        for pk in post_ids:
+            self.discard(pk)
+        for row in rows:
+            self.add(*row)
+
+
+class FeedIndex:
+    """Лента видимых постов одного процесса."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._refresher = None
+        self.loaded = False
+        self._epoch = None
+        self._checked_at = 0.0
+        self._synced_at = 0.0
+        self._last_change = 0
+        self._data = FeedData()
+
+    def __len__(self):
+        return len(self._data)
+
+    def nbytes(self):
+        return self._data.nbytes()
+
+    def post_ids(self, scope=GLOBAL_SCOPE):
+        """Посты ленты scope, включая отложенные, от старых к новым."""
+        with self._lock:
+            data = self._data
+            column, value = data.column(scope)
+            return [data.ids[i] for i in range(len(data))
+                    if column is None or column[i] == value]
+
+    def _catch_up(self, data):
+        """Применяет к data журнал FeedChange после _last_change.
+
+        SQLite пишет транзакции по очереди, поэтому id записей журнала
+        фиксируются по возрастанию и догонять его можно по id.
+        """
+        changes = list(FeedChange.objects
+                       .filter(pk__gt=self._last_change)
+                       .order_by('pk')
+                       .values_list('pk', 'post_id'))
+        if changes:
+            post_ids = {post_id for _, post_id in changes}
+            data.sync(post_ids, _visible_rows(
+                Post.objects.filter(pk__in=post_ids)))
+            self._last_change = changes[-1][0]
+
+    def load(self):
+        """Строит индекс заново одним проходом по видимым постам.
+
+        Правки, сделанные во время загрузки, применяются из журнала под
+        блокировкой, которую ждут и локальные sync(): ни одна не
+        потеряется и не применится поверх более новой.
+        """
+        epoch = get_epoch()
+        last_change = (FeedChange.objects
+                       .order_by('-pk')
+                       .values_list('pk', flat=True)
+                       .first()) or 0
+        data = FeedData(_visible_rows(Post.objects.all()).iterator(
+            chunk_size=LOAD_CHUNK_SIZE))
+        with self._lock:
+            self._last_change = last_change
+            self._catch_up(data)
+            self._data = data
+            self._epoch = epoch
+            self._checked_at = time.monotonic()
+            self._synced_at = time.time()
+            self.loaded = True
+
+    def refresh(self):
+        """Догоняет журнал правок; слишком отставший индекс строится
+        заново.
+        """
+        keep = settings.BLOG_FEED_CHANGES_KEEP
+        if not self.loaded or time.time() - self._synced_at > keep / 2:
+            self.load()
+            return
+        epoch = get_epoch()
+        with self._lock:
+            self._catch_up(self._data)
+            self._epoch = epoch
+            self._synced_at = time.time()
+
+    def _refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            # В том числе id, не помещающийся в столбец: ленты читаются
+            # из FeedEntry, пока индекс не загрузится.
+            self.clear()
+            logger.exception('Не удалось обновить индекс ленты')
+        finally:
+            connections.close_all()
+
+    def refresh_in_background(self):
+        """Запускает обновление в фоне, если оно ещё не идёт."""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh, name='feed-index-refresh', daemon=True)
+            self._refresher.start()
+
+    def clear(self):
+        with self._lock:
+            self._data = FeedData()
+            self.loaded = False
+            self._epoch = None
+
+    def ensure_fresh(self):
+        """Готов ли индекс к чтению; устаревший обновляется в фоне."""
+        if not self.loaded:
+            self.refresh_in_background()
+            return False
+        now = time.monotonic()
+        if now - self._checked_at >= settings.BLOG_FEED_INDEX_REFRESH:
+            self._checked_at = now
+            if get_epoch() != self._epoch:
+                self.refresh_in_background()
+        return True
+
+    def sync(self, post_ids):
+        """Приводит строки постов к состоянию БД; до загрузки ничего
+        не делает.
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            post_ids = list(post_ids)
+            try:
+                self._data.sync(post_ids, _visible_rows(
+                    Post.objects.filter(pk__in=post_ids)))
+            except OverflowError:
+                self.clear()
+                logger.exception('Пост не помещается в индекс ленты')
+
+    def sync_on_commit(self, post_ids):
+        """Пишет правку постов в журнал и применяет её после коммита."""
+        if settings.BLOG_FEED_SOURCE != 'memory':
+            return
+        post_ids = list(post_ids)
+        FeedChange.objects.bulk_create(
+            FeedChange(post_id=pk) for pk in post_ids)
+        transaction.on_commit(lambda: self.sync(post_ids))
+
+
+feed_index = FeedIndex()
+
+
+def _rows_forward(column, value, start, stop, limit):
+    """До limit строк ленты в [start, stop) от старых к новым."""
+    if column is None:
+        return range(start, min(start + limit, stop))
+    rows = []
+    i = column.find(value, start, stop)
+    while i >= 0 and len(rows) < limit:
+        rows.append(i)
+        i = column.find(value, i + 1, stop)
+    return rows
+
+
+def _rows_backward(column, value, stop, skip, limit):
+    """До limit строк ленты до stop от новых к старым, пропустив skip."""
+    if column is None:
+        stop -= skip
+        return range(stop - 1, max(stop - limit, 0) - 1, -1)
+    rows = []
+    i = column.rfind(value, 0, stop)
+    while i >= 0 and len(rows) < limit:
+        if skip:
+            skip -= 1
+        else:
+            rows.append(i)
+        i = column.rfind(value, 0, i)
+    return rows
+
+
+class IndexedFeed:
+    """Лента области из индекса в памяти.
+
+    Ведёт себя как упорядоченный queryset ленты, насколько это нужно
+    Paginator и курсорной пагинации: `count()`, срезы и `seek()` отдают
+    ключи FeedKey от новых постов к старым.
+    """
+
+    keyset = ('pub_date', 'post_id')
+
+    def __init__(self, scope, index=feed_index):
+        self.index = index
+        self.scope = scope
+
+    def count(self):
+        with self.index._lock:
+            data = self.index._data
+            end = data.end()
+            column, value = data.column(self.scope)
+            if column is None:
+                return end
+            return (data.counts[self.scope]
+                    - column.count(value, end, len(data)))
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('Индекс ленты поддерживает только срезы')
+        start, stop = item.start or 0, item.stop
+        with self.index._lock:
+            data = self.index._data
+            column, value = data.column(self.scope)
+            if stop is None:
+                stop = len(data)
+            rows = _rows_backward(column, value, data.end(), start,
+                                  max(stop - start, 0))
+            return [data.key(i) for i in rows]
+
+    def seek(self, direction, pub_date, pk, limit):
+        with self.index._lock:
+            data = self.index._data
+            column, value = data.column(self.scope)
+            end = data.end()
+            micros = to_micros(pub_date)
+            i = min(data.position(micros, pk), end)
+            if direction == 'before':
+                if i < end and data.key(i) == (pub_date, pk):
+                    i += 1
+                rows = _rows_forward(column, value, i, end, limit)
+            else:
+                rows = _rows_backward(column, value, i, 0, limit)
+            return [data.key(i) for i in rows]
@@ -0,0 +1,159 @@
+"""Поиск запрещённых слов в любой словоформе.
+
+Текст приводится к нижнему регистру и разбивается на слова. Каждое
+неповторяющееся слово сводится к основе (blog.stemming) и ищется в
+неизменяемом множестве основ запрещённых слов, поэтому стоимость
+проверки не зависит от длины списка. Основы запрещённых слов
+хранятся в ForbiddenWord.stem; при сборке вычисляются только пустые —
+у строк, сохранённых в обход save().
+
+Запрещённые выражения из нескольких слов («что-то», «ну и ну»)
+ищутся буквально: они собираются в префиксное дерево и компилируются
+в одно регулярное выражение, которое находит их целиком и независимо
+от знаков препинания вокруг.
+
+Собранный список хранится в памяти процесса вместе с версией списка.
+Версия лежит в общем для всех процессов кеше (core.versions) и
+меняется при каждой правке ForbiddenWord (см. signals), поэтому другие
+процессы пересобирают список при следующей проверке.
+"""
+import re
+import threading
+
+from django.db import transaction
+
+from core import versions
+from .models import ForbiddenWord
+from .stemming import normalize, stem
+
+
+VERSION_KEY = 'blog:forbidden-words-version'
+
+TOKEN = re.compile(r'\w+')
+
+_lock = threading.Lock()
+_matcher = None
+
+
+def bump_version():
+    """Устаревает списки всех процессов сейчас и ещё раз после коммита.
+
+    Второй сброс не даёт процессу запомнить список, прочитанный до
+    фиксации транзакции, под новой версией.
+    """
+    versions.bump(VERSION_KEY)
+    transaction.on_commit(lambda: versions.bump(VERSION_KEY))
+
+
+def get_version():
+    return versions.get(VERSION_KEY)
+
+
+def _trie_pattern(node):
+    """Регулярное выражение для поддерева префиксного дерева."""
+    end = '' in node
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if len(branches) == 1 and not end:
+        return branches[0]
+    single = all(len(branch) == 1 for branch in branches)
+    pattern = (f'[{"".join(branches)}]' if single and len(branches) > 1
+               else f'(?:{"|".join(branches)})')
+    return f'{pattern}?' if end else pattern
+
+
+def compile_words(words):
+    """Одно регулярное выражение, находящее любое слово из words."""
+    trie = {}
+    for word in words:
+        # Слово ищется целиком, знаки по краям ему не нужны.
+        word = normalize(word)
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    if not trie:
+        return None
+    return re.compile(rf'\b{_trie_pattern(trie)}(?!\w)')
+
+
+class ForbiddenWordsMatcher:
+    """Собранный список запрещённых слов одной версии.
+
+    stems — готовые основы слов words в том же порядке; пустая основа
+    (строки из bulk_create, update или loaddata) вычисляется здесь.
+    """
+
+    def __init__(self, words, version=None, stems=None):
+        self.version = version
+        if stems is None:
+            stems = [''] * len(words)
+        # Нормализованное слово или его основа -> слово, как в списке.
+        self._entries = {}
+        phrases = []
+        for entry, word_stem in zip(words, stems):
+            word = normalize(entry)
+            if not word:
+                continue
+            if TOKEN.fullmatch(word):
+                self._entries.setdefault(word_stem or stem(word), entry)
+            else:
+                self._entries.setdefault(word, entry)
+                phrases.append(word)
+        self.stems = frozenset(self._entries).difference(phrases)
+        self._regex = compile_words(phrases)
+
+    def _find_lowered(self, lowered):
+        """Находка в тексте и ключ её слова в _entries."""
+        stems = self.stems
+        if stems:
+            for token in dict.fromkeys(TOKEN.findall(lowered)):
+                token_stem = stem(token)
+                if token_stem in stems:
+                    match = re.search(rf'\b{re.escape(token)}\b', lowered)
+                    return match, token_stem
+        if self._regex is not None:
+            match = self._regex.search(lowered)
+            if match is not None:
+                return match, match.group()
+        return None, None
+
+    def find(self, text):
+        """Первое запрещённое слово в text в написании автора или None."""
+        if not text:
+            return None
+        lowered = text.lower()
+        match, _ = self._find_lowered(lowered)
+        if match is None:
+            return None
+        if len(lowered) != len(text):
+            # Редкие символы меняют длину при lower(): позиции не совпадут.
+            return match.group()
+        return text[match.start():match.end()]
+
+    def find_entry(self, text):
+        """Слово списка, найденное в text в любой форме, или None."""
+        if not text:
+            return None
+        _, key = self._find_lowered(text.lower())
+        return self._entries.get(key)
+
+
+def get_matcher():
+    """Список текущей версии; пересобирается после правок."""
+    global _matcher
+    version = get_version()
+    matcher = _matcher
+    if matcher is not None and matcher.version == version:
+        return matcher
+    with _lock:
+        if _matcher is None or _matcher.version != version:
+            rows = list(ForbiddenWord.objects.values_list('word', 'stem'))
+            _matcher = ForbiddenWordsMatcher(
+                [word for word, _ in rows], version,
+                [word_stem for _, word_stem in rows])
+        return _matcher
@@ -1,19 +1,39 @@
 from django import forms
 from django.utils import timezone
 
+from .forbidden_words import get_matcher
 from .models import (Comment,
-                     ForbiddenWord,
                      Post)
 
 
-def validate_content_forbidden_words(value):
-    forbidden_words = set(ForbiddenWord.objects.values_list('word', flat=True))
-    for word in value.split():
-        if word.lower() in forbidden_words:
-            raise forms.ValidationError(f"{word} - запрещенное слово!")
+def validate_content_forbidden_words(value, matcher=None):
+    word = (matcher or get_matcher()).find(value)
+    if word is not None:
+        raise forms.ValidationError(f"{word} - запрещенное слово!")
 
 
-class PostForm(forms.ModelForm):
+class ForbiddenWordsMixin:
+    """Проверяет поля forbidden_words_fields одним автоматом на форму."""
+
+    forbidden_words_fields = ('text',)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        matcher = get_matcher()
+        for field in self.forbidden_words_fields:
+            value = cleaned_data.get(field)
+            if not value:
+                continue
+            try:
+                validate_content_forbidden_words(value, matcher)
+            except forms.ValidationError as error:
+                self.add_error(field, error)
+        return cleaned_data
+
+
+class PostForm(ForbiddenWordsMixin, forms.ModelForm):
+
+    forbidden_words_fields = ('title', 'text')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -21,18 +41,6 @@ class PostForm(forms.ModelForm):
         self.fields['pub_date'].initial = timezone.localtime(
             timezone.now()).strftime('%Y-%m-%dT%H:%M')
 
-    def clean_title(self):
-        text = self.cleaned_data.get('title')
-        if text:
-            validate_content_forbidden_words(self.cleaned_data.get('title'))
-        return text
-
-    def clean_text(self):
-        text = self.cleaned_data.get('text')
-        if text:
-            validate_content_forbidden_words(self.cleaned_data.get('text'))
-        return text
-
     class Meta:
         model = Post
         fields = ('title', 'text', 'image', 'location', 'category', 'pub_date')
@@ -44,13 +52,7 @@ class PostForm(forms.ModelForm):
         }
 
 
-class CommentForm(forms.ModelForm):
-
-    def clean_text(self):
-        text = self.cleaned_data.get('text')
-        if text:
-            validate_content_forbidden_words(self.cleaned_data.get('text'))
-        return text
+class CommentForm(ForbiddenWordsMixin, forms.ModelForm):
 
     class Meta:
         model = Comment
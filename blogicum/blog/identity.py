@@ -0,0 +1,29 @@
+"""Карта идентичности на время запроса.
+
+Представления блога получают объекты по ключу из URL в нескольких
+местах: в dispatch, test_func, get_object и get_context_data. Объект,
+найденный один раз, запоминается на самом запросе и дальше берётся
+из памяти, так что каждая строка читается из БД не больше раза.
+"""
+from django.shortcuts import get_object_or_404
+
+
+def _identity_map(request):
+    return request.__dict__.setdefault('_blog_identity_map', {})
+
+
+def get_object(request, queryset, **lookup):
+    """get_object_or_404, который помнит найденный объект до конца
+    запроса.
+
+    Объект запоминается и по условию поиска, и по первичному ключу.
+    Queryset первого обращения определяет, какие связи подгружены
+    заранее.
+    """
+    model = getattr(queryset, 'model', queryset)
+    identity_map = _identity_map(request)
+    key = (model, tuple(sorted(lookup.items())))
+    if key not in identity_map:
+        obj = get_object_or_404(queryset, **lookup)
+        identity_map[key] = identity_map[(model, (('pk', obj.pk),))] = obj
+    return identity_map[key]
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from blog.archive import ARCHIVE_KEY
+from blog.feed_cache import bump_versions, scopes_of_posts
+from blog.feed_index import feed_index
+from blog.models import Comment, FeedEntry, Post
+from blog.visibility import advance_epoch
+
+
+def delete_rows(model, using, field, values):
+    """DELETE строк model, у которых field входит в values, без сигналов."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    column = model._meta.get_field(field).column
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(column)} IN ({placeholders})',
+            list(values))
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты старше заданного возраста вместе с '
+            'комментариями в архивную базу порциями по первичному ключу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            required=True,
+            metavar='DAYS',
+            help='Переносить посты, опубликованные раньше, чем DAYS дней '
+                 'назад.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Сколько постов переносить за одну транзакцию.'
+        )
+
+    def handle(self, *args, older_than, chunk_size, **options):
+        archive = settings.BLOG_ARCHIVE_DB_ALIAS
+        if archive is None:
+            raise CommandError('Архив не настроен: BLOG_ARCHIVE_DB_ALIAS.')
+        cutoff = timezone.now() - timedelta(days=older_than)
+        posts_db = router.db_for_write(Post)
+        comments_db = router.db_for_write(Comment)
+        last_pk = 0
+        moved_posts = moved_comments = 0
+        while True:
+            # Строки читаются под блокировкой записи основной базы, так что
+            # правка поста не потеряется между копированием и удалением.
+            with transaction.atomic(using=comments_db), transaction.atomic():
+                posts = list(Post.objects
+                             .filter(pk__gt=last_pk, pub_date__lt=cutoff)
+                             .order_by('pk')[:chunk_size])
+                if not posts:
+                    break
+                last_pk = posts[-1].pk
+                pks = [post.pk for post in posts]
+                comments = Comment.objects.filter(post__in=pks)
+                copies = list(comments)
+                # Повторный запуск после сбоя не споткнётся о строки,
+                # которые уже успели попасть в архив.
+                with transaction.atomic(using=archive):
+                    Post.objects.using(archive).bulk_create(
+                        posts, ignore_conflicts=True)
+                    Comment.objects.using(archive).bulk_create(
+                        copies, ignore_conflicts=True)
+                # Порция удаляется без посигнальной обработки: ленты,
+                # индекс и эпоха сбрасываются один раз на порцию.
+                scopes = scopes_of_posts(Post.objects.filter(pk__in=pks))
+                delete_rows(Comment, comments_db, 'post', pks)
+                FeedEntry.objects.filter(post_id__in=pks).delete()
+                delete_rows(Post, posts_db, 'id', pks)
+                bump_versions(*scopes)
+                advance_epoch()
+                feed_index.sync_on_commit(pks)
+            moved_posts += len(posts)
+            moved_comments += len(copies)
+            cache.set(ARCHIVE_KEY, True, None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив постов: {moved_posts}, '
+            f'комментариев: {moved_comments}'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.feed_cache import bump_versions, scopes_of_posts
+from blog.models import Post, make_excerpt
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сохранённые анонсы постов порциями по '
+            'первичному ключу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Сколько постов пересчитывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Обработать только посты с пустым анонсом.'
+        )
+
+    def handle(self, *args, chunk_size, missing, **options):
+        posts = Post.objects.only('pk', 'text', 'excerpt', 'updated_at')
+        if missing:
+            posts = posts.filter(excerpt='')
+        last_pk = 0
+        fixed = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk).order_by('pk')
+                         [:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            changed = []
+            for post in chunk:
+                excerpt = make_excerpt(post.text)
+                if post.excerpt != excerpt:
+                    # updated_at входит в ключ кеша карточки поста.
+                    post.excerpt, post.updated_at = excerpt, timezone.now()
+                    changed.append(post)
+            if not changed:
+                continue
+            with transaction.atomic():
+                Post.objects.bulk_update(changed, ['excerpt', 'updated_at'])
+            bump_versions(*scopes_of_posts(
+                Post.objects.filter(pk__in=[post.pk for post in changed])))
+            fixed += len(changed)
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено анонсов: {fixed}')
+        )
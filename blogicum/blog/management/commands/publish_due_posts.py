@@ -0,0 +1,31 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.visibility import get_epoch, get_next_due, refresh_next_due
+
+
+class Command(BaseCommand):
+    help = ('Продвигает эпоху видимости ленты, если наступила дата '
+            'отложенной публикации. Подходит для запуска по cron.')
+
+    def handle(self, *args, **options):
+        # Сначала наступившие публикации продвигают эпоху, а потом
+        # водяной знак пересчитывается по базе: он мог устареть, если
+        # посты меняли в обход сигналов (например, через update()).
+        get_epoch()
+        refresh_next_due()
+        epoch = get_epoch()
+        next_due = get_next_due()
+        if next_due == math.inf:
+            next_due_repr = 'нет отложенных публикаций'
+        else:
+            next_due_repr = timezone.localtime(
+                datetime.fromtimestamp(next_due, tz=dt_timezone.utc)
+            ).isoformat()
+        self.stdout.write(self.style.SUCCESS(
+            f'Эпоха видимости: {epoch}; '
+            f'следующая публикация: {next_due_repr}'
+        ))
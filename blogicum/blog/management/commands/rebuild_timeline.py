@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from blog.feed_cache import bump_versions, scopes_of_posts
+from blog.feed_index import feed_index
+from blog.models import FeedChange, Post, TimelineRebuild
+from blog.timeline import sync_posts
+from blog.visibility import advance_epoch
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает материализованные ленты. С --incremental '
+            'обрабатывает только посты, изменённые после прошлого запуска.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Пересобрать только изменившиеся посты.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Сколько постов пересобирать за один шаг.'
+        )
+
+    def handle(self, *args, incremental, chunk_size, **options):
+        started_at = timezone.now()
+        posts = Post.objects.all()
+        watermark = None
+        if incremental:
+            watermark = (TimelineRebuild.objects
+                         .order_by('-started_at')
+                         .values_list('started_at', flat=True)
+                         .first())
+        if watermark is not None:
+            # Правка категории меняет видимость её постов.
+            posts = posts.filter(
+                Q(updated_at__gt=watermark)
+                | Q(category__updated_at__gt=watermark)
+            )
+
+        last_pk = 0
+        synced = 0
+        while True:
+            pks = list(posts
+                       .filter(pk__gt=last_pk)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            sync_posts(pks)
+            feed_index.sync_on_commit(pks)
+            bump_versions(*scopes_of_posts(Post.objects.filter(pk__in=pks)))
+            synced += len(pks)
+            last_pk = pks[-1]
+
+        if synced:
+            advance_epoch()
+        TimelineRebuild.objects.create(
+            started_at=started_at, incremental=incremental, synced=synced)
+        FeedChange.objects.filter(
+            changed_at__lt=started_at - timedelta(
+                seconds=settings.BLOG_FEED_CHANGES_KEEP)
+        ).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано постов: {synced}')
+        )
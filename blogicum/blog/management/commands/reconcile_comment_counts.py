@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сохранённое число комментариев у постов '
+            'порциями по первичному ключу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько постов пересчитывать в одной транзакции.'
+        )
+
+    def handle(self, *args, chunk_size, **options):
+        last_pk = 0
+        fixed = 0
+        while True:
+            pks = list(Post.objects
+                       .filter(pk__gt=last_pk)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            # Комментарии могут лежать в другой базе: считаем их отдельным
+            # запросом по списку постов, а не подзапросом.
+            actual = Comment.objects.filter(post__in=pks).counts_by_post()
+            with transaction.atomic():
+                stored = (Post.objects
+                          .filter(pk__in=pks)
+                          .values_list('pk', 'comment_count'))
+                for pk, count in stored:
+                    delta = actual.get(pk, 0) - count
+                    if delta:
+                        (Post.objects.filter(pk=pk)
+                         .adjust_comment_count(delta))
+                        fixed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {fixed}')
+        )
@@ -0,0 +1,78 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import ForbiddenWord
+from blog.rescan import ACTIONS, TARGETS, RescanLocked, rescan
+
+
+class Command(BaseCommand):
+    help = ('Проверяет уже опубликованные посты и комментарии на '
+            'запрещённые слова в нескольких процессах и отмечает или '
+            'снимает с публикации найденное. Прерванная проверка '
+            'продолжается с последней точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=TARGETS,
+            dest='kinds',
+            help='Что проверять; можно повторять. По умолчанию — всё.'
+        )
+        parser.add_argument(
+            '--word',
+            action='append',
+            dest='words',
+            help='Искать только это слово из списка; можно повторять.'
+        )
+        parser.add_argument(
+            '--action',
+            choices=ACTIONS,
+            default='flag',
+            help='flag — отметить найденное, unpublish — ещё и снять с '
+                 'публикации.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько записей читать и проверять за одну порцию.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Сколько процессов проверяют порции.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать заново, не продолжая с прошлой точки.'
+        )
+
+    def handle(self, *args, kinds, words, action, chunk_size, workers,
+               restart, verbosity, **options):
+        forbidden = ForbiddenWord.objects.values_list('word', flat=True)
+        if words:
+            forbidden = forbidden.filter(word__in=words)
+        forbidden = list(forbidden)
+        if not forbidden:
+            raise CommandError('Нет запрещённых слов для проверки.')
+
+        def progress(scanned, hits, last_pk):
+            if verbosity > 1:
+                self.stdout.write(f'  проверено {scanned}, найдено {hits}, '
+                                  f'последний id {last_pk}')
+
+        for kind in kinds or TARGETS:
+            try:
+                stats = rescan(kind, forbidden, action, chunk_size, workers,
+                               restart, progress)
+            except RescanLocked as error:
+                raise CommandError(error)
+            resumed = (f' (продолжено с id {stats.resumed_from})'
+                       if stats.resumed_from else '')
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: проверено {stats.scanned}{resumed}, '
+                f'найдено {stats.hits}.'))
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    tables = schema_editor.connection.introspection.table_names()
+    if Comment._meta.db_table not in tables:
+        # Комментарии в отдельной базе: счётчики пересчитывает
+        # reconcile_comment_counts.
+        return
+    Post = apps.get_model('blog', 'Post')
+    comments = (Comment.objects
+                .filter(post=OuterRef('pk'), is_published=True)
+                .order_by()
+                .values('post')
+                .annotate(count=Count('pk'))
+                .values('count'))
+    Post.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_comment_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feed_entries(apps, schema_editor):
+    FeedEntry = apps.get_model('blog', 'FeedEntry')
+    Post = apps.get_model('blog', 'Post')
+    posts = (Post.objects
+             .filter(is_visible=True)
+             .select_related('author', 'category', 'location'))
+    entries = []
+    for post in posts.iterator():
+        location_name = ''
+        if post.location and post.location.is_published:
+            location_name = post.location.name
+        for scope in ('global', f'author:{post.author_id}',
+                      f'category:{post.category_id}'):
+            entries.append(FeedEntry(
+                scope=scope,
+                pub_date=post.pub_date,
+                post_id=post.pk,
+                title=post.title,
+                author_username=post.author.username,
+                category_slug=post.category.slug,
+                category_title=post.category.title,
+                location_name=location_name,
+                comment_count=post.comment_count,
+                image=post.image.name or '',
+            ))
+        if len(entries) >= 999:
+            FeedEntry.objects.bulk_create(entries)
+            entries = []
+    FeedEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64, verbose_name='Лента')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата и время публикации')),
+                ('title', models.CharField(max_length=256, verbose_name='Заголовок')),
+                ('author_username', models.CharField(max_length=150, verbose_name='Автор')),
+                ('category_slug', models.SlugField(db_index=False, verbose_name='Категория')),
+                ('category_title', models.CharField(max_length=256, verbose_name='Название категории')),
+                ('location_name', models.CharField(blank=True, max_length=256, verbose_name='Местоположение')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='Количество комментариев')),
+                ('image', models.CharField(blank=True, max_length=100, verbose_name='Фото')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='blog.post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'Записи лент',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['scope', 'pub_date', 'post'], name='feedentry_scope_pub_date_idx'),
+        ),
+        migrations.RunPython(fill_feed_entries,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:49
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.only('pk', 'text').order_by('pk')
+    batch = []
+    for post in posts.iterator(chunk_size=500):
+        post.excerpt = Truncator(post.text).words(10, truncate=' …')
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Первые слова текста для карточки в ленте.', verbose_name='Анонс'),
+        ),
+        migrations.RunPython(fill_excerpts,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_comment_without_db_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RescanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16, unique=True, verbose_name='Что проверяется')),
+                ('last_pk', models.BigIntegerField(default=0, verbose_name='Последний проверенный id')),
+                ('words_digest', models.CharField(help_text='Сменился список — проверка начинается заново.', max_length=40, verbose_name='Отпечаток списка слов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'точка проверки',
+                'verbose_name_plural': 'Точки проверки',
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='forbidden_word',
+            field=models.CharField(blank=True, help_text='Заполняет rescan_forbidden_words; очистите после проверки.', max_length=25, verbose_name='Найденное запрещённое слово'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='forbidden_word',
+            field=models.CharField(blank=True, help_text='Заполняет rescan_forbidden_words; очистите после проверки.', max_length=25, verbose_name='Найденное запрещённое слово'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+from blog.stemming import normalize, stem
+
+
+def fill_stems(apps, schema_editor):
+    ForbiddenWord = apps.get_model('blog', 'ForbiddenWord')
+    words = list(ForbiddenWord.objects.only('pk', 'word'))
+    for word in words:
+        word.stem = stem(normalize(word.word))
+    ForbiddenWord.objects.bulk_update(words, ['stem'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_rescan_forbidden_words'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forbiddenword',
+            name='stem',
+            field=models.CharField(blank=True, editable=False, help_text='Слово ищется во всех формах с этой основой.', max_length=25, verbose_name='Основа'),
+        ),
+        migrations.RunPython(fill_stems,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_forbiddenword_stem'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='author_username',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='category_slug',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='category_title',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='comment_count',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='image',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='location_name',
+        ),
+        migrations.RemoveField(
+            model_name='feedentry',
+            name='title',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_feedentry_drop_card_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineRebuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Начало')),
+                ('incremental', models.BooleanField(default=False, verbose_name='Инкрементальная')),
+                ('synced', models.PositiveIntegerField(default=0, verbose_name='Пересобрано постов')),
+            ],
+            options={
+                'verbose_name': 'пересборка лент',
+                'verbose_name_plural': 'Пересборки лент',
+                'get_latest_by': 'started_at',
+            },
+        ),
+    ]
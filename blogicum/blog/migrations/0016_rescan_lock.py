@@ -0,0 +1,40 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_timelinerebuild'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RescanLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16, unique=True, verbose_name='Что проверяется')),
+                ('owner', models.CharField(blank=True, help_text='Узел и процесс проверки; пусто — проверка не идёт.', max_length=64, verbose_name='Владелец')),
+                ('heartbeat', models.DateTimeField(blank=True, help_text='Замолчавшая проверка не держит блокировку.', null=True, verbose_name='Последний признак жизни')),
+            ],
+            options={
+                'verbose_name': 'блокировка проверки',
+                'verbose_name_plural': 'Блокировки проверки',
+            },
+        ),
+        migrations.AlterField(
+            model_name='rescancheckpoint',
+            name='kind',
+            field=models.CharField(max_length=16, verbose_name='Что проверяется'),
+        ),
+        migrations.AlterField(
+            model_name='rescancheckpoint',
+            name='words_digest',
+            field=models.CharField(help_text='У каждого списка слов своя точка проверки.', max_length=40, verbose_name='Отпечаток списка слов'),
+        ),
+        migrations.AddConstraint(
+            model_name='rescancheckpoint',
+            constraint=models.UniqueConstraint(fields=('kind', 'words_digest'), name='rescancheckpoint_kind_digest'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_rescan_lock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(verbose_name='id поста')),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'изменение ленты',
+                'verbose_name_plural': 'Изменения лент',
+            },
+        ),
+    ]
@@ -1,10 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.text import Truncator
 
 from core.models import PublishedModel
+from .cards import CARD_FIELDS, PostCardIterable
+from .stemming import normalize, stem
 
 
 SORT_ORDER = '-pub_date'
+# Полный порядок ленты: id разводит посты с одинаковой датой.
+FEED_ORDER = (SORT_ORDER, '-pk')
+# Сколько слов текста показывает карточка поста в ленте.
+EXCERPT_WORDS = 10
 
 User = get_user_model()
 
@@ -26,6 +35,26 @@ class Category(PublishedModel):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Видимость постов меняется до сохранения: обработчики post_save
+        # пересобирают ленты по is_visible и должны увидеть новое значение.
+        with transaction.atomic():
+            if self.pk is not None:
+                self._update_post_visibility()
+            super().save(*args, **kwargs)
+
+    def _update_post_visibility(self):
+        # Видимость постов категории меняется одним UPDATE по индексу
+        # category_id, без загрузки самих постов.
+        if self.is_published:
+            (Post.objects
+             .filter(category=self, is_published=True, is_visible=False)
+             .update(is_visible=True))
+        else:
+            (Post.objects
+             .filter(category=self, is_visible=True)
+             .update(is_visible=False))
+
 
 class Location(PublishedModel):
     name = models.CharField(
@@ -41,12 +70,57 @@ class Location(PublishedModel):
         return self.name
 
 
+def make_excerpt(text):
+    """Анонс для карточки: то же, что фильтр truncatewords."""
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+
+
+class PostQuerySet(models.QuerySet):
+    keyset = ('pub_date', 'pk')
+
+    def published(self):
+        """Посты, видимые всем: опубликованные, в опубликованной категории
+        и с наступившей датой публикации.
+        """
+        return self.filter(is_visible=True, pub_date__lte=timezone.now())
+
+    def by_author(self, author):
+        return self.filter(author=author)
+
+    def in_category(self, category):
+        return self.filter(category=category)
+
+    def adjust_comment_count(self, delta):
+        """Атомарно сдвигает счётчик комментариев без чтения постов."""
+        return self.update(comment_count=F('comment_count') + delta)
+
+    def for_card(self):
+        """Подтягивает одним запросом всё, что выводит карточка поста."""
+        return self.select_related('author', 'category', 'location')
+
+    def for_feed(self):
+        """Карточки ленты: без полного текста, карточке хватает анонса."""
+        return self.for_card().defer('text')
+
+    def cards(self):
+        """Строки для карточек ленты в виде PostCard, а не моделей."""
+        clone = self.values(*CARD_FIELDS)
+        clone._iterable_class = PostCardIterable
+        return clone
+
+
 class Post(PublishedModel):
     title = models.CharField(
         'Заголовок',
         max_length=256
     )
     text = models.TextField('Текст')
+    excerpt = models.TextField(
+        'Анонс',
+        blank=True,
+        editable=False,
+        help_text='Первые слова текста для карточки в ленте.'
+    )
     pub_date = models.DateTimeField(
         'Дата и время публикации',
         help_text='Если установить дату и время в '
@@ -75,34 +149,138 @@ class Post(PublishedModel):
         upload_to='posts_image',
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    is_visible = models.BooleanField(
+        'Виден в ленте',
+        default=False,
+        editable=False,
+        help_text='Пост и его категория опубликованы.'
+    )
+    forbidden_word = models.CharField(
+        'Найденное запрещённое слово',
+        max_length=25,
+        blank=True,
+        help_text='Заполняет rescan_forbidden_words; очистите после '
+                  'проверки.'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
         ordering = (SORT_ORDER,)
+        # Индексы повторяют форму запросов ленты: равенство по FK, затем
+        # диапазон и сортировка по pub_date. Частичные индексы содержат
+        # только видимые посты; SQLite сравнивает булево поле без `= 1`,
+        # поэтому is_visible вынесен в условие, а не в колонку.
+        indexes = (
+            models.Index(
+                fields=('pub_date',),
+                condition=Q(is_visible=True),
+                name='post_visible_pub_date_idx',
+            ),
+            models.Index(
+                fields=('category', 'pub_date'),
+                condition=Q(is_visible=True),
+                name='post_category_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.is_visible = bool(
+            self.is_published
+            and self.category is not None
+            and self.category.is_published
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {*update_fields, 'is_visible'}
+            if 'text' in update_fields:
+                update_fields.add('excerpt')
+            kwargs['update_fields'] = update_fields
+        if update_fields is None or 'excerpt' in update_fields:
+            self.excerpt = make_excerpt(self.text)
+        super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+    # Индекс (post, created_at) неявно продолжается первичным ключом,
+    # поэтому порядок (created_at, id) не требует сортировки.
+    keyset = ('created_at', 'pk')
+
+    def for_post(self, post):
+        """Опубликованные комментарии поста с авторами в порядке добавления.
+
+        Это те же комментарии, что считает Post.comment_count. Комментарии
+        могут лежать в отдельной базе (core.db_router), поэтому авторы
+        подтягиваются вторым запросом по списку id, а не JOIN.
+        """
+        return (self
+                .filter(post=post, is_published=True)
+                .prefetch_related('author')
+                .order_by(*self.keyset))
+
+    def counts_by_post(self):
+        """Число опубликованных комментариев по постам: {post_id: count}."""
+        return dict(self
+                    .filter(is_published=True)
+                    .order_by()
+                    .values_list('post')
+                    .annotate(Count('pk')))
+
 
 class Comment(PublishedModel):
     text = models.TextField('Текст комментария')
+    # Ссылки без ограничений в базе: таблица может жить в отдельном файле
+    # SQLite, а каскадное удаление делают сигналы blog.signals.
     post = models.ForeignKey(
         Post,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name='comments',
         verbose_name='Комментарий'
     )
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         verbose_name='Автор'
     )
+    forbidden_word = models.CharField(
+        'Найденное запрещённое слово',
+        max_length=25,
+        blank=True,
+        help_text='Заполняет rescan_forbidden_words; очистите после '
+                  'проверки.'
+    )
+    # Карточки постов не зависят от правок комментариев, а вторая дата
+    # рядом с created_at комментарию не нужна.
+    updated_at = None
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created_at',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created_at'),
+                name='comment_post_created_at_idx',
+            ),
+        )
 
     def __str__(self):
         return f'Коментарий {self.author.username} в посте {self.post.title}'
@@ -114,6 +292,13 @@ class ForbiddenWord(models.Model):
         max_length=25,
         unique=True
     )
+    stem = models.CharField(
+        'Основа',
+        max_length=25,
+        blank=True,
+        editable=False,
+        help_text='Слово ищется во всех формах с этой основой.'
+    )
 
     class Meta:
         verbose_name = "Запрещенное слово"
@@ -121,3 +306,144 @@ class ForbiddenWord(models.Model):
 
     def __str__(self):
         return self.word
+
+    def save(self, *args, **kwargs):
+        self.stem = stem(normalize(self.word))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'word' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'stem'}
+        super().save(*args, **kwargs)
+
+
+class RescanCheckpoint(models.Model):
+    """Докуда дошла проверка записей на запрещённые слова из списка."""
+
+    kind = models.CharField('Что проверяется', max_length=16)
+    last_pk = models.BigIntegerField('Последний проверенный id', default=0)
+    words_digest = models.CharField(
+        'Отпечаток списка слов',
+        max_length=40,
+        help_text='У каждого списка слов своя точка проверки.'
+    )
+    updated_at = models.DateTimeField('Изменено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'точка проверки'
+        verbose_name_plural = 'Точки проверки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'words_digest'),
+                name='rescancheckpoint_kind_digest',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind}: {self.last_pk}'
+
+
+class RescanLock(models.Model):
+    """Идущая проверка записей одного вида; второй запуск отказывается."""
+
+    kind = models.CharField('Что проверяется', max_length=16, unique=True)
+    owner = models.CharField(
+        'Владелец',
+        max_length=64,
+        blank=True,
+        help_text='Узел и процесс проверки; пусто — проверка не идёт.'
+    )
+    heartbeat = models.DateTimeField(
+        'Последний признак жизни',
+        null=True,
+        blank=True,
+        help_text='Замолчавшая проверка не держит блокировку.'
+    )
+
+    class Meta:
+        verbose_name = 'блокировка проверки'
+        verbose_name_plural = 'Блокировки проверки'
+
+    def __str__(self):
+        return f'{self.kind}: {self.owner or "свободна"}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    keyset = ('pub_date', 'post_id')
+
+    def in_scope(self, scope):
+        """Наступившие записи ленты в порядке показа."""
+        return (self
+                .filter(scope=scope, pub_date__lte=timezone.now())
+                .order_by('-pub_date', '-post_id'))
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты.
+
+    Видимый пост попадает в общую ленту, ленту своей категории и ленту
+    автора. Запись хранит только порядок ленты: карточки строятся по
+    самим постам (timeline.posts_for_entries).
+    """
+
+    scope = models.CharField('Лента', max_length=64)
+    pub_date = models.DateTimeField('Дата и время публикации')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Публикация'
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Записи лент'
+        indexes = (
+            models.Index(
+                fields=('scope', 'pub_date', 'post'),
+                name='feedentry_scope_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.scope}: {self.post_id}'
+
+
+class TimelineRebuild(models.Model):
+    """Запуск rebuild_timeline.
+
+    Начало последнего запуска — водяной знак инкрементальной
+    пересборки: она берёт только посты, изменённые после него.
+    """
+
+    started_at = models.DateTimeField('Начало')
+    incremental = models.BooleanField('Инкрементальная', default=False)
+    synced = models.PositiveIntegerField('Пересобрано постов', default=0)
+
+    class Meta:
+        verbose_name = 'пересборка лент'
+        verbose_name_plural = 'Пересборки лент'
+        get_latest_by = 'started_at'
+
+    def __str__(self):
+        return f'{self.started_at}: {self.synced}'
+
+
+class FeedChange(models.Model):
+    """Пост, чьё место в лентах могло измениться.
+
+    Журнал для индексов лент в памяти других процессов (blog.feed_index):
+    они догоняют его по возрастанию id и перечитывают только эти посты.
+    Старые записи удаляет rebuild_timeline.
+    """
+
+    post_id = models.BigIntegerField('id поста')
+    changed_at = models.DateTimeField(
+        'Изменено', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'изменение ленты'
+        verbose_name_plural = 'Изменения лент'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.changed_at}'
@@ -0,0 +1,223 @@
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.shortcuts import redirect
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .visibility import get_epoch
+
+
+CURSOR_SALT = 'blog.feed.cursor'
+
+MIN_DATE = datetime.min.replace(tzinfo=timezone.utc)
+MAX_DATE = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def get_keyset(queryset):
+    """Поля (дата, id), по которым упорядочена и листается лента."""
+    return getattr(queryset, 'keyset', ('pub_date', 'pk'))
+
+
+def encode_cursor(pub_date, pk):
+    """Упаковывает позицию в ленте в подписанный непрозрачный токен."""
+    return signing.dumps((pub_date.isoformat(), pk),
+                         salt=CURSOR_SALT, compress=True)
+
+
+def _row_cursor(row, keyset):
+    return encode_cursor(*(getattr(row, field) for field in keyset))
+
+
+def seek(source, direction, pub_date, pk, limit):
+    """Строки ленты строго после (`after`, старше) или до (`before`,
+    новее) позиции курсора. `before` отдаёт их от старых к новым.
+
+    Источник, не являющийся QuerySet, может реализовать `seek` сам.
+    """
+    if hasattr(source, 'seek'):
+        return source.seek(direction, pub_date, pk, limit)
+    date_field, id_field = get_keyset(source)
+    if direction == 'before':
+        lookup, order = 'gt', (date_field, id_field)
+        bound = (pub_date, MAX_DATE)
+    else:
+        lookup, order = 'lt', (f'-{date_field}', f'-{id_field}')
+        bound = (MIN_DATE, pub_date)
+    # Избыточная граница по дате задаёт SQLite диапазон индекса от
+    # курсора, иначе он сканирует все строки новее курсора. Из нескольких
+    # границ с одной стороны SQLite берёт первую в WHERE, а фильтры
+    # queryset стоят раньше; половины BETWEEN он берёт только парой,
+    # поэтому граница курсора записывается диапазоном.
+    return list(source
+                .filter(Q(**{f'{date_field}__range': bound}),
+                        Q(**{f'{date_field}__{lookup}': pub_date})
+                        | Q(**{date_field: pub_date,
+                               f'{id_field}__{lookup}': pk}))
+                .order_by(*order)[:limit])
+
+
+def key_at(source, offset):
+    """Ключ (дата, id) строки ленты с номером offset или None."""
+    date_field, id_field = get_keyset(source)
+    if isinstance(source, QuerySet):
+        source = (source
+                  .select_related(None)
+                  .order_by(f'-{date_field}', f'-{id_field}')
+                  .only(date_field, id_field))
+    rows = list(source[offset:offset + 1])
+    if not rows:
+        return None
+    return getattr(rows[0], date_field), getattr(rows[0], id_field)
+
+
+def decode_cursor(token):
+    try:
+        pub_date, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise Http404('Некорректная позиция в ленте')
+    pub_date = parse_datetime(pub_date)
+    if pub_date is None:
+        raise Http404('Некорректная позиция в ленте')
+    return pub_date, pk
+
+
+class FeedPaginator(Paginator):
+    """Paginator, который хранит COUNT ленты в кеше.
+
+    Ключ задаёт представление (лента, категория, автор, видимость) и
+    эпоха видимости, срок жизни — BLOG_FEED_COUNT_TTL.
+    """
+
+    def __init__(self, *args, count_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.object_list.count()
+        key = f'blog:feed-count:{get_epoch()}:{self.count_key}'
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, settings.BLOG_FEED_COUNT_TTL)
+        return count
+
+
+class CursorPage:
+    """Страница ленты, найденная поиском по ключу (pub_date, id).
+
+    Повторяет ту часть интерфейса `Page`, которой пользуются шаблоны.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginationMixin:
+    """Keyset-пагинация для ListView ленты.
+
+    Режим включается параметрами `?after=` или `?before=`: страница ищется
+    по индексу от позиции курсора, а наличие следующей страницы
+    определяется по лишней строке вместо COUNT. Страницы `?page=` глубже
+    BLOG_MAX_OFFSET_PAGE перенаправляются в курсорный режим.
+    """
+
+    paginator_class = FeedPaginator
+
+    def get_count_key(self):
+        """Ключ кеша для размера ленты; уточняется в представлениях."""
+        return type(self).__name__
+
+    def get_paginator(self, *args, **kwargs):
+        return super().get_paginator(
+            *args, count_key=self.get_count_key(), **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = context.get('paginator')
+        if paginator is not None:
+            context['page_range'] = list(paginator.get_elided_page_range(
+                context['page_obj'].number))
+        return context
+
+    def get(self, request, *args, **kwargs):
+        if not self._cursor_params():
+            response = self._redirect_deep_offset_page()
+            if response:
+                return response
+        return super().get(request, *args, **kwargs)
+
+    def _cursor_params(self):
+        return {key: self.request.GET[key]
+                for key in ('after', 'before') if key in self.request.GET}
+
+    def _redirect_deep_offset_page(self):
+        max_page = settings.BLOG_MAX_OFFSET_PAGE
+        try:
+            page = int(self.request.GET.get(self.page_kwarg, 1))
+        except ValueError:
+            return None
+        if page <= max_page:
+            return None
+        # Продолжаем ленту с конца последней разрешённой offset-страницы:
+        # дальше OFFSET не растёт, сколько бы страниц ни запросили.
+        offset = max_page * self.get_paginate_by(None) - 1
+        boundary = key_at(self.get_queryset(), offset)
+        if boundary is None:
+            return None
+        query = urlencode({'after': encode_cursor(*boundary)})
+        return redirect(f'{self.request.path}?{query}')
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self._cursor_params()
+        if not cursor:
+            return super().paginate_queryset(queryset, page_size)
+
+        keyset = get_keyset(queryset)
+        if 'before' in cursor:
+            pub_date, pk = decode_cursor(cursor['before'])
+            rows = seek(queryset, 'before', pub_date, pk, page_size + 1)
+            has_previous = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_next = True
+        else:
+            pub_date, pk = decode_cursor(cursor['after'])
+            rows = seek(queryset, 'after', pub_date, pk, page_size + 1)
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            has_previous = True
+        page = CursorPage(
+            rows,
+            next_cursor=(_row_cursor(rows[-1], keyset)
+                         if has_next and rows else None),
+            previous_cursor=(_row_cursor(rows[0], keyset)
+                             if has_previous and rows else None),
+        )
+        return None, page, page.object_list, True
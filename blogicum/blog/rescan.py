@@ -0,0 +1,233 @@
+"""Проверка уже опубликованных постов и комментариев на запрещённые слова.
+
+Строки читаются порциями по id (WHERE id > последнего LIMIT порции),
+каждая — отдельным запросом, который выбирается до конца: открытый
+курсор чтения держал бы снимок базы, и запись порции упиралась бы в
+`database is locked`, как только чужая транзакция зафиксирована.
+Порции уходят в пул процессов: у каждого работника свой автомат
+blog.forbidden_words, собранный один раз. Результаты применяются в
+порядке порций — массовыми UPDATE найденных строк, по одному на слово,
+вместе с записью точки проверки RescanCheckpoint, поэтому прерванная
+проверка продолжается с последней применённой порции. У каждого списка
+слов своя точка: проверка по другому списку начинается сначала и не
+сбивает прерванную.
+
+Записи одного вида проверяет только один процесс: он держит строку
+RescanLock и обновляет в ней признак жизни с каждой порцией. Второй
+запуск получает RescanLocked; блокировку, замолчавшую дольше
+LOCK_TIMEOUT, забирает следующий запуск.
+
+Архивная база не проверяется: её записи никто не редактирует и не
+показывает в лентах.
+"""
+import hashlib
+import multiprocessing
+import os
+import socket
+import uuid
+from collections import deque, namedtuple
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .feed_cache import bump_versions, scopes_of_posts
+from .feed_index import feed_index
+from .forbidden_words import ForbiddenWordsMatcher
+from .models import Comment, Post, RescanCheckpoint, RescanLock
+from .timeline import sync_posts
+from .visibility import advance_epoch
+
+
+ACTIONS = ('flag', 'unpublish')
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+RescanStats = namedtuple('RescanStats', 'scanned hits resumed_from')
+
+_worker_matcher = None
+
+
+class RescanLocked(Exception):
+    """Записи этого вида уже проверяет другой процесс."""
+
+
+def acquire_lock(kind):
+    """Занимает проверку записей вида kind; возвращает имя владельца."""
+    owner = (f'{socket.gethostname()[:40]}:{os.getpid()}:'
+             f'{uuid.uuid4().hex[:8]}')
+    RescanLock.objects.get_or_create(kind=kind)
+    now = timezone.now()
+    # Условный UPDATE атомарен: из двух запусков строку получит один.
+    taken = (RescanLock.objects
+             .filter(kind=kind)
+             .filter(Q(owner='') | Q(heartbeat__lt=now - LOCK_TIMEOUT))
+             .update(owner=owner, heartbeat=now))
+    if not taken:
+        raise RescanLocked(f'Проверка «{kind}» уже идёт.')
+    return owner
+
+
+def _heartbeat(kind, owner):
+    taken = (RescanLock.objects
+             .filter(kind=kind, owner=owner)
+             .update(heartbeat=timezone.now()))
+    if not taken:
+        raise RescanLocked(f'Проверку «{kind}» забрал другой процесс.')
+
+
+def release_lock(kind, owner):
+    (RescanLock.objects
+     .filter(kind=kind, owner=owner)
+     .update(owner='', heartbeat=None))
+
+
+def is_running(kind):
+    """Идёт ли сейчас проверка записей вида kind."""
+    return (RescanLock.objects
+            .filter(kind=kind, heartbeat__gte=timezone.now() - LOCK_TIMEOUT)
+            .exclude(owner='')
+            .exists())
+
+
+def words_digest(words):
+    return hashlib.sha1('\n'.join(sorted(words)).encode()).hexdigest()
+
+
+def _init_worker(words):
+    global _worker_matcher
+    _worker_matcher = ForbiddenWordsMatcher(words)
+
+
+def scan_rows(rows):
+    """Находки в строках (id, текст, ...): {слово списка: [id, ...]}."""
+    find_entry = _worker_matcher.find_entry
+    hits = {}
+    for pk, *texts in rows:
+        for text in texts:
+            word = find_entry(text)
+            if word is not None:
+                hits.setdefault(word, []).append(pk)
+                break
+    return hits
+
+
+def _batches(model, fields, start, chunk_size):
+    while True:
+        batch = list(model.objects
+                     .filter(pk__gt=start)
+                     .order_by('pk')
+                     .values_list('pk', *fields)[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        start = batch[-1][0]
+
+
+def _scan(batches, words, workers):
+    """Отдаёт (порция, находки) в порядке порций.
+
+    В работе не больше двух порций на процесс: поток строк не
+    накапливается в очереди пула, сколько бы строк ни было в таблице.
+    """
+    if workers <= 1:
+        _init_worker(words)
+        for batch in batches:
+            yield batch, scan_rows(batch)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (words,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.apply_async(scan_rows, (batch,))))
+            if len(pending) >= 2 * workers:
+                batch, result = pending.popleft()
+                yield batch, result.get()
+        while pending:
+            batch, result = pending.popleft()
+            yield batch, result.get()
+
+
+def _mark(model, hits):
+    for word, pks in hits.items():
+        model.objects.filter(pk__in=pks).update(forbidden_word=word)
+
+
+def flag_posts(hits, unpublish=False):
+    _mark(Post, hits)
+    if not unpublish:
+        return
+    pks = [pk for word_pks in hits.values() for pk in word_pks]
+    posts = Post.objects.filter(pk__in=pks)
+    scopes = scopes_of_posts(posts)
+    # updated_at входит в ключ кеша карточки поста.
+    posts.update(is_published=False, is_visible=False,
+                 updated_at=timezone.now())
+    sync_posts(pks)
+    feed_index.sync_on_commit(pks)
+    bump_versions(*scopes)
+    advance_epoch()
+
+
+def flag_comments(hits, unpublish=False):
+    _mark(Comment, hits)
+    if not unpublish:
+        return
+    comments = Comment.objects.filter(
+        pk__in=[pk for word_pks in hits.values() for pk in word_pks])
+    per_post = comments.counts_by_post()
+    comments.update(is_published=False)
+    for post_id, hidden in per_post.items():
+        Post.objects.filter(pk=post_id).adjust_comment_count(-hidden)
+    if per_post:
+        bump_versions(*scopes_of_posts(Post.objects.filter(pk__in=per_post)))
+
+
+TARGETS = {
+    'post': (Post, ('title', 'text'), flag_posts),
+    'comment': (Comment, ('text',), flag_comments),
+}
+
+
+def rescan(kind, words, action='flag', chunk_size=1000, workers=1,
+           restart=False, progress=None):
+    """Проверяет записи вида kind ('post' или 'comment') на слова words.
+
+    progress(проверено, найдено, последний id) вызывается после каждой
+    применённой порции. Если проверка этого вида уже идёт, поднимает
+    RescanLocked.
+    """
+    owner = acquire_lock(kind)
+    try:
+        return _rescan(kind, owner, words, action, chunk_size, workers,
+                       restart, progress)
+    finally:
+        release_lock(kind, owner)
+
+
+def _rescan(kind, owner, words, action, chunk_size, workers, restart,
+            progress):
+    model, fields, apply = TARGETS[kind]
+    checkpoint, _ = RescanCheckpoint.objects.get_or_create(
+        kind=kind, words_digest=words_digest(words))
+    if restart and checkpoint.last_pk:
+        checkpoint.last_pk = 0
+        checkpoint.save()
+    resumed_from = checkpoint.last_pk
+    scanned = hits_total = 0
+    db = router.db_for_write(model)
+    batches = _batches(model, fields, checkpoint.last_pk, chunk_size)
+    for batch, hits in _scan(batches, words, workers):
+        last_pk = batch[-1][0]
+        with transaction.atomic(using=db), transaction.atomic():
+            _heartbeat(kind, owner)
+            if hits:
+                apply(hits, unpublish=action == 'unpublish')
+            (RescanCheckpoint.objects
+             .filter(pk=checkpoint.pk)
+             .update(last_pk=last_pk, updated_at=timezone.now()))
+        scanned += len(batch)
+        hits_total += sum(map(len, hits.values()))
+        if progress:
+            progress(scanned, hits_total, last_pk)
+    checkpoint.delete()
+    return RescanStats(scanned, hits_total, resumed_from)
@@ -0,0 +1,172 @@
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete,
+                                      post_save,
+                                      pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .feed_cache import (author_scope,
+                         bump_versions,
+                         category_scope,
+                         post_scopes,
+                         scopes_of_posts)
+from .feed_index import feed_index
+from .forbidden_words import bump_version
+from .models import (Category,
+                     Comment,
+                     FeedEntry,
+                     ForbiddenWord,
+                     Location,
+                     Post)
+from .timeline import sync_posts, sync_queryset
+from .visibility import advance_epoch
+
+
+User = get_user_model()
+
+# Поля автора, которые видны в карточках постов, и поля его профиля.
+AUTHOR_CARD_FIELDS = ('username',)
+AUTHOR_PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'is_staff')
+
+# id поста, комментарии которого удаляются вместе с ним.
+_deleting_post = ContextVar('blog_deleting_post', default=None)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def start_new_visibility_epoch(**kwargs):
+    advance_epoch()
+
+
+@receiver(post_save, sender=ForbiddenWord)
+@receiver(post_delete, sender=ForbiddenWord)
+def reset_forbidden_words(**kwargs):
+    bump_version()
+
+
+@receiver(pre_delete, sender=Category)
+def hide_posts_of_deleted_category(instance, **kwargs):
+    # Посты остаются без категории (SET_NULL) и пропадают из ленты.
+    Post.objects.filter(category=instance).update(is_visible=False)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_scopes(instance, **kwargs):
+    # Пост мог сменить категорию или автора: старые ленты тоже устарели.
+    instance._old_feed_scopes = set()
+    if instance.pk is not None:
+        instance._old_feed_scopes = scopes_of_posts(
+            Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_feeds(instance, **kwargs):
+    bump_versions(
+        *post_scopes(instance.category_id, instance.author_id),
+        *getattr(instance, '_old_feed_scopes', ())
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def reset_commented_post_feeds(instance, **kwargs):
+    if _deleting_post.get() == instance.post_id:
+        # Ленты сбросит удаление самого поста.
+        return
+    bump_versions(*scopes_of_posts(Post.objects.filter(pk=instance.post_id)))
+
+
+@receiver(pre_delete, sender=Post)
+def delete_post_comments(instance, **kwargs):
+    # Каскад Django не доходит до базы комментариев (core.db_router).
+    token = _deleting_post.set(instance.pk)
+    try:
+        Comment.objects.filter(post_id=instance.pk).delete()
+    finally:
+        _deleting_post.reset(token)
+
+
+@receiver(pre_delete, sender=User)
+def delete_author_comments(instance, **kwargs):
+    comments = Comment.objects.filter(author_id=instance.pk)
+    per_post = comments.counts_by_post()
+    comments.delete()
+    for post_id, removed in per_post.items():
+        Post.objects.filter(pk=post_id).adjust_comment_count(-removed)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(pre_delete, sender=Location)
+def reset_related_feeds(sender, instance, **kwargs):
+    lookup = 'category' if sender is Category else 'location'
+    scopes = scopes_of_posts(Post.objects.filter(**{lookup: instance}))
+    if sender is Category:
+        scopes.add(category_scope(instance.pk))
+    bump_versions(*scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(instance, update_fields=None, **kwargs):
+    # Вход на сайт сохраняет только last_login: лишний запрос не нужен.
+    instance._old_author_fields = None
+    if instance.pk is None or (update_fields is not None
+                               and not set(update_fields)
+                               & set(AUTHOR_PROFILE_FIELDS)):
+        return
+    instance._old_author_fields = (User.objects
+                                   .filter(pk=instance.pk)
+                                   .values(*AUTHOR_PROFILE_FIELDS)
+                                   .first())
+
+
+@receiver(post_save, sender=User)
+def reset_author_feeds(instance, **kwargs):
+    old = getattr(instance, '_old_author_fields', None)
+    if not old:
+        return
+    changed = {field for field, value in old.items()
+               if getattr(instance, field) != value}
+    if not changed:
+        return
+    scopes = {author_scope(instance.pk)}
+    if changed.intersection(AUTHOR_CARD_FIELDS):
+        scopes |= scopes_of_posts(Post.objects.filter(author=instance))
+    bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_timeline(instance, **kwargs):
+    sync_posts([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def sync_category_timeline(instance, **kwargs):
+    sync_queryset(Post.objects.filter(category=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def drop_category_timeline(instance, **kwargs):
+    FeedEntry.objects.filter(post__category=instance).delete()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def sync_post_index(instance, **kwargs):
+    feed_index.sync_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def sync_category_index(instance, **kwargs):
+    # Посты удаляемой категории уже скрыты и после коммита уйдут из индекса.
+    feed_index.sync_on_commit(
+        Post.objects.filter(category=instance).values_list('pk', flat=True))
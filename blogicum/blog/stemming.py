@@ -0,0 +1,40 @@
+"""Основы слов для поиска запрещённых слов в любой словоформе.
+
+Стеммер Snowball отрезает от русского слова окончание и суффиксы:
+«плохой», «плохого» и «плохо» дают одну основу «плох». Стемминг
+медленный, поэтому основы слов кешируются в LRU-кеше процесса: тексты
+постов и комментариев состоят в основном из одних и тех же слов.
+"""
+import re
+import threading
+from functools import lru_cache
+
+import snowballstemmer
+
+
+LANGUAGE = 'russian'
+STEM_CACHE_SIZE = 65536
+
+EDGE_PUNCTUATION = re.compile(r'^\W+|\W+$')
+
+_local = threading.local()
+
+
+def normalize(word):
+    """Слово в нижнем регистре без знаков препинания по краям."""
+    return EDGE_PUNCTUATION.sub('', word.lower())
+
+
+def _stemmer():
+    # Стеммер Snowball хранит разбираемое слово в себе: у каждого
+    # потока свой экземпляр.
+    stemmer = getattr(_local, 'stemmer', None)
+    if stemmer is None:
+        stemmer = _local.stemmer = snowballstemmer.stemmer(LANGUAGE)
+    return stemmer
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(token):
+    """Основа слова token, записанного в нижнем регистре."""
+    return _stemmer().stemWord(token)
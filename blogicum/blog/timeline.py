@@ -0,0 +1,92 @@
+"""Материализованные ленты.
+
+Ленты читаются из таблицы FeedEntry одним проходом по индексу
+(scope, pub_date, post), а не запросом к Post с JOIN. Записи
+пересобираются сигналами при изменении постов и связанных объектов,
+а команда rebuild_timeline чинит таблицу целиком или инкрементально.
+"""
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+
+from .feed_cache import author_scope, category_scope, GLOBAL_SCOPE
+from .feed_index import IndexedFeed, feed_index
+from .models import FeedEntry, Post
+
+
+SYNC_CHUNK_SIZE = 500
+
+
+def build_entries(post):
+    """Записи лент для видимого поста."""
+    scopes = [GLOBAL_SCOPE, author_scope(post.author_id)]
+    if post.category_id is not None:
+        scopes.append(category_scope(post.category_id))
+    return [
+        FeedEntry(
+            scope=scope,
+            pub_date=post.pub_date,
+            post_id=post.pk,
+        )
+        for scope in scopes
+    ]
+
+
+def sync_posts(post_ids):
+    """Пересобирает записи лент для постов с заданными id."""
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), SYNC_CHUNK_SIZE):
+        chunk = post_ids[start:start + SYNC_CHUNK_SIZE]
+        posts = (Post.objects
+                 .filter(pk__in=chunk, is_visible=True)
+                 .only('pub_date', 'author_id', 'category_id'))
+        with transaction.atomic():
+            FeedEntry.objects.filter(post_id__in=chunk).delete()
+            FeedEntry.objects.bulk_create(
+                chain.from_iterable(build_entries(post) for post in posts))
+
+
+def sync_queryset(posts):
+    sync_posts(posts.order_by().values_list('pk', flat=True))
+
+
+def posts_for_entries(entries):
+    """Загружает посты страницы по первичному ключу в порядке записей.
+
+    Индекс в памяти другого процесса может отставать, поэтому скрытые
+    с тех пор посты отбрасываются.
+    """
+    ids = [entry.post_id for entry in entries]
+    posts = Post.objects.filter(is_visible=True)
+    if settings.BLOG_SLOTTED_CARDS:
+        posts = {card.id: card for card in posts.filter(pk__in=ids).cards()}
+    else:
+        posts = posts.for_feed().in_bulk(ids)
+    return [posts[entry.post_id] for entry in entries
+            if entry.post_id in posts]
+
+
+class TimelineMixin:
+    """Читает страницу ленты из FeedEntry или индекса в памяти
+    (BLOG_FEED_SOURCE) и отдаёт шаблону посты или, с
+    BLOG_SLOTTED_CARDS, лёгкие карточки PostCard.
+
+    Пока индекс в памяти загружается, лента читается из FeedEntry.
+    """
+
+    def timeline(self, scope):
+        if (settings.BLOG_FEED_SOURCE == 'memory'
+                and feed_index.ensure_fresh()):
+            return IndexedFeed(scope)
+        return FeedEntry.objects.in_scope(scope).only('post', 'pub_date')
+
+    def paginate_queryset(self, queryset, page_size):
+        if (settings.BLOG_SLOTTED_CARDS
+                and getattr(queryset, 'model', None) is Post):
+            queryset = queryset.cards()
+        paginator, page, object_list, is_paginated = (
+            super().paginate_queryset(queryset, page_size))
+        if getattr(queryset, 'model', None) is not Post:
+            object_list = page.object_list = posts_for_entries(object_list)
+        return paginator, page, object_list, is_paginated
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from core.sql_budget import sql_budget
+
 from .views import (
     UserProfileView,
     ProfileEditView,
@@ -17,8 +19,14 @@ from .views import (
 
 app_name = 'blog'
 
+# Ленты и страница поста — горячие страницы чтения: долгий SQL на них
+# лучше быстро оборвать, чем держать поток. Остальным хватает
+# BLOG_SQL_BUDGET.
+FEED_SQL_BUDGET = 0.5
+
 urlpatterns = [
-    path('', PostsListView.as_view(), name='index'),
+    path('', sql_budget(FEED_SQL_BUDGET)(PostsListView.as_view()),
+         name='index'),
     path('posts/create/',
          PostCreateView.as_view(), name='create_post'),
     path('posts/<int:post_id>/edit/',
@@ -26,9 +34,11 @@ urlpatterns = [
     path('posts/<int:post_id>/delete/',
          PostDeleteView.as_view(), name='delete_post'),
     path('posts/<int:post_id>/',
-         PostDetailView.as_view(), name='post_detail'),
+         sql_budget(FEED_SQL_BUDGET)(PostDetailView.as_view()),
+         name='post_detail'),
     path('profile/<str:username>/',
-         UserProfileView.as_view(), name='profile'),
+         sql_budget(FEED_SQL_BUDGET)(UserProfileView.as_view()),
+         name='profile'),
     path('profile/<str:username>/edit/',
          ProfileEditView.as_view(), name='edit_profile'),
     path('posts/<int:post_id>/comment/',
@@ -38,5 +48,6 @@ urlpatterns = [
     path('posts/<int:post_id>/delete_comment/<int:comment_id>/',
          CommentDeleteView.as_view(), name='delete_comment'),
     path('category/<slug:category_slug>/',
-         CategoryPostsView.as_view(), name='category_posts'),
+         sql_budget(FEED_SQL_BUDGET)(CategoryPostsView.as_view()),
+         name='category_posts'),
 ]
@@ -1,7 +1,7 @@
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         UserPassesTestMixin)
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db import router, transaction
 from django.http import Http404
 from django.shortcuts import (get_object_or_404,
                               redirect)
@@ -14,12 +14,27 @@ from django.views.generic import (CreateView,
                                   ListView,
                                   UpdateView)
 
+from .archive import (archived_comments,
+                      archived_posts,
+                      get_archived_post,
+                      with_archive)
+from .feed_cache import (FeedCacheMixin,
+                         GLOBAL_SCOPE,
+                         author_scope,
+                         category_scope)
 from .forms import (PostForm,
                     CommentForm)
+from .identity import get_object
 from .models import (Category,
                      Comment,
-                     Post,
-                     SORT_ORDER)
+                     FEED_ORDER,
+                     Post)
+from .pagination import (CursorPage,
+                         CursorPaginationMixin,
+                         decode_cursor,
+                         encode_cursor,
+                         seek)
+from .timeline import TimelineMixin
 
 
 User = get_user_model()
@@ -29,41 +44,32 @@ class OnlyAuthorMixin(UserPassesTestMixin):
 
     raise_exception = True  # Генерирует 403 ошибку, если тест не прошел
 
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        return get_object(self.request, queryset,
+                          pk=self.kwargs[self.pk_url_kwarg])
+
+    def is_author(self):
+        return self.get_object().author_id == self.request.user.pk
+
     def test_func(self):
-        return self.get_object().author == self.request.user
+        return self.is_author()
 
     def dispatch(self, request, *args, **kwargs):
-        if self.get_object().author != self.request.user:
+        if not self.is_author():
             return redirect('blog:post_detail', post_id=self.kwargs['post_id'])
         return super().dispatch(request, *args, **kwargs)
 
 
-def get_published_posts(category=None, user=None):
-    now = timezone.now()
-    queryset = Post.objects.all()
-
-    if category:
-        queryset = queryset.filter(category=category)
-
-    if user:
-        queryset = queryset.filter(author=user)
-    else:
-        queryset = queryset.filter(
-            is_published=True, pub_date__lte=now, category__is_published=True)
-
-    return queryset
-
-
-class PostsListView(ListView):
+class PostsListView(FeedCacheMixin, TimelineMixin, CursorPaginationMixin,
+                    ListView):
     model = Post
     template_name = 'blog/index.html'
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = (get_published_posts()
-                    .annotate(comment_count=Count('comments'))
-                    .order_by(SORT_ORDER))
-        return queryset
+        return self.timeline(GLOBAL_SCOPE)
 
     def get_context_data(self, **kwargs):
         return super().get_context_data(**kwargs)
@@ -83,30 +89,45 @@ class PostCreateView(LoginRequiredMixin, CreateView):
                        kwargs={'username': self.request.user.username})
 
 
-class UserProfileView(ListView):
+class UserProfileView(FeedCacheMixin, TimelineMixin, CursorPaginationMixin,
+                      ListView):
     model = Post
     template_name = 'blog/profile.html'
     context_object_name = 'posts'
     paginate_by = 10
 
-    def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs['username'])
-        if user == self.request.user:
-            return (get_published_posts(user=user)
-                    .annotate(comment_count=Count('comments'))
-                    .order_by(SORT_ORDER))
+    def get_author(self):
+        if self.request.user.get_username() == self.kwargs['username']:
+            return self.request.user
+        return get_object(self.request, User,
+                          username=self.kwargs['username'])
 
-        return (get_published_posts()
-                .filter(author=user)
-                .annotate(comment_count=Count('comments'))
-                .order_by(SORT_ORDER))
+    def get_queryset(self):
+        author = self.get_author()
+        archived = archived_posts().by_author(author).defer('text')
+        if not self.is_owner():
+            return with_archive(self.timeline(author_scope(author.pk)),
+                                archived.published().order_by(*FEED_ORDER))
+        # Автор видит и скрытые посты, которых нет в материализованной ленте.
+        return with_archive(
+            Post.objects.by_author(author).for_feed().order_by(*FEED_ORDER),
+            archived.order_by(*FEED_ORDER))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        author_user = get_object_or_404(User, username=self.kwargs['username'])
-        context['profile'] = author_user
+        context['profile'] = self.get_author()
         return context
 
+    def is_owner(self):
+        return self.get_author().pk == self.request.user.pk
+
+    def get_cache_scopes(self):
+        return (author_scope(self.get_author().pk),)
+
+    def get_count_key(self):
+        visibility = 'all' if self.is_owner() else 'published'
+        return f'author:{self.get_author().pk}:{visibility}'
+
 
 class ProfileEditView(LoginRequiredMixin, UpdateView):
     model = User
@@ -136,23 +157,50 @@ class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/detail.html'
     pk_url_kwarg = 'post_id'
+    comments_paginate_by = 50
 
     def get_object(self, queryset=None):
-        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
-
-        if not (post.is_published and post.category.is_published
-                and post.pub_date <= timezone.now()):
-            if post.author != self.request.user:
+        try:
+            post = get_object(self.request, Post.objects.for_card(),
+                              pk=self.kwargs['post_id'])
+        except Http404:
+            post = get_archived_post(self.kwargs['post_id'])
+            post.is_archived = True
+
+        if not (post.is_visible and post.pub_date <= timezone.now()):
+            if post.author_id != self.request.user.pk:
                 raise Http404("Страница не найдена")
 
         return post
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.all().order_by('created_at')
+        context['comments'] = self.get_comments_page()
         context['form'] = CommentForm()
         return context
 
+    def get_comments_page(self):
+        """Страница комментариев после курсора `?comments_after=`."""
+        comments = Comment.objects
+        if getattr(self.object, 'is_archived', False):
+            comments = archived_comments()
+        comments = comments.for_post(self.object)
+        size = self.comments_paginate_by
+        token = self.request.GET.get('comments_after')
+        if token:
+            created_at, pk = decode_cursor(token)
+            # Комментарии идут от старых к новым: следующая страница —
+            # строки новее курсора.
+            rows = seek(comments, 'before', created_at, pk, size + 1)
+        else:
+            rows = list(comments[:size + 1])
+        next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+        return CursorPage(rows, next_cursor=next_cursor,
+                          previous_cursor=token or None)
+
 
 class PostDeleteView(OnlyAuthorMixin, DeleteView):
     model = Post
@@ -164,35 +212,49 @@ class PostDeleteView(OnlyAuthorMixin, DeleteView):
                             kwargs={'username': self.request.user.username})
 
 
-class CategoryPostsView(ListView):
+class CategoryPostsView(FeedCacheMixin, TimelineMixin, CursorPaginationMixin,
+                        ListView):
     template_name = 'blog/category.html'
     context_object_name = 'post_list'
     paginate_by = 10
 
+    def get_category(self):
+        return get_object(self.request, Category,
+                          slug=self.kwargs['category_slug'],
+                          is_published=True)
+
     def get_queryset(self):
-        self.category = get_object_or_404(
-            Category,
-            slug=self.kwargs['category_slug'],
-            is_published=True
-        )
-        return (get_published_posts(category=self.category)
-                .annotate(comment_count=Count('comments'))
-                .order_by(SORT_ORDER))
+        return self.timeline(category_scope(self.get_category().pk))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['category'] = self.category
+        context['category'] = self.get_category()
         return context
 
+    def get_cache_scopes(self):
+        return (category_scope(self.get_category().pk),)
+
+    def get_count_key(self):
+        return f'category:{self.get_category().pk}'
+
 
 class CommentCreateView(LoginRequiredMixin, CreateView):
     model = Comment
     form_class = CommentForm
 
     def form_valid(self, form):
-        form.instance.post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        # Для внешнего ключа достаточно убедиться, что пост существует.
+        form.instance.post = get_object_or_404(Post.objects.only('pk'),
+                                               pk=self.kwargs['post_id'])
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        # Комментарий и счётчик поста могут лежать в разных базах.
+        comments_db = router.db_for_write(Comment)
+        with transaction.atomic(using=comments_db), transaction.atomic():
+            response = super().form_valid(form)
+            if self.object.is_published:
+                (Post.objects.filter(pk=self.object.post_id)
+                 .adjust_comment_count(1))
+        return response
 
     def get_success_url(self):
         return reverse('blog:post_detail',
@@ -205,12 +267,9 @@ class CommentEditView(OnlyAuthorMixin, LoginRequiredMixin, UpdateView):
     pk_url_kwarg = 'comment_id'
     template_name = 'blog/comment.html'
 
-    def get_object(self, queryset=None):
-        return get_object_or_404(Comment, pk=self.kwargs['comment_id'])
-
     def get_success_url(self):
         return reverse('blog:post_detail',
-                       kwargs={'post_id': self.object.post.id})
+                       kwargs={'post_id': self.object.post_id})
 
 
 class CommentDeleteView(OnlyAuthorMixin, DeleteView):
@@ -218,6 +277,15 @@ class CommentDeleteView(OnlyAuthorMixin, DeleteView):
     pk_url_kwarg = 'comment_id'
     template_name = 'blog/comment.html'
 
+    def delete(self, request, *args, **kwargs):
+        comments_db = router.db_for_write(Comment)
+        with transaction.atomic(using=comments_db), transaction.atomic():
+            response = super().delete(request, *args, **kwargs)
+            if self.object.is_published:
+                (Post.objects.filter(pk=self.object.post_id)
+                 .adjust_comment_count(-1))
+        return response
+
     def get_success_url(self):
         return reverse('blog:post_detail',
-                       kwargs={'post_id': self.object.post.id})
+                       kwargs={'post_id': self.object.post_id})
@@ -0,0 +1,99 @@
+"""Эпоха видимости ленты.
+
+Лента фильтрует посты по `pub_date <= now`, поэтому результат формально
+меняется каждую микросекунду. На деле он меняется только когда наступает
+дата отложенного поста или редактируются посты, категории и
+местоположения. Эпоха — счётчик таких событий: пока она не сменилась,
+ленту можно брать из кеша. Ближайшая дата отложенной публикации хранится
+как водяной знак; её наступление продвигает эпоху.
+
+Отдельно считаются эпохи наступления публикаций: кешам, которые сами
+следят за правками (см. feed_cache), нужны только они.
+
+Эпохи и водяной знак лежат в общем кеше (core.versions): правка в одном
+процессе и команда publish_due_posts продвигают эпоху для всех.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from core import versions
+from .models import Post
+
+
+EPOCH_KEY = 'blog:visibility-epoch'
+DUE_EPOCH_KEY = 'blog:visibility-due-epoch'
+NEXT_DUE_KEY = 'blog:visibility-next-due'
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def advance_epoch(due=False):
+    """Начинает новую эпоху и сбрасывает водяной знак.
+
+    `due` означает, что эпоха сменилась из-за наступления отложенной
+    публикации, а не из-за правки.
+    """
+    versions.bump(EPOCH_KEY)
+    if due:
+        versions.bump(DUE_EPOCH_KEY)
+    versions.state.delete(NEXT_DUE_KEY)
+
+
+def get_next_due():
+    """Unix-время ближайшей отложенной публикации или inf, если таких нет."""
+    next_due = versions.state.get(NEXT_DUE_KEY)
+    if next_due is None:
+        next_due = refresh_next_due()
+    return next_due
+
+
+def refresh_next_due():
+    """Пересчитывает водяной знак по базе.
+
+    Наступивший прежний знак сначала продвигает эпоху: иначе его
+    перезаписала бы следующая, ещё не наступившая публикация.
+    """
+    stored = versions.state.get(NEXT_DUE_KEY)
+    if stored is not None and stored <= time.time():
+        advance_epoch(due=True)
+    pub_date = (Post.objects
+                .filter(is_visible=True, pub_date__gt=timezone.now())
+                .aggregate(next_due=Min('pub_date'))['next_due'])
+    next_due = pub_date.timestamp() if pub_date else math.inf
+    versions.state.set(NEXT_DUE_KEY, next_due, None)
+    _schedule_timer(next_due)
+    return next_due
+
+
+def get_epoch():
+    """Текущая эпоха; продвигается, если отложенный пост уже наступил."""
+    while get_next_due() <= time.time():
+        advance_epoch(due=True)
+    return versions.get(EPOCH_KEY)
+
+
+def get_due_epoch():
+    """Число наступивших отложенных публикаций с точностью до кеша."""
+    get_epoch()
+    return versions.get(DUE_EPOCH_KEY)
+
+
+def _schedule_timer(next_due):
+    # Таймер не трогает БД: он лишь продвигает эпоху в кеше, а новый
+    # водяной знак вычислит следующий запрос.
+    global _timer
+    if not settings.BLOG_VISIBILITY_TIMER or next_due == math.inf:
+        return
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(max(next_due - time.time(), 0),
+                                 advance_epoch, kwargs={'due': True})
+        _timer.daemon = True
+        _timer.start()
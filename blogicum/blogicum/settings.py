@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,11 +55,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.ReadWriteMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.sql_budget.SQLBudgetMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -95,11 +98,105 @@ WSGI_APPLICATION = 'blogicum.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Соединение переживает запрос: PRAGMA и кеш страниц SQLite не
+        # настраиваются заново, а перед повторным использованием
+        # соединение проверяется.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            # Транзакции процесса идут по очереди; если базу держит другой
+            # процесс, BEGIN повторяется с растущей паузой.
+            'serialize_transactions': True,
+            'busy_retries': 5,
+            'busy_backoff': 0.05,
+            'pragmas': {
+                # Новый файл сразу создаётся так, чтобы dbmaintenance мог
+                # возвращать свободные страницы по частям; старый
+                # переводится командой с --enable-incremental-vacuum.
+                # Стоит первым: после journal_mode файл уже создан.
+                'auto_vacuum': 'INCREMENTAL',
+                # Читатели не ждут писателя, а писатель — читателей.
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                # В КиБ, если значение отрицательное.
+                'cache_size': -64000,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+    # Тот же файл, открытый только для чтения (см. core.db_router).
+    'replica': {
+        'ENGINE': 'core.sqlite3',
+        'NAME': f'file:{BASE_DIR / "db.sqlite3"}?mode=ro',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {
+                'query_only': 1,
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64000,
+                'temp_store': 'MEMORY',
+            },
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+    # Холодный архив старых постов с комментариями (archive_posts). Авторы,
+    # категории и местоположения остаются в основной базе, поэтому
+    # внешние ключи здесь не проверяются.
+    'archive': {
+        'ENGINE': 'core.sqlite3',
+        'NAME': BASE_DIR / 'archive.sqlite3',
+        'OPTIONS': {
+            'pragmas': {
+                'foreign_keys': 'OFF',
+                'journal_mode': 'WAL',
+                'busy_timeout': 5000,
+            },
+        },
+    },
 }
 
+# Комментарии можно вынести в отдельный файл SQLite со своей блокировкой
+# записи: BLOG_SPLIT_COMMENTS=1 в окружении (и `migrate --database
+# comments`). По умолчанию всё лежит в одном файле.
+BLOG_COMMENTS_DB_ALIAS = 'default'
+if os.environ.get('BLOG_SPLIT_COMMENTS'):
+    BLOG_COMMENTS_DB_ALIAS = 'comments'
+    DATABASES['comments'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'comments.sqlite3',
+    }
+
+DATABASE_ROUTERS = [
+    'core.db_router.ArchiveRouter',
+    'core.db_router.CommentsRouter',
+    'core.db_router.ReadWriteRouter',
+]
+
+# Псевдоним базы для чтения и сколько секунд после записывающего
+# запроса клиент читает из писателя.
+BLOG_DB_READ_ALIAS = 'replica'
+BLOG_DB_STICKY_SECONDS = 5
+# Куда archive_posts переносит старые посты; None — без архива. Архив
+# включается BLOG_ARCHIVE=1 в окружении, а его таблицы создаёт
+# `BLOG_ARCHIVE=1 python manage.py migrate --database archive`.
+BLOG_ARCHIVE_DB_ALIAS = 'archive' if os.environ.get('BLOG_ARCHIVE') else None
+
+# Сколько секунд внутри SQL отпущено представлению на GET, HEAD и другие
+# безопасные методы, если в urls.py ему не задан свой бюджет
+# (core.sql_budget); None — без ограничения. Запись и админку бюджет не
+# ограничивает. Прерванный по бюджету запрос получает ответ
+# BLOG_SQL_BUDGET_VIEW с Retry-After.
+BLOG_SQL_BUDGET = 2
+BLOG_SQL_BUDGET_VIEW = 'pages.views.service_unavailable'
+BLOG_SQL_BUDGET_RETRY_AFTER = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -151,3 +248,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+
+# Кеши общие для всех процессов сайта и команд: у LocMemCache в каждом
+# процессе свой кеш, и правка, сделанная одним процессом, не доходила бы
+# до остальных. 'default' хранит страницы и фрагменты, 'state' — эпохи
+# видимости, версии лент и списка запрещённых слов (core.versions): их
+# немного, они пишутся на каждой правке и не вытесняются.
+CACHE_DIR = Path(os.environ.get('BLOG_CACHE_DIR', BASE_DIR / 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'pages',
+        'OPTIONS': {
+            # Файловый кеш при переполнении удаляет случайную треть
+            # записей, поэтому запас большой, а проверяется он не на
+            # каждой записи.
+            'MAX_ENTRIES': 50_000,
+            'CULL_EVERY': 100,
+        },
+    },
+    'state': {
+        'BACKEND': 'core.cache.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'state',
+        'OPTIONS': {'CULL_EVERY': 0},
+    },
+}
+
+# Страницы ленты `?page=` глубже этой перенаправляются на курсорную
+# пагинацию `?after=`, чтобы OFFSET не рос без ограничений.
+BLOG_MAX_OFFSET_PAGE = 50
+
+# Сколько секунд хранить в кеше число постов в ленте.
+BLOG_FEED_COUNT_TTL = 60
+
+# Продвигать эпоху видимости таймером в момент наступления отложенной
+# публикации, а не только при следующем запросе. Таймер заводит каждый
+# процесс; без него эпоху продвигают запросы и publish_due_posts.
+BLOG_VISIBILITY_TIMER = True
+
+# Сколько секунд хранить готовые страницы ленты для анонимных посетителей.
+BLOG_FEED_CACHE_TTL = 300
+
+# Откуда читать ленты: 'timeline' — таблица FeedEntry, 'memory' — индекс
+# в памяти каждого процесса (blog.feed_index); пока индекс загружается,
+# ленты читаются из FeedEntry.
+BLOG_FEED_SOURCE = 'timeline'
+
+# Не чаще чем раз в столько секунд индекс в памяти сверяет эпоху
+# видимости и, если посты правили другие процессы, в фоне перечитывает
+# посты из журнала FeedChange.
+BLOG_FEED_INDEX_REFRESH = 30
+
+# Сколько секунд rebuild_timeline хранит журнал FeedChange. Индекс,
+# не догонявший журнал дольше половины этого срока, строится заново.
+BLOG_FEED_CHANGES_KEEP = 24 * 60 * 60
+
+# Отдавать лентам вместо экземпляров Post лёгкие карточки blog.cards.PostCard.
+BLOG_SLOTTED_CARDS = False
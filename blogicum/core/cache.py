@@ -0,0 +1,24 @@
+"""Файловый кеш, который не перебирает каталог на каждой записи.
+
+FileBasedCache из Django перед каждой записью считает файлы каталога,
+чтобы решить, не пора ли удалить часть записей. На большом кеше это
+листинг тысяч файлов на каждый set(). Здесь переполнение проверяется
+раз в OPTIONS['CULL_EVERY'] записей процесса; 0 — никогда: так
+настроен кеш 'state' с версиями и эпохами (core.versions), где ключей
+немного и ни один нельзя потерять.
+"""
+import itertools
+
+from django.core.cache.backends import filebased
+
+
+class FileBasedCache(filebased.FileBasedCache):
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_every = params.get('OPTIONS', {}).get('CULL_EVERY', 1)
+        self._writes = itertools.count(1)
+
+    def _cull(self):
+        if self._cull_every and next(self._writes) % self._cull_every == 0:
+            super()._cull()
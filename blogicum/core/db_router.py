@@ -0,0 +1,124 @@
+"""Разделение чтения и записи между соединениями SQLite.
+
+Запись идёт через псевдоним `default`, чтение — через соединение
+только для чтения (`mode=ro`) из BLOG_DB_READ_ALIAS. В режиме WAL
+читатели не ждут писателя, поэтому лента не стоит в очереди за
+вставкой комментария.
+
+Чтение переключается на писателя, пока открыта его транзакция, до
+конца запроса с небезопасным методом (POST и т. п.) и до конца запроса
+или команды после сохранения модели (core.signals). После
+записывающего запроса cookie держит клиента на писателе ещё
+BLOG_DB_STICKY_SECONDS, чтобы редирект после POST точно увидел свою
+запись.
+
+CommentsRouter уносит комментарии в отдельный файл базы
+BLOG_COMMENTS_DB_ALIAS, чтобы их вставка не стояла в одной очереди на
+запись с постами. Если псевдоним — `default`, схема остаётся
+однофайловой и всё решает ReadWriteRouter.
+
+ArchiveRouter создаёт в холодном архиве BLOG_ARCHIVE_DB_ALIAS только
+таблицы постов и комментариев; читают и пишут архив явно через
+using() (см. blog.archive).
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+STICKY_COOKIE = 'db_writer'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = ContextVar('blog_db_pinned_to_writer', default=False)
+
+
+def pin_to_writer():
+    """Читает из писателя до конца текущего запроса или команды."""
+    _pinned.set(True)
+
+
+def is_pinned_to_writer():
+    return _pinned.get()
+
+
+class CommentsRouter:
+
+    models = {'blog.comment'}
+
+    def _alias(self, model):
+        alias = settings.BLOG_COMMENTS_DB_ALIAS
+        if alias == DEFAULT_DB_ALIAS:
+            return None
+        return alias if model._meta.label_lower in self.models else None
+
+    def db_for_read(self, model, **hints):
+        return self._alias(model)
+
+    def db_for_write(self, model, **hints):
+        return self._alias(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = settings.BLOG_COMMENTS_DB_ALIAS
+        if alias == DEFAULT_DB_ALIAS:
+            return None
+        is_comment = f'{app_label}.{model_name}' in self.models
+        if db == alias:
+            return is_comment
+        if is_comment:
+            return False
+        return None
+
+
+class ArchiveRouter:
+
+    models = {'blog.post', 'blog.comment'}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != settings.BLOG_ARCHIVE_DB_ALIAS:
+            return None
+        return f'{app_label}.{model_name}' in self.models
+
+
+class ReadWriteRouter:
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return settings.BLOG_DB_READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Django спрашивает псевдоним записи и там, где ничего не пишет
+        # (например, для related-менеджеров), поэтому закрепление на
+        # писателе — в core.signals и ReadWriteMiddleware, а не здесь.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба псевдонима смотрят в один файл.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadWriteMiddleware:
+    """Сбрасывает привязку к писателю между запросами и продлевает её
+    cookie для клиента, который только что писал.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in SAFE_METHODS
+        token = _pinned.set(writes or STICKY_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if writes:
+                response.set_cookie(
+                    STICKY_COOKIE, '1',
+                    max_age=settings.BLOG_DB_STICKY_SECONDS,
+                    httponly=True, samesite='Lax')
+        finally:
+            _pinned.reset(token)
+        return response
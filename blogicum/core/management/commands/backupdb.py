@@ -0,0 +1,97 @@
+import os
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.defaultfilters import filesizeformat
+
+from core import versions
+from core.sqlite3 import backup, maintenance
+
+
+class Command(BaseCommand):
+    help = ('Делает копию базы SQLite на ходу через backup API, не '
+            'останавливая запись, проверяет её целостность и при '
+            'необходимости сжимает gzip. С --restore заменяет базу копией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл копии: куда писать или, с --restore, откуда читать.'
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы.'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=256,
+            help='Сколько страниц копировать за один шаг.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.05,
+            help='Пауза после каждого шага, в секундах.'
+        )
+        parser.add_argument(
+            '--compress',
+            action='store_true',
+            help='Сжать копию gzip; с sqlite_dbpage и WAL — потоком из '
+                 'снимка, без несжатой копии на диске.'
+        )
+        parser.add_argument(
+            '--restore',
+            action='store_true',
+            help='Восстановить базу из копии (в том числе сжатой). '
+                 'Текущее содержимое базы будет заменено: остановите '
+                 'запись на время восстановления.'
+        )
+
+    def handle(self, *args, path, database, pages, sleep, compress, restore,
+               verbosity, **options):
+        self.verbosity = verbosity
+        connection = connections[database]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'{database} — не база SQLite.')
+        try:
+            if restore:
+                self.restore(connection, path)
+            else:
+                self.backup(connection, path, pages, sleep, compress)
+        except backup.BackupIntegrityError as error:
+            raise CommandError(f'Копия повреждена: {error}')
+
+    def backup(self, connection, path, pages, sleep, compress):
+        def progress(remaining, total):
+            if self.verbosity > 1:
+                self.stdout.write(f'  скопировано {total - remaining} из '
+                                  f'{total} страниц')
+
+        stats = backup.backup(connection, path, pages=pages, sleep=sleep,
+                              compress=compress, progress=progress)
+        if not stats.snapshot:
+            self.stdout.write(self.style.WARNING(
+                'База не в режиме WAL: копия начиналась заново при каждой '
+                'записи в неё.'))
+        size = stats.pages * stats.page_size
+        speed = size / max(stats.seconds, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Копия {path}: {filesizeformat(size)} за {stats.seconds:.1f} с '
+            f'({filesizeformat(speed)}/с), на диске '
+            f'{filesizeformat(os.path.getsize(path))}; целостность '
+            'проверена.'))
+
+    def restore(self, connection, path):
+        if not maintenance.is_writable(connection):
+            raise CommandError(
+                f'{connection.alias} открыта только для чтения.')
+        backup.restore(connection, path)
+        # Закешированные страницы и ленты описывают уже другие данные.
+        # Кеши общие, и с ними сбрасываются версии и эпохи всех процессов.
+        cache.clear()
+        versions.state.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'База {connection.alias} восстановлена из {path}.'))
@@ -0,0 +1,123 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template.defaultfilters import filesizeformat
+
+from core.sqlite3 import maintenance
+
+
+class Command(BaseCommand):
+    help = ('Обслуживает базы SQLite на ходу: обновляет статистику '
+            'планировщика, возвращает свободные страницы короткими шагами, '
+            'переносит WAL в основной файл и показывает размеры и '
+            'фрагментацию таблиц и индексов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Псевдоним базы; можно повторять. По умолчанию — все '
+                 'базы SQLite, открытые на запись.'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Полный ANALYZE вместо выборочного PRAGMA optimize.'
+        )
+        parser.add_argument(
+            '--vacuum-step',
+            type=int,
+            default=500,
+            help='Сколько свободных страниц возвращать за одну транзакцию.'
+        )
+        parser.add_argument(
+            '--vacuum-pause',
+            type=float,
+            default=0.05,
+            help='Пауза между порциями incremental_vacuum, в секундах.'
+        )
+        parser.add_argument(
+            '--vacuum-seconds',
+            type=float,
+            default=30,
+            help='Сколько секунд всего тратить на incremental_vacuum.'
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum',
+            action='store_true',
+            help='Перевести файл в auto_vacuum = INCREMENTAL полным VACUUM. '
+                 'Блокирует запись на всё время работы.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            choices=maintenance.CHECKPOINT_MODES,
+            default='PASSIVE',
+            help='Режим wal_checkpoint.'
+        )
+        parser.add_argument(
+            '--no-stats',
+            action='store_true',
+            help='Не печатать размеры таблиц и индексов.'
+        )
+
+    def handle(self, *args, databases, **options):
+        # Реплика открывает тот же файл только для чтения: обслуживать её
+        # отдельно незачем, да и нельзя.
+        aliases = [alias for alias in connections
+                   if maintenance.is_writable(connections[alias])]
+        for alias in databases or ():
+            if alias not in aliases:
+                raise CommandError(
+                    f'{alias} — не база SQLite, открытая на запись.')
+        for alias in databases or aliases:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'База {alias}'))
+            self.maintain(connections[alias], **options)
+
+    def maintain(self, connection, *, analyze, vacuum_step, vacuum_pause,
+                 vacuum_seconds, enable_incremental_vacuum, checkpoint,
+                 no_stats, **options):
+        maintenance.optimize(connection, full=analyze)
+        self.stdout.write('  Статистика планировщика обновлена.')
+
+        stats = maintenance.file_stats(connection)
+        if stats.auto_vacuum != 'INCREMENTAL' and enable_incremental_vacuum:
+            maintenance.enable_incremental_vacuum(connection)
+            self.stdout.write('  Файл переведён в auto_vacuum = INCREMENTAL.')
+        elif stats.auto_vacuum == 'INCREMENTAL':
+            freed = maintenance.incremental_vacuum(
+                connection, vacuum_step, vacuum_pause, vacuum_seconds)
+            self.stdout.write(f'  Возвращено страниц: {freed}.')
+        elif stats.freelist_count:
+            self.stdout.write(self.style.WARNING(
+                f'  Свободных страниц: {stats.freelist_count}, но '
+                f'auto_vacuum = {stats.auto_vacuum}: вернуть их можно '
+                'только полным VACUUM (--enable-incremental-vacuum).'))
+
+        if stats.journal_mode == 'WAL':
+            busy, log, done = maintenance.checkpoint(connection, checkpoint)
+            self.stdout.write(
+                f'  Checkpoint {checkpoint}: перенесено {done} из {log} '
+                f'страниц WAL' + (', файл занят' if busy else '') + '.')
+
+        stats = maintenance.file_stats(connection)
+        size = stats.page_size * stats.page_count
+        free = stats.freelist_count / max(stats.page_count, 1)
+        self.stdout.write(
+            f'  Файл: {filesizeformat(size)}, страниц {stats.page_count}, '
+            f'свободных {stats.freelist_count} ({free:.1%}).')
+        if no_stats:
+            return
+        objects = maintenance.object_stats(connection)
+        if objects is None:
+            self.stdout.write('  SQLite собран без dbstat: размеры таблиц '
+                              'недоступны.')
+            return
+        title = 'Таблица или индекс'
+        width = max(len(title), *(len(item.name) for item in objects))
+        self.stdout.write(
+            f'  {title:<{width}} {"Размер":>10} {"Пусто":>7} '
+            f'{"Вразброс":>9}')
+        for item in objects:
+            self.stdout.write(
+                f'  {item.name:<{width}} {filesizeformat(item.size):>10} '
+                f'{item.unused:>7.1%} {item.out_of_order:>9.1%}')
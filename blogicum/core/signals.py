@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .db_router import pin_to_writer
+
+
+# post_delete здесь не слушается: приёмник у модели отключает быстрое
+# удаление QuerySet.delete(). Удаления и update() в запросах закрепляет
+# ReadWriteMiddleware по методу запроса.
+@receiver(post_save, dispatch_uid='core.pin_to_writer_on_save')
+def pin_after_save(sender, **kwargs):
+    pin_to_writer()
@@ -0,0 +1,173 @@
+"""Бюджет времени SQL на запрос.
+
+Медленный запрос к SQLite держит поток сервера, пока не доработает до
+конца, и очередь за ним растёт. SQLBudgetMiddleware даёт каждому
+представлению бюджет времени, проведённого внутри SQLite: через progress
+handler SQLite каждые PROGRESS_STEPS шагов виртуальной машины сверяет
+накопленное время SQL с бюджетом и, если он исчерпан, прерывает запрос.
+Вместо долгого ответа посетитель быстро получает 503 с Retry-After.
+Шаблоны и остальной Python в бюджет не входят, так что медленный
+рендеринг не обрывает следующий за ним быстрый запрос.
+
+Бюджет действует только на безопасные методы (GET, HEAD и т. п.) вне
+админки: оборванная запись обошлась бы дороже долгой, а админке нужны
+тяжёлые выборки.
+
+Прерывания считаются по имени URL в общем для всех процессов кеше —
+приблизительно: инкремент файлового кеша не атомарен. Точный счёт
+даёт журнал: каждое прерывание пишется предупреждением с полями
+view_name, path и budget, которые можно собрать со всех процессов.
+
+Бюджет задаётся в urls.py декоратором sql_budget, для остальных
+представлений действует BLOG_SQL_BUDGET; None — без ограничения.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.module_loading import import_string
+
+from core import versions
+from core.db_router import SAFE_METHODS
+
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_STEPS = 1000
+ABORTS_KEY = 'core:sql-budget-aborts:{}'
+
+
+def sql_budget(seconds):
+    """Задаёт представлению бюджет SQL в секундах; None — без ограничения."""
+    def decorator(view):
+        view.sql_budget = seconds
+        return view
+    return decorator
+
+
+def aborts(view_name):
+    """Сколько раз запросы к представлению прерывались по бюджету во всех
+    процессах, с точностью до гонок инкремента.
+    """
+    return versions.state.get(ABORTS_KEY.format(view_name), 0)
+
+
+def _record_abort(view_name):
+    key = ABORTS_KEY.format(view_name)
+    try:
+        versions.state.incr(key)
+    except ValueError:
+        versions.state.add(key, 1, None)
+
+
+class SQLBudget:
+    """Прерывает запрос к SQLite, когда суммарное время SQL внутри with
+    превышает seconds.
+
+    Время считается внутри execute() и между срабатываниями progress
+    handler, пока строки результата выбираются после execute() —
+    с точностью до пауз между порциями строк ленивого курсора.
+
+    Внутри with каждое соединение SQLite при первом запросе получает
+    progress handler; на выходе обработчики снимаются, ведь соединения
+    переживают HTTP-запрос.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.spent = 0.0
+        self.exceeded = False
+        self._mark = None
+        self._connections = []
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        for alias in connections:
+            connection = connections[alias]
+            if connection.vendor == 'sqlite':
+                self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._stack.close()
+        for raw in self._connections:
+            try:
+                raw.set_progress_handler(None, 0)
+            except sqlite3.ProgrammingError:
+                # Соединение уже закрыто.
+                pass
+        self._connections.clear()
+
+    def __call__(self, execute, sql, params, many, context):
+        raw = context['connection'].connection
+        if not any(known is raw for known in self._connections):
+            raw.set_progress_handler(self._progress, PROGRESS_STEPS)
+            self._connections.append(raw)
+        self._mark = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._tick()
+            # Время до первой порции строк после execute() — не SQL.
+            self._mark = None
+
+    def _tick(self):
+        now = time.monotonic()
+        if self._mark is not None:
+            self.spent += now - self._mark
+        self._mark = now
+
+    def _progress(self):
+        self._tick()
+        if self.spent < self.seconds:
+            return 0
+        self.exceeded = True
+        return 1
+
+
+class SQLBudgetMiddleware:
+    """Ограничивает время SQL представления и превращает прерванный по
+    бюджету запрос в ответ BLOG_SQL_BUDGET_VIEW.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            budget = request.__dict__.pop('_sql_budget', None)
+            if budget is not None:
+                budget.close()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method not in SAFE_METHODS
+                or request.resolver_match.app_name == 'admin'):
+            return
+        seconds = getattr(view_func, 'sql_budget', settings.BLOG_SQL_BUDGET)
+        if seconds is not None:
+            request._sql_budget = SQLBudget(seconds).__enter__()
+
+    def process_exception(self, request, exception):
+        budget = getattr(request, '_sql_budget', None)
+        if (budget is None or not budget.exceeded
+                or not isinstance(exception, DatabaseError)):
+            return None
+        # Ответ об ошибке сам может читать базу — уже без бюджета.
+        budget.close()
+        view_name = request.resolver_match.view_name
+        _record_abort(view_name)
+        logger.warning(
+            'SQL-бюджет исчерпан: view_name=%s path=%s budget=%s',
+            view_name, request.path, budget.seconds,
+            extra={'view_name': view_name, 'path': request.path,
+                   'budget': budget.seconds},
+        )
+        return import_string(settings.BLOG_SQL_BUDGET_VIEW)(request)
@@ -0,0 +1,213 @@
+"""Копия базы SQLite на ходу через backup API.
+
+Страницы копируются порциями с паузами между ними: sleep самого
+backup API срабатывает, только когда база занята, поэтому пауза
+делается в обработчике прогресса. Обычный backup
+начинается заново, как только базу меняет другое соединение, и под
+потоком комментариев может не закончиться никогда. Поэтому источник
+читается из отдельного соединения с открытой читающей транзакцией: в
+режиме WAL она держит снимок базы на момент начала, а писатели сайта
+тем временем спокойно коммитят в WAL.
+
+Копия пишется рядом с целью во временный файл, проверяется через
+PRAGMA integrity_check и только потом подменяет цель. Сжатая копия,
+если SQLite собран с виртуальной таблицей sqlite_dbpage, пишется в
+gzip прямо из снимка, без несжатой копии на диске: снимок проверяется
+integrity_check в той же транзакции, а страницы читаются по порядку.
+Без sqlite_dbpage несжатая копия сжимается после проверки.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from collections import namedtuple
+
+from django.db import DatabaseError
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 1024 * 1024
+# Байты 18–19 заголовка: версии формата записи и чтения, 2 — WAL.
+WAL_VERSIONS = slice(18, 20)
+LEGACY_VERSIONS = b'\x01\x01'
+
+BackupStats = namedtuple('BackupStats', 'pages page_size seconds snapshot')
+
+
+class BackupIntegrityError(Exception):
+    """Копия базы не прошла PRAGMA integrity_check."""
+
+
+def integrity_problems(path):
+    """Список сообщений integrity_check; пустой, если файл цел."""
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = db.execute('PRAGMA integrity_check').fetchall()
+    except sqlite3.DatabaseError as error:
+        return [str(error)]
+    finally:
+        db.close()
+    problems = [row[0] for row in rows]
+    return [] if problems == ['ok'] else problems
+
+
+def _check(path):
+    problems = integrity_problems(path)
+    if problems:
+        raise BackupIntegrityError('; '.join(problems[:10]))
+
+
+def _open_snapshot(connection):
+    """Отдельное соединение к базе и держит ли оно снимок (WAL)."""
+    source = connection.get_new_connection(connection.get_connection_params())
+    source.isolation_level = None
+    snapshot = source.execute(
+        'PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+    if snapshot:
+        # Без WAL читающая транзакция не пустила бы писателей к
+        # коммиту, поэтому снимок держится только в WAL.
+        source.execute('BEGIN')
+        source.execute('SELECT count(*) FROM sqlite_master').fetchall()
+    return source, snapshot
+
+
+def _pause(sleep, progress):
+    def report(status, remaining, total):
+        if progress:
+            progress(remaining, total)
+        if remaining and sleep:
+            time.sleep(sleep)
+    return report
+
+
+def _copy(connection, path, pages, sleep, progress):
+    source, snapshot = _open_snapshot(connection)
+    try:
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target, pages=pages, sleep=sleep,
+                          progress=_pause(sleep, progress))
+            # Копия — самостоятельный файл, без WAL рядом с ней.
+            target.execute('PRAGMA journal_mode = DELETE')
+            page_count = target.execute('PRAGMA page_count').fetchone()[0]
+            page_size = target.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            target.close()
+        if snapshot:
+            source.execute('COMMIT')
+    finally:
+        source.close()
+    return page_count, page_size, snapshot
+
+
+def can_stream(connection):
+    """Можно ли писать gzip прямо из снимка: нужны sqlite_dbpage и WAL.
+
+    Без WAL снимок не держится, а начать заново поток gzip нельзя.
+    """
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("SELECT 1 FROM pragma_module_list"
+                           " WHERE name = 'sqlite_dbpage'")
+        except DatabaseError:
+            # SQLite без интроспекции модулей.
+            return False
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0].lower() == 'wal'
+
+
+def _stream(connection, path, pages, sleep, progress):
+    """Пишет снимок базы в gzip-файл path страница за страницей; база
+    должна быть в режиме WAL (см. can_stream).
+    """
+    source, snapshot = _open_snapshot(connection)
+    try:
+        problems = [row[0] for row in
+                    source.execute('PRAGMA integrity_check').fetchall()]
+        if problems != ['ok']:
+            raise BackupIntegrityError('; '.join(problems[:10]))
+        page_count = source.execute('PRAGMA page_count').fetchone()[0]
+        page_size = source.execute('PRAGMA page_size').fetchone()[0]
+        report = _pause(sleep, progress)
+        with gzip.open(path, 'wb') as dst:
+            for start in range(1, page_count + 1, pages):
+                stop = min(start + pages, page_count + 1)
+                rows = source.execute(
+                    'SELECT pgno, data FROM sqlite_dbpage'
+                    ' WHERE pgno >= ? AND pgno < ? ORDER BY pgno',
+                    (start, stop))
+                for pgno, data in rows:
+                    if pgno == 1:
+                        # Копия — самостоятельный файл, без WAL рядом.
+                        data = bytearray(data)
+                        data[WAL_VERSIONS] = LEGACY_VERSIONS
+                    dst.write(data)
+                report(None, page_count + 1 - stop, page_count)
+        if snapshot:
+            source.execute('COMMIT')
+    finally:
+        source.close()
+    return page_count, page_size, snapshot
+
+
+def backup(connection, path, pages=256, sleep=0.05, compress=False,
+           progress=None):
+    """Копирует базу connection в файл path, при compress — в gzip.
+
+    progress(осталось, всего) вызывается после каждой порции страниц,
+    sleep — пауза после неё в секундах.
+    """
+    partial = f'{path}.partial'
+    started = time.monotonic()
+    try:
+        if compress and can_stream(connection):
+            page_count, page_size, snapshot = _stream(
+                connection, partial, pages, sleep, progress)
+            os.replace(partial, path)
+        else:
+            page_count, page_size, snapshot = _copy(
+                connection, partial, pages, sleep, progress)
+            _check(partial)
+            if compress:
+                with open(partial, 'rb') as src:
+                    with gzip.open(f'{partial}.gz', 'wb') as dst:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.replace(f'{partial}.gz', path)
+            else:
+                os.replace(partial, path)
+    finally:
+        for leftover in (partial, f'{partial}.gz'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return BackupStats(page_count, page_size, time.monotonic() - started,
+                       snapshot)
+
+
+def restore(connection, path):
+    """Заменяет содержимое базы connection копией из path.
+
+    Копия (в том числе сжатая gzip) сначала проверяется, затем
+    переносится одним шагом backup API, так что читатели видят либо
+    старую базу, либо новую целиком.
+    """
+    with open(path, 'rb') as file:
+        compressed = file.read(2) == GZIP_MAGIC
+    source_path = path
+    if compressed:
+        source_path = f'{path}.restore'
+        with gzip.open(path, 'rb') as src, open(source_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    try:
+        _check(source_path)
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        try:
+            connection.ensure_connection()
+            source.backup(connection.connection)
+        finally:
+            source.close()
+    finally:
+        if compressed:
+            os.remove(source_path)
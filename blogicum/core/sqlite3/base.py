@@ -0,0 +1,214 @@
+"""SQLite с настройками для работы под нагрузкой.
+
+Движок `core.sqlite3` — обычный бэкенд Django для SQLite, который
+дополнительно понимает в OPTIONS:
+
+* `pragmas` — словарь PRAGMA, выполняемых на каждом новом соединении
+  (journal_mode, synchronous, mmap_size, cache_size, busy_timeout,
+  temp_store и любые другие);
+* `transaction_mode` — `DEFERRED`, `IMMEDIATE` или `EXCLUSIVE` для
+  транзакций atomic(). IMMEDIATE берёт блокировку записи сразу и ждёт
+  её по busy_timeout, вместо того чтобы падать с «database is locked»
+  при попытке читающей транзакции начать запись;
+* `serialize_transactions` — транзакции одного процесса к этому файлу
+  идут по очереди через общую блокировку, а не соревнуются за
+  блокировку SQLite в busy-цикле;
+* `busy_retries` и `busy_backoff` — сколько раз и с какой начальной
+  паузой в секундах повторять BEGIN, если база всё ещё занята другим
+  процессом после busy_timeout. Паузы растут вдвое со случайным
+  разбросом.
+
+Запись вне atomic() (save() в режиме autocommit, update(), delete()) —
+это тоже транзакция, которую SQLite открывает сам, поэтому такие
+INSERT, UPDATE, DELETE и REPLACE проходят через ту же очередь и те же
+повторы.
+
+`foreign_keys` = OFF в pragmas выключает внешние ключи совсем: Django
+не включает их обратно после миграций и не проверяет при перестройке
+таблиц. Это нужно базам, где лежит только часть таблиц (архив), а
+ссылки ведут в другой файл.
+
+Ключ `CONN_HEALTH_CHECKS` в настройках базы, как в Django 4.1,
+проверяет переиспользуемое соединение (CONN_MAX_AGE) перед запросом.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+
+_transaction_locks = defaultdict(threading.Lock)
+_transaction_locks_guard = threading.Lock()
+
+
+def _transaction_lock(name):
+    with _transaction_locks_guard:
+        return _transaction_locks[str(name)]
+
+
+WRITE_STATEMENTS = frozenset({'INSERT', 'UPDATE', 'DELETE', 'REPLACE'})
+
+
+def _is_busy(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def _is_write(query):
+    words = query.split(None, 1)
+    return bool(words) and words[0].upper() in WRITE_STATEMENTS
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """Курсор, который отдаёт записи вне транзакции соединению."""
+
+    wrapper = None
+
+    def execute(self, query, params=None):
+        execute = super().execute
+        if self.wrapper is None or not _is_write(query):
+            return execute(query, params)
+        return self.wrapper.write_in_autocommit(execute, query, params)
+
+    def executemany(self, query, param_list):
+        executemany = super().executemany
+        if self.wrapper is None or not _is_write(query):
+            return executemany(query, param_list)
+        return self.wrapper.write_in_autocommit(
+            executemany, query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+    EXTRA_OPTIONS = ('pragmas', 'transaction_mode', 'serialize_transactions',
+                     'busy_retries', 'busy_backoff')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._holds_transaction_lock = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for option in self.EXTRA_OPTIONS:
+            kwargs.pop(option, None)
+        return kwargs
+
+    @property
+    def pragmas(self):
+        return self.settings_dict['OPTIONS'].get('pragmas', {})
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in self.TRANSACTION_MODES:
+            raise ValueError(f'Неизвестный transaction_mode: {mode}')
+        return mode and mode.upper()
+
+    @property
+    def enforces_foreign_keys(self):
+        value = str(self.pragmas.get('foreign_keys', 'ON')).upper()
+        return value not in ('0', 'OFF', 'FALSE', 'NO')
+
+    def enable_constraint_checking(self):
+        if self.enforces_foreign_keys:
+            super().enable_constraint_checking()
+
+    def check_constraints(self, table_names=None):
+        if self.enforces_foreign_keys:
+            super().check_constraints(table_names)
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _begin(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.wrapper = self
+        return cursor
+
+    def _retry_busy(self, operation, *args):
+        options = self.settings_dict['OPTIONS']
+        retries = options.get('busy_retries', 0)
+        pause = options.get('busy_backoff', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return operation(*args)
+            except (OperationalError, base.Database.OperationalError) as error:
+                if not _is_busy(error) or attempt == retries:
+                    raise
+            time.sleep(pause * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict['OPTIONS'].get('serialize_transactions'):
+            self._acquire_transaction_lock()
+        try:
+            return self._retry_busy(self._begin)
+        except BaseException:
+            self._release_transaction_lock()
+            raise
+
+    def write_in_autocommit(self, execute, query, params):
+        """Выполняет запись; вне транзакции — в очереди и с повторами."""
+        if not self.get_autocommit() or self._holds_transaction_lock:
+            return execute(query, params)
+        if self.settings_dict['OPTIONS'].get('serialize_transactions'):
+            self._acquire_transaction_lock()
+        try:
+            return self._retry_busy(execute, query, params)
+        finally:
+            self._release_transaction_lock()
+
+    def _acquire_transaction_lock(self):
+        # Ждём не дольше busy_timeout, как ждал бы сам SQLite.
+        timeout = self.pragmas.get('busy_timeout', 5000) / 1000
+        if not _transaction_lock(self.settings_dict['NAME']).acquire(
+                timeout=timeout):
+            raise OperationalError('database is locked')
+        self._holds_transaction_lock = True
+
+    def _release_transaction_lock(self):
+        if self._holds_transaction_lock:
+            self._holds_transaction_lock = False
+            _transaction_lock(self.settings_dict['NAME']).release()
+
+    def set_autocommit(self, autocommit, *args, **kwargs):
+        try:
+            super().set_autocommit(autocommit, *args, **kwargs)
+        finally:
+            if autocommit:
+                self._release_transaction_lock()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            # Вместе с соединением закончилась и его транзакция.
+            self._release_transaction_lock()
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def close_if_unusable_or_obsolete(self):
+        if (self.connection is not None
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.in_atomic_block
+                and not self.is_usable()):
+            self.close()
+            return
+        super().close_if_unusable_or_obsolete()
@@ -0,0 +1,156 @@
+"""Обслуживание файла SQLite без остановки сайта.
+
+Каждый шаг либо не берёт блокировку записи вовсе (checkpoint PASSIVE,
+статистика через dbstat), либо держит её в короткой транзакции через
+ту же очередь писателей, что и запросы сайта (см. base.py): ANALYZE и
+каждая порция incremental_vacuum. Между порциями писатели сайта
+успевают пройти.
+
+Исключение — enable_incremental_vacuum(): полный VACUUM переписывает
+файл целиком и блокирует запись на всё время работы.
+"""
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.utils import OperationalError
+
+
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+FileStats = namedtuple(
+    'FileStats',
+    'page_size page_count freelist_count auto_vacuum journal_mode')
+ObjectStats = namedtuple(
+    'ObjectStats', 'name kind pages size unused out_of_order')
+
+
+def is_writable(connection):
+    """База SQLite, открытая на запись, а не реплика только для чтения."""
+    options = connection.settings_dict['OPTIONS']
+    return (connection.vendor == 'sqlite'
+            and 'mode=ro' not in str(connection.settings_dict['NAME'])
+            and not options.get('pragmas', {}).get('query_only'))
+
+
+def pragma(connection, name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        row = cursor.fetchone()
+    return row and row[0]
+
+
+def file_stats(connection):
+    return FileStats(
+        page_size=pragma(connection, 'page_size'),
+        page_count=pragma(connection, 'page_count'),
+        freelist_count=pragma(connection, 'freelist_count'),
+        auto_vacuum=AUTO_VACUUM_MODES[pragma(connection, 'auto_vacuum')],
+        journal_mode=pragma(connection, 'journal_mode').upper(),
+    )
+
+
+def optimize(connection, full=False, analysis_limit=1000):
+    """Обновляет статистику планировщика.
+
+    По умолчанию — PRAGMA optimize: ANALYZE только тех таблиц, где
+    статистика устарела, с выборкой не больше analysis_limit строк на
+    индекс. full=True пересчитывает всё точно.
+    """
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            if full:
+                cursor.execute('ANALYZE')
+            else:
+                cursor.execute(
+                    f'PRAGMA analysis_limit = {int(analysis_limit)}')
+                cursor.execute('PRAGMA optimize')
+
+
+def incremental_vacuum(connection, step=500, pause=0.05, seconds=30):
+    """Отдаёт свободные страницы файла порциями по step страниц.
+
+    Работает только в режиме auto_vacuum = INCREMENTAL. Возвращает
+    число освобождённых страниц; останавливается, когда свободных
+    страниц не осталось или прошло seconds секунд.
+    """
+    deadline = time.monotonic() + seconds
+    freed = 0
+    free = pragma(connection, 'freelist_count')
+    while free and time.monotonic() < deadline:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA incremental_vacuum({int(step)})')
+                cursor.fetchall()
+        left = pragma(connection, 'freelist_count')
+        if left >= free:
+            break
+        freed, free = freed + free - left, left
+        time.sleep(pause)
+    return freed
+
+
+def enable_incremental_vacuum(connection):
+    """Переводит файл в auto_vacuum = INCREMENTAL полным VACUUM."""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def checkpoint(connection, mode='PASSIVE'):
+    """Переносит WAL в основной файл.
+
+    Возвращает (busy, страниц в WAL, перенесено страниц). PASSIVE
+    никого не ждёт; TRUNCATE ещё и обнуляет файл WAL, но ждёт читателей
+    до busy_timeout.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f'Неизвестный режим checkpoint: {mode}')
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+        return tuple(cursor.fetchone())
+
+
+def object_stats(connection):
+    """Размер и фрагментация таблиц и индексов по виртуальной таблице
+    dbstat, от больших к меньшим; None, если SQLite собран без неё.
+
+    out_of_order — доля листовых страниц, которые лежат в файле не
+    сразу за предыдущей страницей того же дерева: чем она выше, тем
+    больше случайных чтений при полном проходе по индексу.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT dbstat.name, sqlite_master.type, pageno, pagetype,'
+                ' pgsize, unused'
+                ' FROM dbstat LEFT JOIN sqlite_master'
+                ' ON sqlite_master.name = dbstat.name'
+                ' ORDER BY dbstat.name, path')
+            rows = cursor.fetchall()
+    except OperationalError:
+        return None
+    objects = {}
+    for name, kind, pageno, pagetype, pgsize, unused in rows:
+        stats = objects.setdefault(
+            name, {'kind': kind or 'table', 'pages': 0, 'size': 0,
+                   'unused': 0, 'leaves': 0, 'jumps': 0, 'last': None})
+        stats['pages'] += 1
+        stats['size'] += pgsize
+        stats['unused'] += unused
+        if pagetype != 'leaf':
+            continue
+        if stats['last'] is not None and pageno != stats['last'] + 1:
+            stats['jumps'] += 1
+        stats['leaves'] += 1
+        stats['last'] = pageno
+    result = [
+        ObjectStats(
+            name=name, kind=stats['kind'], pages=stats['pages'],
+            size=stats['size'], unused=stats['unused'] / stats['size'],
+            out_of_order=stats['jumps'] / max(stats['leaves'] - 1, 1))
+        for name, stats in objects.items()
+    ]
+    return sorted(result, key=lambda stats: stats.size, reverse=True)
@@ -0,0 +1,45 @@
+"""Счётчики версий в общем кеше.
+
+Версия нужна только затем, чтобы меняться: по ней процессы узнают, что
+чужой процесс что-то правил, и ключи их кешей устаревают. Поэтому кеш
+(CACHES['state']) должен быть общим для всех процессов сайта и команд.
+Он отделён от кеша страниц: записей в нём немного, они не вытесняются,
+и запись версии не платит за учёт тысяч страниц.
+
+Версия — текущее время в наносекундах, а не счётчик: новая версия
+пишется одной записью без чтения, две одновременные правки из разных
+процессов не сливаются в одну, а пропавшая после очистки кеша версия не
+совпадёт с прежним значением, под которым в кеше ещё лежат данные.
+"""
+import time
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+state = ConnectionProxy(caches, 'state')
+
+
+def new_version():
+    return time.time_ns()
+
+
+def bump(key):
+    """Меняет версию key."""
+    state.set(key, new_version(), None)
+
+
+def get(key):
+    version = state.get(key)
+    if version is None:
+        state.add(key, new_version(), None)
+        version = state.get(key)
+    return version
+
+
+def get_many(keys):
+    """Версии keys в том же порядке."""
+    versions = state.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get(key)
+    return [versions[key] for key in keys]
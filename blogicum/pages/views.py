@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+from django.conf import settings
 from django.views.generic import TemplateView
 from django.shortcuts import render
 
@@ -28,6 +29,16 @@ def server_error(request, *args, template_name='pages/500.html', **kwargs):
     )
 
 
+def service_unavailable(request, *args, **kwargs):
+    response = render(
+        request,
+        'pages/503.html',
+        status=HTTPStatus.SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = settings.BLOG_SQL_BUDGET_RETRY_AFTER
+    return response
+
+
 def csrf_failure(request, reason=''):
     return render(
         request,
@@ -1,6 +1,10 @@
+import multiprocessing
 import os
 import re
+import shutil
+import tempfile
 import time
+from datetime import timedelta
 from http import HTTPStatus
 from inspect import getsource
 from pathlib import Path
@@ -19,11 +23,13 @@ from typing import (
 import pytest
 from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.db.models import Model, Field
 from django.forms import BaseForm
 from django.http import HttpResponse
 from django.test import override_settings
 from django.test.client import Client
+from django.utils import timezone
 from mixer.backend.django import mixer as _mixer
 
 N_PER_FIXTURE = 3
@@ -41,6 +47,84 @@ def enable_debug_false():
         yield
 
 
+def pytest_configure(config):
+    # Общий файловый кеш тестов живёт во временном каталоге, а таймеры
+    # эпохи видимости не переживают тест, который их завёл, а архив
+    # включён, чтобы его база создавалась вместе с основной. Настройки
+    # меняются до сбора тестов: сбор уже открывает кеш.
+    from django.conf import settings
+
+    location = tempfile.mkdtemp(prefix="blogicum-cache-")
+    caches = {
+        alias: {**options, "LOCATION": os.path.join(location, alias)}
+        for alias, options in settings.CACHES.items()
+    }
+    config._shared_cache = (
+        location,
+        override_settings(CACHES=caches, BLOG_VISIBILITY_TIMER=False,
+                          BLOG_ARCHIVE_DB_ALIAS="archive"),
+    )
+    config._shared_cache[1].enable()
+
+
+def pytest_unconfigure(config):
+    location, overridden = config._shared_cache
+    overridden.disable()
+    shutil.rmtree(location, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def read_from_writer():
+    # Тесты работают только с псевдонимом default; реплика — его зеркало.
+    with override_settings(BLOG_DB_READ_ALIAS="default"):
+        yield
+
+
+def pytest_collection_modifyitems(items):
+    # Архив и, при BLOG_SPLIT_COMMENTS=1, комментарии лежат в своих базах,
+    # и тестам с базой нужны все псевдонимы, кроме зеркал.
+    from django.conf import settings
+
+    databases = [
+        alias for alias, options in settings.DATABASES.items()
+        if not options.get("TEST", {}).get("MIRROR")
+    ]
+    for item in items:
+        marker = item.get_closest_marker("django_db")
+        if marker is not None and "databases" not in marker.kwargs:
+            item.add_marker(
+                pytest.mark.django_db(
+                    *marker.args, databases=databases, **marker.kwargs),
+                append=False,
+            )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Откат транзакции между тестами не вызывает сигналы, поэтому
+    # закешированные данные одного теста не должны доживать до другого.
+    from django.conf import settings
+
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    yield
+
+
+def run_in_other_process(target, *args):
+    """Вызывает target в отдельном процессе, как другой процесс сайта.
+
+    Дочерний процесс не должен трогать базу: её соединение он делит с
+    тестом.
+    """
+    process = multiprocessing.get_context("fork").Process(
+        target=target, args=args)
+    process.start()
+    process.join()
+    assert process.exitcode == 0, (
+        f"Вызов {target.__name__} в другом процессе завершился ошибкой."
+    )
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -133,6 +217,18 @@ def another_user_client(another_user):
     return client
 
 
+@pytest.fixture
+def past_posts(many_posts_with_published_locations):
+    """Посты `many_posts_with_published_locations`, опубликованные по
+    одному в минуту до начала теста, от новых к старым.
+    """
+    now = timezone.now()
+    for minutes, post in enumerate(many_posts_with_published_locations):
+        post.pub_date = now - timedelta(minutes=minutes + 1)
+        post.save()
+    return many_posts_with_published_locations
+
+
 def get_post_list_context_key(
         user_client, page_url, page_load_err_msg, key_missing_msg
 ):
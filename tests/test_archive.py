@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.models.signals import post_delete
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.feed_index import feed_index
+from blog.models import Comment, FeedEntry, Post
+from blog.pagination import encode_cursor
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def aged_posts(many_posts_with_published_locations):
+    """20 постов пользователя `user`, по одному на день, от новых к
+    старым: пост с индексом i опубликован чуть больше i дней назад.
+    """
+    now = timezone.now()
+    for days, post in enumerate(many_posts_with_published_locations):
+        post.pub_date = now - timedelta(days=days, minutes=1)
+        post.save()
+    return many_posts_with_published_locations
+
+
+def _archive(older_than=10):
+    call_command("archive_posts", older_than=older_than, chunk_size=4)
+
+
+def _archived():
+    return Post.objects.using(settings.BLOG_ARCHIVE_DB_ALIAS)
+
+
+def test_archive_moves_old_posts_with_comments(mixer, user, aged_posts):
+    old, recent = aged_posts[-1], aged_posts[0]
+    mixer.blend(Comment, post=old, author=user, text="Старый комментарий")
+    mixer.blend(Comment, post=recent, author=user)
+    _archive()
+    assert Post.objects.count() == 10
+    assert _archived().count() == 10
+    assert not Comment.objects.filter(post_id=old.pk).exists()
+    assert Comment.objects.filter(post_id=recent.pk).exists()
+    archived = Comment.objects.using(settings.BLOG_ARCHIVE_DB_ALIAS)
+    assert list(archived.values_list("text", flat=True)) == [
+        "Старый комментарий"]
+    _archive()
+    assert _archived().count() == 10, "Повторный запуск ничего не меняет."
+
+
+def test_archive_updates_feeds_once_per_batch(
+        settings, mixer, user, aged_posts,
+        django_capture_on_commit_callbacks):
+    mixer.blend(Comment, post=aged_posts[-1], author=user)
+    settings.BLOG_FEED_SOURCE = "memory"
+    feed_index.load()
+    deleted = []
+
+    def count_deleted(**kwargs):
+        deleted.append(kwargs["sender"])
+
+    post_delete.connect(count_deleted, sender=Post)
+    post_delete.connect(count_deleted, sender=Comment)
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            _archive()
+    finally:
+        post_delete.disconnect(count_deleted, sender=Post)
+        post_delete.disconnect(count_deleted, sender=Comment)
+        ids = feed_index.post_ids()
+        feed_index.clear()
+    assert not deleted, "Порция удаляется без посигнальной обработки."
+    hot = {post.pk for post in aged_posts[:10]}
+    assert set(ids) == hot
+    assert set(FeedEntry.objects.values_list("post_id", flat=True)) == hot
+
+
+@pytest.mark.parametrize("archive", ("disabled", "empty", "unmigrated"))
+def test_site_works_without_archived_posts(settings, user, user_client,
+                                           aged_posts, archive):
+    alias = settings.BLOG_ARCHIVE_DB_ALIAS
+    if archive == "disabled":
+        settings.BLOG_ARCHIVE_DB_ALIAS = None
+    elif archive == "unmigrated":
+        with connections[alias].cursor() as cursor:
+            cursor.execute("DROP TABLE blog_post")
+    with CaptureQueriesContext(connections[alias]) as ctx:
+        for _ in range(2):
+            response = user_client.get(f"/profile/{user.username}/")
+            assert response.status_code == 200
+            assert user_client.get("/posts/100500/").status_code == 404
+    assert len(ctx.captured_queries) <= 1, (
+        "Пустой архив не должен опрашиваться на каждом запросе."
+    )
+
+
+def test_detail_falls_back_to_archive(mixer, user, user_client, aged_posts):
+    old = aged_posts[-1]
+    mixer.blend(Comment, post=old, author=user, text="Старый комментарий")
+    _archive()
+    response = user_client.get(f"/posts/{old.pk}/")
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert old.title in content and "Старый комментарий" in content
+    assert "Оставить комментарий" not in content, (
+        "Архивный пост нельзя комментировать."
+    )
+    assert user_client.get(f"/posts/{old.pk}/edit/").status_code == 404
+    assert user_client.get("/posts/100500/").status_code == 404
+
+
+@pytest.mark.parametrize("client_name", ("user_client",
+                                         "another_user_client"))
+def test_profile_continues_into_archive(request, client_name, user,
+                                        aged_posts):
+    client = request.getfixturevalue(client_name)
+    _archive(older_than=5)
+    expected = [post.pk for post in aged_posts]
+    url = f"/profile/{user.username}/"
+
+    pages = [client.get(url), client.get(f"{url}?page=2")]
+    assert [post.pk for response in pages
+            for post in response.context["page_obj"]] == expected
+
+    last_hot = aged_posts[3]
+    cursor = encode_cursor(last_hot.pub_date, last_hot.pk)
+    page = client.get(f"{url}?after={cursor}").context["page_obj"]
+    assert [post.pk for post in page] == expected[4:14]
+    archived = page.object_list[2]
+    cursor = encode_cursor(archived.pub_date, archived.pk)
+    page = client.get(f"{url}?before={cursor}").context["page_obj"]
+    assert [post.pk for post in page] == expected[:6]
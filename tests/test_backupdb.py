@@ -0,0 +1,98 @@
+import gzip
+import sqlite3
+
+import pytest
+from django.db import connection
+
+from core.sqlite3 import backup
+from core.sqlite3.base import DatabaseWrapper
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется backup API SQLite.")
+
+
+@pytest.fixture
+def file_db(tmp_path, django_db_blocker):
+    settings_dict = {**connection.settings_dict,
+                     "NAME": str(tmp_path / "live.sqlite3")}
+    db = DatabaseWrapper(settings_dict, alias="live")
+    with django_db_blocker.unblock():
+        with db.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (payload BLOB)")
+            cursor.execute(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1"
+                " FROM n WHERE i < 300) INSERT INTO item"
+                " SELECT zeroblob(2000) FROM n")
+        yield db
+        db.close()
+
+
+def _count(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT count(*) FROM item").fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_backup_keeps_snapshot_while_writers_commit(file_db, tmp_path):
+    remaining = []
+
+    def write_between_steps(left, total):
+        remaining.append(left)
+        with file_db.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES (zeroblob(2000))")
+
+    path = tmp_path / "copy.sqlite3"
+    stats = backup.backup(file_db, str(path), pages=20, sleep=0,
+                          progress=write_between_steps)
+    assert stats.snapshot and len(remaining) > 1
+    assert remaining == sorted(remaining, reverse=True), (
+        "Запись в базу не должна начинать копирование заново."
+    )
+    assert _count(path) == 300
+    assert backup.integrity_problems(path) == []
+
+
+def test_backup_pauses_between_steps(file_db, tmp_path, monkeypatch):
+    pauses, steps = [], []
+    monkeypatch.setattr(backup.time, "sleep", pauses.append)
+    backup.backup(file_db, str(tmp_path / "copy.sqlite3"), pages=20,
+                  sleep=0.01, progress=lambda left, total: steps.append(left))
+    assert len(pauses) == len(steps) - 1 and set(pauses) == {0.01}, (
+        "Между порциями страниц копия должна делать паузу."
+    )
+
+
+def test_compressed_backup_restores(file_db, tmp_path):
+    path = tmp_path / "copy.sqlite3.gz"
+    backup.backup(file_db, str(path), compress=True)
+    assert path.read_bytes()[:2] == backup.GZIP_MAGIC
+    with file_db.cursor() as cursor:
+        cursor.execute("DELETE FROM item")
+    backup.restore(file_db, str(path))
+    assert _count(file_db.settings_dict["NAME"]) == 300
+
+
+def test_restore_rejects_broken_copy(file_db, tmp_path):
+    path = tmp_path / "broken.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+    with pytest.raises(backup.BackupIntegrityError):
+        backup.restore(file_db, str(path))
+    assert _count(file_db.settings_dict["NAME"]) == 300
+
+
+def test_compressed_backup_streams_from_snapshot(file_db, tmp_path):
+    with file_db.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = WAL")
+    if not backup.can_stream(file_db):
+        pytest.skip("SQLite собран без sqlite_dbpage.")
+    path = tmp_path / "copy.sqlite3.gz"
+    stats = backup.backup(file_db, str(path), pages=20, compress=True)
+    assert stats.snapshot
+    restored = tmp_path / "restored.sqlite3"
+    with gzip.open(path) as src:
+        restored.write_bytes(src.read())
+    assert backup.integrity_problems(restored) == []
+    assert _count(restored) == 300
+    assert not (tmp_path / "restored.sqlite3-wal").exists()
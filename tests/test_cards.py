@@ -0,0 +1,42 @@
+import pytest
+from django.core import signing
+from django.core.cache import cache
+
+from blog.cards import PostCard
+from blog.pagination import encode_cursor
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def frozen_cursors(monkeypatch):
+    # Подписанный курсор содержит время подписи: две отрисовки на стыке
+    # секунд иначе разошлись бы в ссылках на соседние страницы.
+    timestamp = signing.TimestampSigner().timestamp()
+    monkeypatch.setattr(signing.TimestampSigner, "timestamp",
+                        lambda self: timestamp)
+
+
+def test_cards_render_like_models(settings, user_client, another_user_client,
+                                  past_posts, frozen_cursors):
+    post = past_posts[0]
+    cursor = encode_cursor(post.pub_date, post.pk)
+    pages = ((user_client, "/"),
+             (user_client, f"/category/{post.category.slug}/"),
+             (user_client, f"/profile/{post.author.username}/"),
+             (user_client,
+              f"/profile/{post.author.username}/?after={cursor}"),
+             (another_user_client, f"/profile/{post.author.username}/"))
+    for client, url in pages:
+        rendered = {}
+        for slotted in (False, True):
+            settings.BLOG_SLOTTED_CARDS = slotted
+            cache.clear()
+            response = client.get(url)
+            rendered[slotted] = response.content.decode()
+        assert all(isinstance(card, PostCard)
+                   for card in response.context["page_obj"])
+        assert rendered[True] == rendered[False], (
+            f"Карточки PostCard на странице `{url}` должны выглядеть так же,"
+            " как карточки моделей."
+        )
@@ -0,0 +1,76 @@
+import pytest
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.test import RequestFactory
+
+from blog.models import Comment, Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _stored_count(post):
+    return Post.objects.values_list(
+        "comment_count", flat=True).get(pk=post.pk)
+
+
+def test_comment_count_follows_create_and_delete(
+        user_client, post_with_published_location):
+    post = post_with_published_location
+    assert _stored_count(post) == 0
+    for i in range(3):
+        user_client.post(
+            f"/posts/{post.id}/comment/", data={"text": f"Комментарий {i}"})
+    assert _stored_count(post) == 3, (
+        "Убедитесь, что при создании комментария увеличивается счётчик"
+        " комментариев поста."
+    )
+    comment = Comment.objects.filter(post=post).first()
+    user_client.post(f"/posts/{post.id}/delete_comment/{comment.id}/")
+    assert _stored_count(post) == 2, (
+        "Убедитесь, что при удалении комментария уменьшается счётчик"
+        " комментариев поста."
+    )
+
+
+def test_admin_unpublish_adjusts_comment_count(
+        mixer, user, post_with_published_location):
+    post = post_with_published_location
+    comment = mixer.blend(Comment, post=post, author=user, is_published=True)
+    Post.objects.filter(pk=post.pk).update(comment_count=1)
+    comment_admin = site._registry[Comment]
+    request = RequestFactory().post("/admin/")
+    request.user = user
+
+    comment.is_published = False
+    comment_admin.save_model(request, comment, form=None, change=True)
+    assert _stored_count(post) == 0
+
+    comment.is_published = True
+    comment_admin.save_model(request, comment, form=None, change=True)
+    assert _stored_count(post) == 1
+
+    comment_admin.delete_queryset(
+        request, Comment.objects.filter(pk=comment.pk))
+    assert _stored_count(post) == 0
+
+
+def test_reconcile_comment_counts(mixer, user, post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(4).blend(Comment, post=post, author=user, is_published=True)
+    mixer.blend(Comment, post=post, author=user, is_published=False)
+    Post.objects.filter(pk=post.pk).update(comment_count=42)
+    call_command("reconcile_comment_counts", chunk_size=1)
+    assert _stored_count(post) == 4
+
+
+def test_detail_lists_the_comments_it_counts(
+        mixer, user, user_client, post_with_published_location):
+    post = post_with_published_location
+    shown = mixer.blend(Comment, post=post, author=user, is_published=True)
+    mixer.blend(Comment, post=post, author=user, is_published=False)
+    Post.objects.filter(pk=post.pk).update(comment_count=1)
+    comments = user_client.get(f"/posts/{post.id}/").context["comments"]
+    assert [comment.pk for comment in comments] == [shown.pk], (
+        "Страница поста должна показывать те же комментарии, что "
+        "считает comment_count."
+    )
@@ -0,0 +1,57 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Comment
+from blog.views import PostDetailView
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def small_comment_pages(monkeypatch):
+    monkeypatch.setattr(PostDetailView, "comments_paginate_by", 3)
+
+
+def _comments_url(response):
+    page = response.context["comments"]
+    return f"?comments_after={page.next_cursor}" if page.has_next() else None
+
+
+def test_comments_are_paged_by_cursor(
+        mixer, user, user_client, post_with_published_location,
+        small_comment_pages):
+    post = post_with_published_location
+    created = [mixer.blend(Comment, post=post, author=user)
+               for _ in range(7)]
+    url = f"/posts/{post.id}/"
+
+    seen = []
+    page_url = ""
+    while page_url is not None:
+        response = user_client.get(url + page_url)
+        assert response.status_code == 200
+        seen += list(response.context["comments"])
+        page_url = _comments_url(response)
+    assert [comment.pk for comment in seen] == [
+        comment.pk for comment in
+        sorted(created, key=lambda c: (c.created_at, c.pk))
+    ], "Страницы комментариев должны идти по (created_at, id) без пропусков."
+
+
+def test_detail_query_count_does_not_grow_with_comments(
+        mixer, user, another_user, user_client,
+        post_with_published_location, small_comment_pages):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/"
+    mixer.blend(Comment, post=post, author=user)
+    with CaptureQueriesContext(connection) as few:
+        user_client.get(url)
+    for author in (user, another_user) * 3:
+        mixer.blend(Comment, post=post, author=author)
+    with CaptureQueriesContext(connection) as many:
+        user_client.get(url)
+    assert len(many) == len(few), (
+        "Число запросов страницы поста не должно зависеть от числа "
+        "комментариев и их авторов."
+    )
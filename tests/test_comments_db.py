@@ -0,0 +1,51 @@
+import pytest
+
+from blog.models import Comment, Post
+from core.db_router import CommentsRouter
+
+
+def test_router_sends_comments_to_their_database(settings):
+    settings.BLOG_COMMENTS_DB_ALIAS = "comments"
+    router = CommentsRouter()
+    assert router.db_for_read(Comment) == "comments"
+    assert router.db_for_write(Comment) == "comments"
+    assert router.db_for_read(Post) is None
+    assert router.allow_migrate("comments", "blog", "comment") is True
+    assert router.allow_migrate("comments", "blog", "post") is False
+    assert router.allow_migrate("comments", "auth", "user") is False
+    assert router.allow_migrate("comments", "blog") is False
+    assert router.allow_migrate("default", "blog", "comment") is False
+    assert router.allow_migrate("default", "blog", "post") is None
+
+
+def test_router_keeps_single_database_layout(settings):
+    settings.BLOG_COMMENTS_DB_ALIAS = "default"
+    router = CommentsRouter()
+    assert router.db_for_read(Comment) is None
+    assert router.db_for_write(Comment) is None
+    assert router.allow_migrate("default", "blog", "comment") is None
+
+
+@pytest.mark.django_db
+def test_deleting_post_deletes_its_comments(
+        mixer, user, post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(2).blend(Comment, post=post, author=user)
+    post.delete()
+    assert not Comment.objects.filter(post_id=post.pk).exists(), (
+        "Комментарии удалённого поста должны удаляться вместе с ним."
+    )
+
+
+@pytest.mark.django_db
+def test_deleting_author_deletes_comments_and_adjusts_counts(
+        mixer, user, another_user, post_with_published_location):
+    post = post_with_published_location
+    mixer.cycle(2).blend(Comment, post=post, author=another_user,
+                         is_published=True)
+    mixer.blend(Comment, post=post, author=user, is_published=True)
+    Post.objects.filter(pk=post.pk).update(comment_count=3)
+    another_user.delete()
+    assert list(Comment.objects.values_list("author_id", flat=True)) == [
+        user.pk]
+    assert Post.objects.get(pk=post.pk).comment_count == 1
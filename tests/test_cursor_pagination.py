@@ -0,0 +1,57 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.utils import timezone
+
+from blog.models import Post
+from conftest import N_PER_PAGE
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def dated_posts(mixer, user, published_category):
+    now = timezone.now()
+    dates = (now - timedelta(hours=i) for i in range(N_PER_PAGE * 2 + 5))
+    # Одинаковая дата у пары постов проверяет разведение по id.
+    posts = mixer.cycle(N_PER_PAGE * 2 + 5).blend(
+        Post, author=user, category=published_category,
+        is_published=True, pub_date=dates)
+    posts[1].pub_date = posts[0].pub_date
+    posts[1].save()
+    return list(Post.objects.order_by("-pub_date", "-pk"))
+
+
+def _ids(response):
+    return [post.pk for post in response.context["page_obj"]]
+
+
+def test_deep_offset_page_redirects_to_cursor(client, settings, dated_posts):
+    settings.BLOG_MAX_OFFSET_PAGE = 1
+    response = client.get("/?page=2")
+    assert response.status_code == 302
+    assert "after" in parse_qs(urlparse(response.url).query)
+
+    second = client.get(response.url)
+    assert _ids(second) == [p.pk for p in dated_posts[10:20]]
+
+    page_obj = second.context["page_obj"]
+    third = client.get("/", {"after": page_obj.next_cursor})
+    assert _ids(third) == [p.pk for p in dated_posts[20:]]
+    assert not third.context["page_obj"].has_next()
+
+    back = client.get(
+        "/", {"before": third.context["page_obj"].previous_cursor})
+    assert _ids(back) == [p.pk for p in dated_posts[10:20]]
+
+
+def test_first_pages_stay_offset_paginated(client, settings, dated_posts):
+    settings.BLOG_MAX_OFFSET_PAGE = 1
+    response = client.get("/?page=1")
+    assert response.status_code == 200
+    assert _ids(response) == [p.pk for p in dated_posts[:10]]
+
+
+def test_tampered_cursor_is_rejected(client, dated_posts):
+    assert client.get("/", {"after": "forged"}).status_code == 404
@@ -0,0 +1,181 @@
+import contextvars
+import threading
+import time
+
+import sqlite3
+
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+
+from blog.models import Post
+from core.db_router import (STICKY_COOKIE, ReadWriteMiddleware,
+                            ReadWriteRouter)
+from core.sqlite3.base import DatabaseWrapper
+
+
+def test_reads_follow_writes_within_a_request(settings):
+    settings.BLOG_DB_READ_ALIAS = "replica"
+    router = ReadWriteRouter()
+
+    def request():
+        before = router.db_for_read(Post)
+        router.db_for_write(Post)
+        asked = router.db_for_read(Post)
+        post_save.send(sender=Group, instance=Group(), created=True)
+        return before, asked, router.db_for_read(Post)
+
+    assert contextvars.Context().run(request) == (
+        "replica", "replica", "default"), (
+        "На писателя чтение переводит сохранение, а не вопрос роутеру."
+    )
+    assert contextvars.Context().run(router.db_for_read, Post) == "replica", (
+        "Привязка к писателю не должна переживать запрос."
+    )
+
+
+@pytest.mark.django_db
+def test_writing_request_sets_sticky_cookie(
+        user_client, post_with_published_location):
+    post = post_with_published_location
+    response = user_client.post(f"/posts/{post.id}/comment/",
+                                {"text": "Комментарий"})
+    assert STICKY_COOKIE in response.cookies
+    response = user_client.get(f"/posts/{post.id}/")
+    assert STICKY_COOKIE not in response.cookies
+
+
+def test_unsafe_request_reads_from_writer(rf, settings):
+    settings.BLOG_DB_READ_ALIAS = "replica"
+
+    def view(request):
+        return HttpResponse(ReadWriteRouter().db_for_read(Post))
+
+    middleware = ReadWriteMiddleware(view)
+    assert middleware(rf.get("/")).content == b"replica"
+    response = middleware(rf.post("/"))
+    assert response.content == b"default", (
+        "Удаления и update() в POST не шлют post_save, но должны читать "
+        "из писателя."
+    )
+    assert STICKY_COOKIE in response.cookies
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется бэкенд SQLite.")
+def test_writer_serializes_transactions(tmp_path, django_db_blocker):
+    # Отложенный BEGIN не блокирует SQLite: ждать заставляет только
+    # очередь транзакций процесса.
+    settings_dict = {
+        **connection.settings_dict,
+        "NAME": str(tmp_path / "writer.sqlite3"),
+        "OPTIONS": {**connection.settings_dict["OPTIONS"],
+                    "transaction_mode": None,
+                    "serialize_transactions": True},
+    }
+    events = []
+
+    def begin(name):
+        db = DatabaseWrapper(settings_dict, alias=name)
+        db.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        events.append(f"{name} begin")
+        return db
+
+    def second():
+        db = begin("second")
+        db.set_autocommit(True)
+        db.close()
+
+    with django_db_blocker.unblock():
+        first = begin("first")
+        waiter = threading.Thread(target=second)
+        waiter.start()
+        time.sleep(0.2)
+        events.append("first commit")
+        first.commit()
+        first.set_autocommit(True)
+        waiter.join()
+        first.close()
+
+    assert events == ["first begin", "first commit", "second begin"], (
+        "Вторая транзакция процесса должна ждать завершения первой."
+    )
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется бэкенд SQLite.")
+def test_autocommit_writes_wait_for_transactions(tmp_path, django_db_blocker):
+    settings_dict = {
+        **connection.settings_dict,
+        "NAME": str(tmp_path / "writer.sqlite3"),
+        "OPTIONS": {**connection.settings_dict["OPTIONS"],
+                    "transaction_mode": None,
+                    "serialize_transactions": True},
+    }
+    events = []
+
+    def second():
+        db = DatabaseWrapper(settings_dict, alias="second")
+        with db.cursor() as cursor:
+            cursor.execute("INSERT INTO probe VALUES (1)")
+        events.append("second insert")
+        db.close()
+
+    with django_db_blocker.unblock():
+        first = DatabaseWrapper(settings_dict, alias="first")
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TABLE probe (value INTEGER)")
+        first.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        events.append("first begin")
+        waiter = threading.Thread(target=second)
+        waiter.start()
+        time.sleep(0.2)
+        events.append("first commit")
+        first.commit()
+        first.set_autocommit(True)
+        waiter.join()
+        first.close()
+
+    assert events == ["first begin", "first commit", "second insert"], (
+        "Запись вне atomic() должна ждать транзакцию процесса."
+    )
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется бэкенд SQLite.")
+def test_autocommit_writes_retry_busy_database(tmp_path, django_db_blocker):
+    name = str(tmp_path / "writer.sqlite3")
+    options = connection.settings_dict["OPTIONS"]
+    settings_dict = {
+        **connection.settings_dict,
+        "NAME": name,
+        "OPTIONS": {**options,
+                    "busy_retries": 5,
+                    "busy_backoff": 0.05,
+                    "pragmas": {**options.get("pragmas", {}),
+                                "busy_timeout": 20}},
+    }
+    other = sqlite3.connect(name, isolation_level=None,
+                            check_same_thread=False)
+    other.execute("CREATE TABLE probe (value INTEGER)")
+    with django_db_blocker.unblock():
+        db = DatabaseWrapper(settings_dict, alias="retrying")
+        db.ensure_connection()
+        # Другой процесс держит запись дольше busy_timeout, но меньше,
+        # чем длятся повторы.
+        other.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.2, other.execute, ("COMMIT",))
+        release.start()
+        try:
+            with db.cursor() as cursor:
+                cursor.execute("INSERT INTO probe VALUES (1)")
+        finally:
+            release.join()
+            db.close()
+            other.close()
+    assert sqlite3.connect(name).execute(
+        "SELECT COUNT(*) FROM probe").fetchone() == (1,)
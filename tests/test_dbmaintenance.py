@@ -0,0 +1,60 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, connections
+
+from core.sqlite3 import maintenance
+from core.sqlite3.base import DatabaseWrapper
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется обслуживание SQLite.")
+
+
+@pytest.fixture
+def file_db(tmp_path, django_db_blocker):
+    settings_dict = {**connection.settings_dict,
+                     "NAME": str(tmp_path / "maintained.sqlite3")}
+    db = DatabaseWrapper(settings_dict, alias="maintained")
+    connections["maintained"] = db
+    with django_db_blocker.unblock():
+        yield db
+        db.close()
+    del connections["maintained"]
+
+
+def test_incremental_vacuum_frees_pages_in_steps(file_db):
+    with file_db.cursor() as cursor:
+        cursor.execute("CREATE TABLE junk (payload BLOB)")
+        cursor.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n"
+            " WHERE i < 200) INSERT INTO junk SELECT zeroblob(4000) FROM n")
+        cursor.execute("DELETE FROM junk")
+    stats = maintenance.file_stats(file_db)
+    assert stats.auto_vacuum == "INCREMENTAL"
+    assert stats.freelist_count > 100
+
+    freed = maintenance.incremental_vacuum(file_db, step=10, pause=0)
+    assert freed == stats.freelist_count
+    assert maintenance.file_stats(file_db).freelist_count == 0
+
+
+def test_object_stats_report_tables_and_indexes(file_db):
+    with file_db.cursor() as cursor:
+        cursor.execute("CREATE TABLE item (name TEXT)")
+        cursor.execute("CREATE INDEX item_name ON item (name)")
+    maintenance.optimize(file_db)
+    objects = maintenance.object_stats(file_db)
+    if objects is None:
+        pytest.skip("SQLite собран без dbstat.")
+    kinds = {item.name: item.kind for item in objects}
+    assert kinds["item"] == "table" and kinds["item_name"] == "index"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dbmaintenance_command_runs_on_default():
+    out = StringIO()
+    call_command("dbmaintenance", database=["default"], stdout=out)
+    output = out.getvalue()
+    assert "Статистика планировщика обновлена" in output
+    assert "blog_post" in output or "dbstat" in output
@@ -0,0 +1,40 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.template.defaultfilters import truncatewords
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+LONG_TEXT = " ".join(f"слово{i}" for i in range(50))
+
+
+def test_excerpt_follows_text(post_with_published_location):
+    post = post_with_published_location
+    post.text = LONG_TEXT
+    post.save(update_fields=["text"])
+    post.refresh_from_db()
+    assert post.excerpt == truncatewords(LONG_TEXT, 10)
+
+
+def test_feed_does_not_fetch_post_text(user_client,
+                                       many_posts_with_published_locations):
+    with CaptureQueriesContext(connection) as ctx:
+        user_client.get("/")
+    post_selects = [q["sql"] for q in ctx.captured_queries
+                    if 'FROM "blog_post"' in q["sql"]
+                    and q["sql"].startswith("SELECT")]
+    assert post_selects
+    assert not any('"blog_post"."text"' in sql for sql in post_selects), (
+        "Лента не должна читать полный текст постов."
+    )
+
+
+def test_backfill_excerpts(post_with_published_location):
+    post = post_with_published_location
+    Post.objects.filter(pk=post.pk).update(excerpt="", text=LONG_TEXT)
+    call_command("backfill_excerpts", missing=True)
+    post.refresh_from_db()
+    assert post.excerpt == truncatewords(LONG_TEXT, 10)
@@ -0,0 +1,192 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache, caches
+from django.db import connection
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from blog.feed_cache import (GLOBAL_SCOPE, author_scope, bump_versions,
+                             category_scope, get_versions, scopes_of_posts)
+from blog.models import Comment, FeedEntry, Post
+from conftest import run_in_other_process
+from core import versions
+
+pytestmark = [pytest.mark.django_db]
+
+User = get_user_model()
+
+
+@pytest.fixture
+def visible_post(post_with_published_location):
+    post = post_with_published_location
+    post.is_published = True
+    post.pub_date = timezone.now() - timedelta(days=1)
+    post.save()
+    return post
+
+
+def test_anonymous_feed_page_is_served_from_cache(
+        client, many_posts_with_published_locations):
+    first = client.get("/")
+    with CaptureQueriesContext(connection) as ctx:
+        second = client.get("/")
+    assert second.content == first.content
+    assert not any('"blog_post"' in q["sql"] for q in ctx.captured_queries), (
+        "Повторный запрос ленты анонимом должен отдаваться из кеша."
+    )
+
+
+def test_comment_resets_only_affected_scopes(
+        mixer, user, post_with_published_location, post_with_another_category):
+    post = post_with_published_location
+    other_scope = category_scope(post_with_another_category.category_id)
+    scopes = [GLOBAL_SCOPE, category_scope(post.category_id),
+              author_scope(post.author_id), other_scope]
+    before = get_versions(scopes)
+
+    mixer.blend(Comment, post=post, author=user)
+
+    after = get_versions(scopes)
+    assert all(new > old for new, old in zip(after[:3], before[:3]))
+    assert after[3] == before[3], (
+        "Комментарий не должен сбрасывать кеш лент других категорий."
+    )
+
+
+def test_versions_are_shared_between_processes(user):
+    scopes = [GLOBAL_SCOPE, author_scope(user.pk)]
+    before = get_versions(scopes)
+
+    run_in_other_process(bump_versions, *scopes)
+    bumped = get_versions(scopes)
+    assert all(new != old for new, old in zip(bumped, before)), (
+        "Сброс версий в одном процессе должен быть виден в остальных."
+    )
+
+    run_in_other_process(versions.state.clear)
+    cleared = get_versions(scopes)
+    assert all(new not in (old, older)
+               for new, old, older in zip(cleared, bumped, before)), (
+        "После очистки кеша другим процессом версии не должны совпасть "
+        "с прежними."
+    )
+
+
+def test_cache_writes_do_not_list_cache_directory(monkeypatch):
+    listings = {}
+    for alias in ("default", "state"):
+        backend = caches[alias]
+        list_files = backend._list_cache_files
+
+        def counting(alias=alias, list_files=list_files):
+            listings[alias] = listings.get(alias, 0) + 1
+            return list_files()
+        monkeypatch.setattr(backend, "_list_cache_files", counting)
+
+    for n in range(200):
+        versions.bump(f"test:version:{n}")
+        cache.set(f"test:page:{n}", n)
+    assert "state" not in listings, (
+        "Запись версии не должна перебирать файлы кеша."
+    )
+    assert listings.get("default", 0) <= 2, (
+        "Кеш страниц должен проверять переполнение не на каждой записи."
+    )
+
+
+def test_post_card_fragment_is_keyed_on_updated_at(user_client, visible_post):
+    post = visible_post
+    assert post.title in user_client.get("/").content.decode()
+
+    # update() не меняет updated_at, поэтому карточка берётся из кеша.
+    Post.objects.filter(pk=post.pk).update(title="Заголовок без сигнала")
+    assert post.title in user_client.get("/").content.decode()
+
+    post.refresh_from_db()
+    post.title = "Новый заголовок"
+    post.save()
+    content = user_client.get("/").content.decode()
+    assert "Новый заголовок" in content
+
+
+def test_timeline_rebuild_repairs_entries(user_client, visible_post):
+    post = visible_post
+    FeedEntry.objects.all().delete()
+    assert post.title not in user_client.get("/").content.decode()
+
+    call_command("rebuild_timeline", incremental=True)
+    assert FeedEntry.objects.filter(post=post).count() == 3
+    assert post.title in user_client.get("/").content.decode()
+
+    Post.objects.filter(pk=post.pk).update(is_published=False,
+                                           is_visible=False)
+    # Водяной знак хранится в базе и переживает очистку кеша.
+    cache.clear()
+    call_command("rebuild_timeline", incremental=True)
+    assert FeedEntry.objects.filter(post=post).exists(), (
+        "Инкрементальная пересборка не должна трогать посты без изменений."
+    )
+    call_command("rebuild_timeline")
+    assert not FeedEntry.objects.filter(post=post).exists()
+
+
+def test_category_republish_restores_timeline(user_client, visible_post):
+    post = visible_post
+    category = post.category
+    category.is_published = False
+    category.save()
+    assert not FeedEntry.objects.filter(post=post).exists(), (
+        "Снятая с публикации категория должна пропасть из лент."
+    )
+    assert post.title not in user_client.get("/").content.decode()
+
+    category.is_published = True
+    category.save()
+    assert FeedEntry.objects.filter(post=post).count() == 3, (
+        "Возвращённая категория должна вернуть посты в ленты."
+    )
+    assert post.title in user_client.get("/").content.decode()
+
+
+def test_no_posts_means_no_scopes():
+    assert scopes_of_posts(Post.objects.none()) == set()
+
+
+def test_author_saves_reset_only_rendered_feeds(mixer, user, visible_post):
+    scopes = [GLOBAL_SCOPE, author_scope(user.pk)]
+    before = get_versions(scopes)
+    mixer.blend(User)
+    user.last_login = timezone.now()
+    user.save(update_fields=["last_login"])
+    user.email = "new@example.com"
+    user.save()
+    assert get_versions(scopes) == before, (
+        "Регистрация, вход и правка невидимых полей не должны "
+        "сбрасывать ленты."
+    )
+
+    user.first_name = "Новое имя"
+    user.save()
+    global_version, author_version = get_versions(scopes)
+    assert global_version == before[0] and author_version != before[1]
+
+    user.username = "renamed"
+    user.save()
+    assert get_versions(scopes)[0] != global_version
+
+
+def test_post_delete_does_not_reset_feeds_per_comment(mixer, user,
+                                                      visible_post):
+    mixer.cycle(5).blend(Comment, post=visible_post, author=user)
+    with CaptureQueriesContext(connection) as ctx:
+        visible_post.delete()
+    post_lookups = [query for query in ctx.captured_queries
+                    if query["sql"].startswith("SELECT")
+                    and '"blog_post"' in query["sql"]]
+    assert len(post_lookups) <= 2, (
+        "Комментарии, удаляемые вместе с постом, не должны по одному "
+        "сбрасывать ленты."
+    )
@@ -0,0 +1,155 @@
+import sys
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from blog.feed_cache import GLOBAL_SCOPE, category_scope
+from blog.feed_index import Column, FeedData, IndexedFeed, feed_index
+from blog.pagination import encode_cursor
+from blog.models import FeedChange, Post
+from blog.visibility import advance_epoch
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def memory_feed(settings, past_posts):
+    # Фоновый поток не видит данных незавершённой транзакции теста,
+    # поэтому индекс загружается здесь же.
+    settings.BLOG_FEED_SOURCE = "memory"
+    feed_index.clear()
+    feed_index.load()
+    yield feed_index
+    feed_index.clear()
+
+
+@pytest.fixture
+def reloads(monkeypatch):
+    calls = []
+    monkeypatch.setattr(feed_index, "refresh_in_background",
+                        lambda: calls.append(True))
+    return calls
+
+
+def _page_ids(response):
+    return [post.pk for post in response.context["page_obj"]]
+
+
+def test_index_pages_match_timeline(user_client, settings, memory_feed,
+                                    past_posts):
+    post = past_posts[3]
+    cursor = encode_cursor(post.pub_date, post.pk)
+    urls = ("/", "/?page=2", f"/?after={cursor}", f"/?before={cursor}",
+            f"/category/{post.category.slug}/",
+            f"/profile/{post.author.username}/")
+    expected = {}
+    for url in urls:
+        settings.BLOG_FEED_SOURCE = "timeline"
+        expected[url] = _page_ids(user_client.get(url))
+    settings.BLOG_FEED_SOURCE = "memory"
+    for url in urls:
+        assert _page_ids(user_client.get(url)) == expected[url], (
+            f"Страница `{url}` из индекса в памяти должна совпадать с "
+            "материализованной лентой."
+        )
+
+
+def test_index_follows_post_changes(memory_feed, past_posts,
+                                    django_capture_on_commit_callbacks):
+    post = past_posts[0]
+    feed = IndexedFeed(GLOBAL_SCOPE)
+    assert feed.count() == len(past_posts)
+    visible = Post.objects.filter(is_visible=True).order_by("pk")
+    # Дата, id, категория и автор: 24 байта на пост, дырки в id даром.
+    assert memory_feed.nbytes() == 24 * visible.count()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.is_published = False
+        post.save()
+    assert post.pk not in [key.post_id for key in feed[0:len(past_posts)]]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.is_published = True
+        post.pub_date = timezone.now() + timedelta(days=1)
+        post.save()
+    assert feed.count() == len(past_posts) - 1, (
+        "Отложенный пост не должен попадать в ленту из индекса."
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.category.is_published = False
+        post.category.save()
+    assert IndexedFeed(category_scope(post.category_id)).count() == 0
+    assert not Post.objects.filter(pk__in=memory_feed.post_ids(),
+                                   category=post.category).exists()
+
+
+def test_feed_is_read_from_timeline_until_index_loads(
+        user_client, settings, past_posts, reloads):
+    settings.BLOG_FEED_SOURCE = "memory"
+    feed_index.clear()
+    response = user_client.get("/")
+    assert _page_ids(response), (
+        "Пока индекс загружается, лента должна читаться из FeedEntry."
+    )
+    assert reloads and not feed_index.loaded, (
+        "Индекс должен загружаться в фоне, а не внутри запроса."
+    )
+
+
+def test_stale_index_is_served_while_rebuilt(
+        user_client, settings, memory_feed, reloads):
+    settings.BLOG_FEED_INDEX_REFRESH = 0
+    expected = _page_ids(user_client.get("/"))
+    assert not reloads
+
+    advance_epoch()
+    assert _page_ids(user_client.get("/")) == expected
+    assert reloads, (
+        "Смена эпохи в общем кеше должна перестраивать индекс в фоне."
+    )
+
+
+def test_column_finds_only_whole_values():
+    def value(*octets):
+        return int.from_bytes(bytes(octets), sys.byteorder)
+
+    # Байты 1, 0, 0, 0 встречаются и на стыке первого и второго значения.
+    column = Column("i", [value(0, 0, 0, 1), value(0, 0, 0, 0),
+                          value(1, 0, 0, 0), value(0, 0, 0, 1)])
+    one = value(1, 0, 0, 0)
+    assert column.find(one, 0, len(column)) == 2
+    assert column.rfind(one, 0, len(column)) == 2
+    assert column.find(one, 0, 2) == column.rfind(one, 0, 2) == -1
+    assert column.count(value(0, 0, 0, 1), 0, len(column)) == 2
+
+    with pytest.raises(OverflowError):
+        column.insert(0, 2 ** 31)
+    assert len(column) == 4
+
+
+def test_too_large_ids_are_rejected_whole():
+    data = FeedData()
+    with pytest.raises(OverflowError):
+        data.add(timezone.now(), 1, None, 2 ** 31)
+    assert len(data) == 0 and data.nbytes() == 0
+
+
+def test_index_catches_up_with_other_processes(memory_feed, past_posts,
+                                               monkeypatch):
+    post = past_posts[0]
+    # Правка другого процесса: без сигналов, но с записью в журнал.
+    Post.objects.filter(pk=post.pk).update(is_published=False,
+                                           is_visible=False)
+    FeedChange.objects.create(post_id=post.pk)
+    advance_epoch()
+
+    def no_full_reload():
+        raise AssertionError("Индекс должен догонять журнал, а не "
+                             "строиться заново.")
+
+    monkeypatch.setattr(feed_index, "load", no_full_reload)
+    feed_index.refresh()
+    assert post.pk not in memory_feed.post_ids()
+    assert IndexedFeed(GLOBAL_SCOPE).count() == len(past_posts) - 1
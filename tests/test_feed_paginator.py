@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _count_queries(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(url)
+    return [q for q in ctx.captured_queries if "COUNT(" in q["sql"]]
+
+
+def test_feed_count_is_cached_and_invalidated(
+        client, mixer, user, published_category,
+        many_posts_with_published_locations):
+    assert _count_queries(client, "/")
+    assert not _count_queries(client, "/?page=2"), (
+        "Повторный запрос ленты не должен заново считать число постов."
+    )
+    mixer.blend(Post, author=user, category=published_category)
+    assert _count_queries(client, "/"), (
+        "После создания поста число постов в ленте должно пересчитываться."
+    )
+
+
+def test_page_range_is_elided(client, mixer, user, published_category):
+    mixer.cycle(10 * 20).blend(
+        Post, author=user, category=published_category, is_published=True,
+        pub_date=timezone.now())
+    response = client.get("/?page=10")
+    page_range = response.context["page_range"]
+    paginator = response.context["paginator"]
+    assert paginator.ELLIPSIS in page_range
+    assert page_range[0] == 1 and page_range[-1] == paginator.num_pages
+    assert 10 in page_range
+    assert len(page_range) < paginator.num_pages
@@ -0,0 +1,97 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.forbidden_words import (ForbiddenWordsMatcher, bump_version,
+                                  get_matcher)
+from blog.forms import CommentForm, PostForm
+from blog.models import ForbiddenWord
+from conftest import run_in_other_process
+from core import versions
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def fresh_version():
+    versions.state.clear()
+    yield
+    versions.state.clear()
+
+
+@pytest.mark.parametrize("text, found", [
+    ("Это Плохо, очень.", "Плохо"),
+    ("совсем-плохо", "плохо"),
+    ("«плохиш»!", "плохиш"),
+    ("хорошо", None),
+    ("Ужас!", "Ужас"),
+    ("Много ужасов", "ужасов"),
+    ("плохой день", "плохой"),
+    ("поплохело", None),
+    ("нечто-то, что-то.", "что-то"),
+    ("что то", None),
+])
+def test_words_match_in_any_form(text, found):
+    matcher = ForbiddenWordsMatcher(["плохо", "плохиш", "«ужас»", "что-то"])
+    assert matcher.find(text) == found
+
+
+def test_stems_are_stored_with_words():
+    word = ForbiddenWord.objects.create(word="Плохой")
+    assert word.stem == "плох"
+    word.word = "ужасный"
+    word.save(update_fields=["word"])
+    assert ForbiddenWord.objects.get(pk=word.pk).stem == "ужасн"
+
+
+def test_words_saved_without_stems_still_match():
+    ForbiddenWord.objects.bulk_create([ForbiddenWord(word="Плохой")])
+    assert get_matcher().find("всё плохо!") == "плохо"
+
+
+def test_matches_map_back_to_list_entries():
+    matcher = ForbiddenWordsMatcher(["Плохой", "что-то"])
+    assert matcher.find_entry("Всё плохо!") == "Плохой"
+    assert matcher.find_entry("нечто-то, ЧТО-ТО.") == "что-то"
+    assert matcher.find_entry("хорошо") is None
+
+
+def test_matcher_rebuilds_when_words_change():
+    ForbiddenWord.objects.create(word="плохо")
+    assert get_matcher().find("всё плохо!") == "плохо"
+    with CaptureQueriesContext(connection) as ctx:
+        get_matcher()
+    assert not ctx.captured_queries, (
+        "Автомат не должен пересобираться без правок списка."
+    )
+    ForbiddenWord.objects.create(word="ужас")
+    assert get_matcher().find("ужас.") == "ужас"
+    ForbiddenWord.objects.filter(word="плохо").delete()
+    assert get_matcher().find("всё плохо!") is None
+
+
+def test_matcher_rebuilds_after_edit_in_other_process():
+    word = ForbiddenWord.objects.create(word="плохо")
+    assert get_matcher().find("ужас.") is None
+    # Правка без сигналов, как если бы её сделал другой процесс.
+    ForbiddenWord.objects.filter(pk=word.pk).update(word="ужас", stem="ужас")
+
+    run_in_other_process(bump_version)
+    assert get_matcher().find("ужас.") == "ужас", (
+        "Процесс должен пересобрать список после правки в другом процессе."
+    )
+
+
+def test_forms_report_forbidden_words_per_field():
+    ForbiddenWord.objects.create(word="плохо")
+    with CaptureQueriesContext(connection) as ctx:
+        form = PostForm(data={"title": "Плохо!", "text": "текст: плохо.",
+                              "pub_date": "2024-01-01T00:00"})
+        assert not form.is_valid()
+    assert set(form.errors) >= {"title", "text"}
+    word_queries = [query for query in ctx.captured_queries
+                    if "blog_forbiddenword" in query["sql"]]
+    assert len(word_queries) == 1
+
+    assert CommentForm(data={"text": "нормально"}).is_valid()
+    assert "text" in CommentForm(data={"text": "плохо"}).errors
@@ -0,0 +1,95 @@
+from contextlib import ExitStack
+from typing import Optional
+
+import pytest
+from django.db import connection, connections
+from django.http import Http404
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+from blog.views import PostEditView
+
+pytestmark = [pytest.mark.django_db]
+
+# Запросы сессии и пользователя, которые делает любой запрос с логином.
+AUTH_QUERIES = 2
+
+
+def assert_num_queries(client: Client, method: str, url: str,
+                       expected: int, data: Optional[dict] = None) -> None:
+    """Проверяет точное число SQL-запросов, выполненных для url, во всех
+    базах: комментарии могут лежать в отдельной.
+    """
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+            if not connections[alias].settings_dict["TEST"]["MIRROR"]
+        ]
+        response = getattr(client, method)(url, data or {})
+    assert response.status_code in (200, 302), (
+        f"Страница `{url}` вернула код {response.status_code}."
+    )
+    queries = [q["sql"] for ctx in contexts for q in ctx.captured_queries]
+    assert len(queries) == expected, (
+        f"`{method.upper()} {url}` выполняет {len(queries)} запросов вместо"
+        f" {expected}:\n" + "\n".join(queries)
+    )
+
+
+@pytest.fixture
+def own_post(user, post_with_published_location):
+    post = post_with_published_location
+    post.author = user
+    post.save()
+    return post
+
+
+@pytest.fixture
+def own_comment(mixer, user, own_post):
+    return mixer.blend("blog.Comment", post=own_post, author=user)
+
+
+@pytest.mark.parametrize("url, expected", (
+    # Эпоха видимости, COUNT, страница ленты и посты страницы.
+    ("/", 4),
+    # Категория, эпоха, COUNT, страница ленты и посты страницы.
+    ("/category/{post.category.slug}/", 5),
+    # Владелец профиля — сам пользователь: эпоха, COUNT, страница постов
+    # и COUNT архива.
+    ("/profile/{post.author.username}/", 4),
+    # Пост со связями, страница комментариев и их авторы списком id.
+    ("/posts/{post.id}/", 3),
+    # Пост, затем категории и местоположения для формы.
+    ("/posts/{post.id}/edit/", 3),
+    ("/posts/{post.id}/delete/", 1),
+    ("/posts/{post.id}/edit_comment/{comment.id}/", 1),
+    ("/posts/{post.id}/delete_comment/{comment.id}/", 1),
+))
+def test_view_query_counts(user_client, own_post, own_comment, url, expected):
+    url = url.format(post=own_post, comment=own_comment)
+    assert_num_queries(user_client, "get", url, AUTH_QUERIES + expected)
+
+
+def test_comment_create_does_not_load_post(user_client, own_post):
+    with CaptureQueriesContext(connection) as ctx:
+        user_client.post(f"/posts/{own_post.id}/comment/", {"text": "Текст"})
+    post_selects = [q["sql"] for q in ctx.captured_queries
+                    if q["sql"].startswith('SELECT "blog_post"."id"')]
+    assert post_selects == [
+        'SELECT "blog_post"."id" FROM "blog_post" '
+        f'WHERE "blog_post"."id" = {own_post.id} LIMIT 21'
+    ], "Для комментария достаточно проверить, что пост существует."
+
+
+def test_author_check_uses_given_queryset(rf, user, own_post):
+    request = rf.get(f"/posts/{own_post.id}/edit/")
+    request.user = user
+    view = PostEditView()
+    view.setup(request, post_id=own_post.id)
+    with CaptureQueriesContext(connection) as ctx, pytest.raises(Http404):
+        view.get_object(Post.objects.exclude(pk=own_post.pk))
+    assert len(ctx.captured_queries) == 1, (
+        "Переданный queryset не должен вычисляться целиком."
+    )
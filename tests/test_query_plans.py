@@ -0,0 +1,106 @@
+from typing import List
+
+import pytest
+from django.apps import apps
+from django.db import connection, connections, router
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+
+from blog.feed_cache import GLOBAL_SCOPE
+from blog.models import FeedEntry, Post
+from blog.pagination import encode_cursor, seek
+
+pytestmark = [pytest.mark.django_db]
+
+BAD_PLAN_STEPS = ("USE TEMP B-TREE",)
+
+
+def _connection_for(table: str):
+    # Таблица может лежать не в default (см. core.db_router).
+    model = next(m for m in apps.get_models() if m._meta.db_table == table)
+    return connections[router.db_for_read(model)]
+
+
+def _explain(sql: str, table: str) -> List[str]:
+    with _connection_for(table).cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _assert_ordered_queries_use_index(
+        client: Client, url: str, table: str) -> None:
+    with CaptureQueriesContext(_connection_for(table)) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f"Страница `{url}` должна загружаться."
+    )
+    ordered = [
+        q["sql"] for q in ctx.captured_queries
+        if f'FROM "{table}"' in q["sql"] and "ORDER BY" in q["sql"]
+    ]
+    assert ordered, (
+        f"Не найден упорядоченный запрос к `{table}` на странице `{url}`."
+    )
+    for sql in ordered:
+        plan = _explain(sql, table)
+        for step in plan:
+            assert not step.startswith(f"SCAN {table}") or "INDEX" in step, (
+                f"Запрос страницы `{url}` полностью сканирует `{table}`:"
+                f"\n{sql}\n{plan}"
+            )
+            assert not step.startswith(BAD_PLAN_STEPS), (
+                f"Запрос страницы `{url}` сортирует во временном B-дереве:"
+                f"\n{sql}\n{plan}"
+            )
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяются планы SQLite.")
+def test_feed_query_plans(
+        user, user_client, another_user_client, published_category,
+        many_posts_with_published_locations):
+    first_post = many_posts_with_published_locations[0]
+    cursor = encode_cursor(first_post.pub_date, first_post.pk)
+    for client, url, table in (
+        (user_client, "/", "blog_feedentry"),
+        (user_client, f"/?after={cursor}", "blog_feedentry"),
+        (user_client, f"/?before={cursor}", "blog_feedentry"),
+        (user_client, f"/category/{published_category.slug}/",
+         "blog_feedentry"),
+        (user_client, f"/profile/{user.username}/", "blog_post"),
+        (another_user_client, f"/profile/{user.username}/",
+         "blog_feedentry"),
+    ):
+        _assert_ordered_queries_use_index(client, url, table)
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяются планы SQLite.")
+def test_comments_query_plan(
+        mixer, user, user_client, post_with_published_location):
+    post = post_with_published_location
+    comment = mixer.blend("blog.Comment", post=post, author=user)
+    cursor = encode_cursor(comment.created_at, comment.pk)
+    for url in (f"/posts/{post.id}/",
+                f"/posts/{post.id}/?comments_after={cursor}"):
+        _assert_ordered_queries_use_index(user_client, url, "blog_comment")
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяются планы SQLite.")
+@pytest.mark.parametrize("direction", ["after", "before"])
+def test_seek_starts_index_range_at_cursor(
+        user, direction, many_posts_with_published_locations):
+    post = many_posts_with_published_locations[0]
+    # У обоих источников своя верхняя граница даты — «уже наступил».
+    for source, table in (
+        (FeedEntry.objects.in_scope(GLOBAL_SCOPE), "blog_feedentry"),
+        (Post.objects.published().by_author(user), "blog_post"),
+    ):
+        with CaptureQueriesContext(_connection_for(table)) as ctx:
+            seek(source, direction, post.pub_date, post.pk, 11)
+        plan = " ".join(_explain(ctx.captured_queries[-1]["sql"], table))
+        assert "pub_date>? AND pub_date<?" in plan, (
+            f"Поиск по курсору в `{table}` должен начинать диапазон "
+            f"индекса от курсора, а не от текущего времени:\n{plan}"
+        )
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.admin.sites import site
+from django.core.management import CommandError, call_command
+from django.db import connections, router
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog import admin as blog_admin
+from blog.models import (Comment, ForbiddenWord, Post, RescanCheckpoint,
+                         RescanLock)
+from blog.rescan import LOCK_TIMEOUT, RescanLocked, acquire_lock, rescan
+
+pytestmark = [pytest.mark.django_db]
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def comments(mixer, user, post_with_published_location):
+    post = post_with_published_location
+    texts = ["всё хорошо", "Всё плохо!", "нормально", "плохо, но честно",
+             "ничего", "плохо"]
+    created = [mixer.blend(Comment, post=post, author=user, text=text,
+                           is_published=True, forbidden_word="")
+               for text in texts]
+    Post.objects.filter(pk=post.pk).update(comment_count=len(created))
+    return created
+
+
+def _flagged(model):
+    return set(model.objects.exclude(forbidden_word="")
+               .values_list("pk", flat=True))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rescan_flags_comments_with_forbidden_words(comments, workers):
+    stats = rescan("comment", ["плохо"], chunk_size=2, workers=workers)
+    assert stats.scanned == len(comments) and stats.hits == 3
+    assert _flagged(Comment) == {comments[i].pk for i in (1, 3, 5)}
+    assert Comment.objects.get(pk=comments[1].pk).forbidden_word == "плохо"
+    assert not RescanCheckpoint.objects.exists()
+
+
+def test_rescan_stores_list_entry_not_inflected_form(comments):
+    rescan("comment", ["плохой"], chunk_size=2)
+    assert set(Comment.objects.exclude(forbidden_word="")
+               .values_list("forbidden_word", flat=True)) == {"плохой"}
+
+
+def test_rescan_reads_each_batch_with_bounded_query(comments):
+    db = connections[router.db_for_write(Comment)]
+    with CaptureQueriesContext(db) as ctx:
+        rescan("comment", ["плохо"], chunk_size=4)
+    reads = [query["sql"] for query in ctx.captured_queries
+             if query["sql"].startswith("SELECT")
+             and "blog_comment" in query["sql"]
+             and "forbidden_word" not in query["sql"]]
+    assert len(reads) == 3 and all("LIMIT 4" in sql for sql in reads), (
+        "Каждая порция должна читаться отдельным запросом с LIMIT, "
+        "а не из открытого курсора."
+    )
+
+
+def test_unpublished_post_card_is_not_served_from_cache(
+        user, user_client, post_with_published_location):
+    post = post_with_published_location
+    Post.objects.filter(pk=post.pk).update(text="Всё плохо!")
+    url = f"/profile/{user.username}/"
+    assert "снят с публикации" not in user_client.get(url).content.decode()
+
+    rescan("post", ["плохо"], action="unpublish")
+    assert "Пост снят с публикации" in user_client.get(url).content.decode()
+
+
+def test_interrupted_rescan_resumes_from_checkpoint(comments):
+    def stop_after_first_chunk(scanned, hits, last_pk):
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        rescan("comment", ["плохо"], chunk_size=2,
+               progress=stop_after_first_chunk)
+    assert _flagged(Comment) == {comments[1].pk}
+
+    stats = rescan("comment", ["плохо"], chunk_size=2)
+    assert stats.resumed_from == comments[1].pk
+    assert stats.scanned == len(comments) - 2
+    assert _flagged(Comment) == {comments[i].pk for i in (1, 3, 5)}
+
+    with pytest.raises(Interrupted):
+        rescan("comment", ["плохо"], chunk_size=2,
+               progress=stop_after_first_chunk)
+    stats = rescan("comment", ["плохо", "ничего"], chunk_size=2)
+    assert stats.resumed_from == 0, (
+        "Новый список слов должен проверяться с начала."
+    )
+    stats = rescan("comment", ["плохо"], chunk_size=2)
+    assert stats.resumed_from == comments[1].pk, (
+        "Проверка по другому списку не должна сбивать прерванную."
+    )
+
+
+def test_second_rescan_of_same_kind_is_refused(comments):
+    acquire_lock("comment")
+    with pytest.raises(RescanLocked):
+        rescan("comment", ["плохо"])
+    assert not _flagged(Comment)
+
+    ForbiddenWord.objects.create(word="плохо")
+    with pytest.raises(CommandError):
+        call_command("rescan_forbidden_words", kinds=["comment"],
+                     workers=1, stdout=StringIO())
+    rescan("post", ["плохо"])
+
+
+def test_stale_lock_is_taken_over(comments):
+    acquire_lock("comment")
+    RescanLock.objects.update(
+        heartbeat=timezone.now() - LOCK_TIMEOUT - timedelta(seconds=1))
+    assert rescan("comment", ["плохо"]).hits == 3
+    assert RescanLock.objects.get(kind="comment").owner == ""
+
+
+def test_unpublish_hides_comments_and_adjusts_count(comments):
+    post = comments[0].post
+    with pytest.raises(CommandError):
+        call_command("rescan_forbidden_words", kinds=["comment"])
+
+    ForbiddenWord.objects.create(word="плохо")
+    call_command("rescan_forbidden_words", kinds=["comment"],
+                 action="unpublish", workers=1, stdout=StringIO())
+    assert Comment.objects.filter(is_published=True).count() == 3
+    post.refresh_from_db()
+    assert post.comment_count == 3
+
+
+def test_admin_action_starts_rescan_in_background(user, monkeypatch):
+    started = []
+    monkeypatch.setattr(blog_admin.subprocess, "Popen",
+                        lambda command, **kwargs: started.append(command))
+    ForbiddenWord.objects.create(word="плохо")
+    word_admin = site._registry[ForbiddenWord]
+    request = RequestFactory().post("/admin/")
+    request.user = user
+    monkeypatch.setattr(word_admin, "message_user", lambda *args: None)
+    word_admin.rescan_content(request, ForbiddenWord.objects.all())
+    assert started and started[0][-3] == "rescan_forbidden_words"
+    assert started[0][-1] == "--word=плохо"
+
+    started.clear()
+    acquire_lock("post")
+    word_admin.rescan_content(request, ForbiddenWord.objects.all())
+    assert not started, "Вторая проверка не должна запускаться."
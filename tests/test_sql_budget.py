@@ -0,0 +1,96 @@
+import time
+from http import HTTPStatus
+
+import pytest
+from django.db import OperationalError, connection
+from django.urls import resolve
+
+from conftest import run_in_other_process
+from core import sql_budget, versions
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite",
+    reason="Проверяется progress handler SQLite.")
+
+SLOW_SQL = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n"
+    " WHERE i < 10000000) SELECT count(*) FROM n"
+)
+
+
+@pytest.mark.django_db
+def test_budget_interrupts_slow_query_and_is_removed_after():
+    with sql_budget.SQLBudget(0.05) as budget:
+        with pytest.raises(OperationalError):
+            with connection.cursor() as cursor:
+                cursor.execute(SLOW_SQL)
+    assert budget.exceeded
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM blog_post")
+        assert cursor.fetchone() == (0,), (
+            "После выхода из бюджета запросы не должны прерываться."
+        )
+
+
+@pytest.mark.django_db
+def test_budget_counts_only_time_inside_sql(monkeypatch):
+    monkeypatch.setattr(sql_budget, "PROGRESS_STEPS", 1)
+    with sql_budget.SQLBudget(0.05) as budget:
+        time.sleep(0.1)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM blog_post")
+    assert not budget.exceeded, (
+        "Время вне SQL не должно расходовать бюджет."
+    )
+    assert budget.spent < 0.05
+
+
+@pytest.mark.django_db
+def test_exceeded_budget_turns_into_503(
+        user_client, post_with_published_location, monkeypatch, caplog):
+    versions.state.clear()
+    monkeypatch.setattr(sql_budget, "PROGRESS_STEPS", 1)
+    monkeypatch.setattr(resolve("/").func, "sql_budget", 0)
+    response = user_client.get("/")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response["Retry-After"]
+    assert sql_budget.aborts("blog:index") == 1
+    [record] = [record for record in caplog.records
+                if record.name == sql_budget.__name__]
+    assert (record.view_name, record.path, record.budget) == (
+        "blog:index", "/", 0)
+
+    post = post_with_published_location
+    response = user_client.get(f"/posts/{post.id}/")
+    assert response.status_code == HTTPStatus.OK, (
+        "Бюджет ленты не должен действовать на другие страницы."
+    )
+
+
+def test_aborts_are_counted_across_processes():
+    versions.state.clear()
+    run_in_other_process(sql_budget._record_abort, "blog:index")
+    run_in_other_process(sql_budget._record_abort, "blog:index")
+    assert sql_budget.aborts("blog:index") == 2, (
+        "Прерывания других процессов должны попадать в общий счётчик."
+    )
+
+
+@pytest.mark.django_db
+def test_budget_skips_writes_and_admin(
+        user_client, admin_client, post_with_published_location, settings,
+        monkeypatch):
+    versions.state.clear()
+    monkeypatch.setattr(sql_budget, "PROGRESS_STEPS", 1)
+    settings.BLOG_SQL_BUDGET = 0
+    post = post_with_published_location
+    response = user_client.post(f"/posts/{post.id}/comment/",
+                                {"text": "Комментарий"})
+    assert response.status_code == HTTPStatus.FOUND, (
+        "Бюджет не должен обрывать запись."
+    )
+    response = admin_client.get("/admin/blog/post/")
+    assert response.status_code == HTTPStatus.OK, (
+        "Бюджет не должен действовать на админку."
+    )
+    assert sql_budget.aborts("blog:add_comment") == 0
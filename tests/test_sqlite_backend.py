@@ -0,0 +1,43 @@
+import pytest
+from django.db import connection
+
+from core.sqlite3.base import DatabaseWrapper
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Проверяется бэкенд SQLite.")
+
+
+@pytest.fixture
+def file_db(tmp_path, django_db_blocker):
+    settings_dict = {**connection.settings_dict,
+                     "NAME": str(tmp_path / "probe.sqlite3")}
+    db = DatabaseWrapper(settings_dict, alias="probe")
+    with django_db_blocker.unblock():
+        yield db
+        db.close()
+
+
+def _pragma(db, name):
+    with db.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+def test_pragmas_are_applied(file_db):
+    pragmas = file_db.settings_dict["OPTIONS"]["pragmas"]
+    assert _pragma(file_db, "journal_mode") == pragmas["journal_mode"].lower()
+    assert _pragma(file_db, "busy_timeout") == pragmas["busy_timeout"]
+    assert _pragma(file_db, "cache_size") == pragmas["cache_size"]
+
+
+def test_health_check_drops_broken_connection(file_db):
+    file_db.ensure_connection()
+    file_db.close_if_unusable_or_obsolete()
+    assert file_db.connection is not None, (
+        "Рабочее соединение должно переиспользоваться."
+    )
+    file_db.connection.close()
+    file_db.close_if_unusable_or_obsolete()
+    assert file_db.connection is None, (
+        "Сломанное соединение должно закрываться перед запросом."
+    )
@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from blog.models import Post
+from blog.visibility import EPOCH_KEY, get_epoch, get_next_due
+from core import versions
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_epoch_changes_on_edit_only(post_with_published_location):
+    epoch = get_epoch()
+    assert get_epoch() == epoch, (
+        "Без изменений эпоха видимости не должна меняться."
+    )
+    post_with_published_location.title = "Новый заголовок"
+    post_with_published_location.save()
+    assert get_epoch() > epoch
+
+
+def test_epoch_advances_when_scheduled_post_is_due(
+        mixer, user, published_category):
+    post = mixer.blend(
+        Post, author=user, category=published_category, is_published=True,
+        pub_date=timezone.now() + timedelta(days=1))
+    assert get_next_due() == pytest.approx(post.pub_date.timestamp())
+
+    # Публикация наступает без сигналов — только по времени.
+    Post.objects.filter(pk=post.pk).update(
+        pub_date=timezone.now() + timedelta(seconds=0.2))
+    call_command("publish_due_posts")
+    epoch = get_epoch()
+    time.sleep(0.3)
+    assert get_epoch() > epoch
+
+
+def test_publish_due_posts_advances_epoch_after_real_wait(
+        mixer, user, published_category):
+    pub_date = timezone.now() + timedelta(seconds=0.3)
+    mixer.blend(Post, author=user, category=published_category,
+                is_published=True, pub_date=pub_date)
+    mixer.blend(Post, author=user, category=published_category,
+                is_published=True, pub_date=timezone.now() + timedelta(days=1))
+    assert get_next_due() == pytest.approx(pub_date.timestamp())
+    epoch = get_epoch()
+
+    time.sleep(max(pub_date.timestamp() - time.time(), 0) + 0.1)
+    call_command("publish_due_posts", stdout=StringIO())
+    # Эпоха читается напрямую: get_epoch() сам продвинул бы её.
+    assert versions.get(EPOCH_KEY) > epoch, (
+        "Наступившая публикация должна продвигать эпоху, даже если "
+        "за ней есть ещё отложенные посты."
+    )
+
+
+def test_is_visible_follows_category(
+        mixer, user, published_category, many_posts_with_published_locations):
+    assert all(p.is_visible for p in many_posts_with_published_locations)
+
+    published_category.is_published = False
+    published_category.save()
+    assert not Post.objects.filter(
+        category=published_category, is_visible=True).exists(), (
+        "Снятие категории с публикации должно скрывать её посты."
+    )
+
+    hidden = mixer.blend(
+        Post, author=user, category=published_category, is_published=False)
+    published_category.is_published = True
+    published_category.save()
+    hidden.refresh_from_db()
+    assert not hidden.is_visible
+    assert Post.objects.filter(is_visible=True).count() == len(
+        many_posts_with_published_locations)
+
+    published_category.delete()
+    assert not Post.objects.filter(is_visible=True).exists()